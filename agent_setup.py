@@ -1,16 +1,194 @@
 # agent_setup.py
-from langchain.agents import initialize_agent, AgentType
+"""
+工具路由 - 替代ReAct代理
+
+ReAct代理每个问题要经过多轮"思考/行动/观察"的大模型调用（通常4~6次）。这里改为：
+1. 先用规则选择工具（算式 -> 计算器，时效性问题 -> 网页搜索，其余 -> 文档问答）
+2. 规则无法确定且有多个工具可选时，用一次大模型分类
+3. 选中的工具并行执行，结果按 (工具, 输入) 缓存（执行失败和搜索限流、超时的提示不缓存）
+4. 只有一个直接返回结果的工具（return_direct）时原样返回，否则用一次大模型综合
+
+因此带工具的回答只需要1~2次大模型调用。
+"""
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.core.retrieval import normalize_query
+from src.utils.calculator import CONSTANTS, FUNCTIONS, normalize_expression
+from src.utils.tracing import span
+from src.utils.web_search import SearchUnavailable
+
+logger = logging.getLogger(__name__)
+
+DOC_TOOL = "文档问答"
+CALCULATOR_TOOL = "计算器"
+SEARCH_TOOL = "网页搜索"
+
+# 只由数字、运算符和计算器支持的函数/常量组成的片段
+_NAMES = "|".join(sorted(list(FUNCTIONS) + list(CONSTANTS), key=len, reverse=True))
+_EXPRESSION = re.compile(rf"(?:[\d\s.,+\-*/%()]|{_NAMES})+")
+_OPERATION = re.compile(rf"(?:[\d)]|{_NAMES})\s*(?:\*\*|//|[+\-*/%])\s*[\d.(a-z]|(?:{_NAMES})\s*\(")
+_CALC_WORDS = re.compile(r"^(请|帮我)?(计算|算一下|算算)?|\s*(等于|=|是)?\s*(多少)?\s*[?？]?$")
+_SEARCH_WORDS = re.compile(r"最新|今天|今日|昨天|实时|新闻|天气|股价|汇率|搜索|上网|网上")
+
+
+def extract_expression(query: str) -> Optional[str]:
+    """问题本身是一个算式时返回算式（如 "计算 (3+4)*2 等于多少"、"sqrt(2)*3万"），否则返回None"""
+    text = _CALC_WORDS.sub("", normalize_query(query).strip()).strip()
+    expression = normalize_expression(text)
+    if not _EXPRESSION.fullmatch(expression) or not re.search(r"\d", expression) or not _OPERATION.search(expression):
+        return None
+    return expression
+
+
+class ToolRouter:
+    """一次路由 + 一次（并行）工具调用的代理，接口兼容 AgentExecutor 的 run / invoke"""
+
+    def __init__(self, tools: Sequence[Any], llm=None, classify: bool = True,
+                 cache_ttl: float = 300.0, cache_size: int = 256):
+        """
+        Args:
+            tools: 工具列表（需有 name / description / func，未启用的工具不应传入）
+            llm: 用于分类和综合回答的大模型，为None时只用规则且不综合
+            classify: 规则无法确定时是否用大模型分类
+            cache_ttl: 工具结果缓存时间（秒），0表示不缓存
+        """
+        self.tools = {tool.name: tool for tool in tools}
+        self.llm = llm
+        self.classify = classify
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.cache_hits = 0
+
+    # 路由
+
+    def route(self, query: str) -> List[Tuple[str, str]]:
+        """选择要调用的工具，返回 [(工具名, 工具输入)]"""
+        expression = extract_expression(query)
+        if expression is not None and CALCULATOR_TOOL in self.tools:
+            return [(CALCULATOR_TOOL, expression)]
+
+        if _SEARCH_WORDS.search(query) and SEARCH_TOOL in self.tools:
+            calls = [(SEARCH_TOOL, query)]
+            # 文档中可能也有相关内容，两个工具并行执行
+            if DOC_TOOL in self.tools:
+                calls.append((DOC_TOOL, query))
+            return calls
+
+        # 计算器只按规则选择（需要能提取出算式），其余工具多于一个时才需要分类
+        candidates = [name for name in self.tools if name != CALCULATOR_TOOL]
+        if self.classify and self.llm is not None and len(candidates) > 1:
+            calls = self._classify(query, candidates)
+            if calls:
+                return calls
+
+        default = DOC_TOOL if DOC_TOOL in self.tools else next(iter(self.tools), None)
+        return [(default, query)] if default else []
+
+    def _classify(self, query: str, candidates: List[str]) -> List[Tuple[str, str]]:
+        """一次大模型调用选择工具"""
+        catalog = "\n".join(f"- {name}: {self.tools[name].description}" for name in candidates)
+        prompt = (f"可用工具：\n{catalog}\n\n问题：{query}\n\n"
+                  f"请选择回答该问题需要的工具，只输出工具名称，多个工具用逗号分隔。")
+        try:
+            output = self._call_llm(prompt)
+        except Exception as e:
+            logger.warning(f"工具分类失败，使用默认工具: {e}")
+            return []
+        return [(name, query) for name in candidates if name in output]
+
+    # 执行
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return value
+
+    def _cache_set(self, key: Tuple[str, str], value: str):
+        if self.cache_ttl <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _run_tool(self, name: str, tool_input: str) -> str:
+        key = (name, normalize_query(tool_input))
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        with span("tool", tool=name):
+            try:
+                output = str(self.tools[name].func(tool_input))
+            except SearchUnavailable as e:
+                # 限流、超时等临时失败：返回提示，不缓存
+                return str(e)
+            except Exception as e:
+                logger.error(f"工具 {name} 执行失败: {e}")
+                return f"{name}执行失败: {str(e)}"
+        self._cache_set(key, output)
+        return output
+
+    def execute(self, calls: Sequence[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """执行工具调用（多个时并行），返回 [(工具名, 结果)]"""
+        if len(calls) <= 1:
+            return [(name, self._run_tool(name, tool_input)) for name, tool_input in calls]
+        with ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix="tool") as pool:
+            futures = [(name, pool.submit(self._run_tool, name, tool_input)) for name, tool_input in calls]
+            return [(name, future.result()) for name, future in futures]
+
+    def _call_llm(self, prompt: str) -> str:
+        self.llm_calls += 1
+        result = self.llm.invoke(prompt)
+        return getattr(result, "content", result)
+
+    def _answer(self, query: str, results: List[Tuple[str, str]]) -> str:
+        if not results:
+            return "抱歉，没有可用的工具回答这个问题。"
+        if len(results) == 1 and (getattr(self.tools[results[0][0]], "return_direct", False) or self.llm is None):
+            return results[0][1]
+        observations = "\n\n".join(f"【{name}】\n{output}" for name, output in results)
+        if self.llm is None:
+            return observations
+        prompt = f"请根据以下工具结果，用中文回答问题。\n\n{observations}\n\n问题：{query}"
+        with span("generate"):
+            return self._call_llm(prompt)
+
+    # 与 AgentExecutor 兼容的接口
+
+    def invoke(self, inputs, config: Optional[Dict] = None) -> Dict[str, Any]:
+        query = inputs["input"] if isinstance(inputs, dict) else str(inputs)
+        calls = self.route(query)
+        results = self.execute(calls)
+        return {"input": query, "output": self._answer(query, results), "tools": [name for name, _ in calls]}
+
+    def run(self, query: str) -> str:
+        return self.invoke({"input": query})["output"]
+
 
 def create_agent(tools, llm):
-    """创建代理，兼容新旧版本
-    
-    注意：initialize_agent已显示弃用警告，建议新项目使用LangGraph
-    但当前实现仍保持兼容性
-    """
-    agent = initialize_agent(
-        tools=tools,
-        llm=llm,
-        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True
+    """创建工具路由（TOOL_ROUTER_CLASSIFY / TOOL_CACHE_TTL 配置）"""
+    return ToolRouter(
+        tools,
+        llm,
+        classify=os.getenv("TOOL_ROUTER_CLASSIFY", "true").lower() == "true",
+        cache_ttl=float(os.getenv("TOOL_CACHE_TTL", "300"))
     )
-    return agent
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+批量问答脚本 - 对知识库批量提问，用于回归评测和批量生成报告
+
+输入文件每行一个JSON对象: {"id": 1, "question": "..."}
+输出文件每行一个结果: id、question、answer、sources、scores、llm_ms、error，
+各阶段耗时汇总写入同名 .summary.json
+
+用法:
+    python batch_qa.py questions.jsonl answers.jsonl --concurrency 8
+"""
+import sys
+import json
+import argparse
+import logging
+from pathlib import Path
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量问答")
+    parser.add_argument("input", help="问题文件（JSONL）")
+    parser.add_argument("output", help="结果文件（JSONL）")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的大模型调用数量")
+    parser.add_argument("--k", type=int, default=None, help="每个问题检索的片段数量")
+    args = parser.parse_args()
+
+    from main import AIDocumentAssistant
+    from src.core.batch_qa import BatchQARunner
+
+    assistant = AIDocumentAssistant()
+    assistant.initialize_system()
+
+    timings = BatchQARunner(assistant, concurrency=args.concurrency, k=args.k).run_file(args.input, args.output)
+    print(json.dumps(timings, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
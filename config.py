@@ -1,5 +1,6 @@
 # config.py
 import os
+import logging
 from dotenv import load_dotenv
 from typing import List
 
@@ -10,6 +11,17 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.chatanywhere.tech")
 SERPAPI_KEY = os.getenv("SERPAPI_KEY", "")
 
+# 🧰 工具路由配置
+TOOL_ROUTER_CLASSIFY = os.getenv("TOOL_ROUTER_CLASSIFY", "true").lower() == "true"  # 规则无法确定工具时用一次大模型分类
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "300"))  # 工具结果缓存时间（秒），0表示不缓存
+SEARCH_MODE = os.getenv("SEARCH_MODE", "live")  # live / record（同时录制结果）/ replay（只用录制的结果，不联网）
+SEARCH_FIXTURES = os.getenv("SEARCH_FIXTURES", "tests/fixtures/search.json")  # 录制的搜索结果
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "cache/search.json")  # 搜索结果持久化缓存
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "86400"))  # 搜索结果缓存时间（秒），0表示不缓存
+SEARCH_RATE_PER_MIN = float(os.getenv("SEARCH_RATE_PER_MIN", "10"))  # 每分钟实际发出的搜索数上限，0表示不限
+SEARCH_BURST = float(os.getenv("SEARCH_BURST", "5"))  # 允许的突发搜索数
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))  # 单次搜索超时（秒）
+
 # 🤖 模型配置
 MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "ollama")  # openai 或 ollama
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "llama2")
@@ -17,6 +29,12 @@ DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "llama2")
 # 🏠 Ollama配置
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODELS = os.getenv("OLLAMA_MODELS", "llama2,llama3,mistral,codellama").split(",")
+# 多节点：逗号分隔的Ollama地址，配置后按最少未完成请求负载均衡（为空时只用OLLAMA_BASE_URL）
+OLLAMA_ENDPOINTS = [url.strip() for url in os.getenv("OLLAMA_ENDPOINTS", "").split(",") if url.strip()]
+OLLAMA_FAILURE_THRESHOLD = int(os.getenv("OLLAMA_FAILURE_THRESHOLD", "3"))  # 连续失败多少次后摘除节点
+OLLAMA_LATENCY_THRESHOLD_S = float(os.getenv("OLLAMA_LATENCY_THRESHOLD_S", "0"))  # 平均延迟超过该值时摘除，0表示不启用
+OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))  # 节点摘除时长
+OLLAMA_HEDGE_AFTER_MS = float(os.getenv("OLLAMA_HEDGE_AFTER_MS", "0"))  # 超过该时长未返回时向另一节点发对冲请求，0表示不启用
 
 # 📊 模型参数
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1000"))
@@ -27,28 +45,72 @@ TOP_P = float(os.getenv("TOP_P", "0.9"))
 PDF_FOLDER = os.getenv("PDF_FOLDER", "docs/")
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads/")
 
+# 👀 文档监听配置
+WATCH_DOCS = os.getenv("WATCH_DOCS", "true").lower() == "true"
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2.0"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "2.0"))
+
+# 🧩 多进程服务配置
+# standalone: 单进程；writer: 负责入库并发布索引快照；reader: 只读加载共享快照
+SERVING_ROLE = os.getenv("SERVING_ROLE", "standalone")
+GENERATION_POLL_INTERVAL = float(os.getenv("GENERATION_POLL_INTERVAL", "2.0"))
+
 # 💾 缓存配置
 CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
 VECTOR_CACHE_DIR = os.getenv("VECTOR_CACHE_DIR", "./cache/vector")
 TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", "./cache/text")
+WARM_START = os.getenv("WARM_START", "true").lower() == "true"  # 预热快照
+
+# 🔍 检索配置
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # 查询向量缓存条数
+QUERY_COALESCE_MS = float(os.getenv("QUERY_COALESCE_MS", "5"))  # 并发查询合并窗口（毫秒），0表示不等待
+RELEVANCE_THRESHOLDS = os.getenv("RELEVANCE_THRESHOLDS", "")  # 按嵌入模型指定距离阈值，如 "nomic-embed-text=0.9"，未指定的模型自动校准
+RELEVANCE_QUANTILE = float(os.getenv("RELEVANCE_QUANTILE", "0.5"))  # 自动校准使用的片段间距离分位数，越小越严格
+SMALL_TALK_GATE = os.getenv("SMALL_TALK_GATE", "true").lower() == "true"  # 闲聊不检索，直接简短回答
+
+# 🗂️ 多知识库配置
+KB_ROOT = os.getenv("KB_ROOT", "knowledge_bases")  # 命名知识库根目录
+KB_MEMORY_BUDGET_MB = float(os.getenv("KB_MEMORY_BUDGET_MB", "2048"))  # 已加载知识库的内存预算
+KB_MAX_LOADED = int(os.getenv("KB_MAX_LOADED", "16"))  # 同时加载的知识库数量上限
 
 # 📝 日志配置
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")
+LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")  # 由后台线程写入，每行一个JSON对象
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() == "true"  # false 时文件使用文本格式
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))  # 单个日志文件上限
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))  # 保留的滚动文件数量
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))  # DEBUG日志按调用位置的保留比例
+TRACE_RECORDS = os.getenv("TRACE_RECORDS", "true").lower() == "true"  # 每个请求的阶段耗时写入JSONL
+TRACE_RECORDS_DIR = os.getenv("TRACE_RECORDS_DIR", "logs/requests")  # 按天滚动：requests-YYYYMMDD.jsonl
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "10000"))  # 超过该耗时的请求保存调用栈和阶段耗时，0表示关闭
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"  # 开放按时间窗口采样的接口
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "10"))  # 采样间隔
+PROFILING_DIR = os.getenv("PROFILING_DIR", "logs/profiles")  # 折叠栈文件目录（可生成火焰图）
+USAGE_STORE_PATH = os.getenv("USAGE_STORE_PATH", "cache/usage.json")  # 按天/模型/会话/知识库汇总的token用量
+TOKEN_PRICES = os.getenv("TOKEN_PRICES", "")  # 每千token单价，如 gpt-4o=0.0025/0.01（提示词/回答），未配置的模型费用为0
 
 # 🌐 网络配置
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # 每个模型服务地址的长连接数量
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))  # 空闲长连接保留时间（秒）
 
 # 验证配置
-if MODEL_PROVIDER == "openai" and not OPENAI_API_KEY:
-    print("警告: 使用OpenAI但未设置OPENAI_API_KEY，将使用Ollama")
+OPENAI_KEY_MISSING = MODEL_PROVIDER == "openai" and not OPENAI_API_KEY
+if OPENAI_KEY_MISSING:
     MODEL_PROVIDER = "ollama"
 
-if MODEL_PROVIDER == "ollama":
-    print(f"使用Ollama模型: {DEFAULT_MODEL} ({OLLAMA_BASE_URL})")
-else:
-    print(f"使用OpenAI模型: {DEFAULT_MODEL}")
-
-if not SERPAPI_KEY:
-    print("提示: 未设置SERPAPI_KEY，网页搜索功能将不可用")
+def log_config_summary():
+    """输出配置摘要（由启动入口调用，导入本模块时不产生输出）"""
+    logger = logging.getLogger(__name__)
+    
+    if OPENAI_KEY_MISSING:
+        logger.warning("使用OpenAI但未设置OPENAI_API_KEY，将使用Ollama")
+    
+    if MODEL_PROVIDER == "ollama":
+        logger.info(f"使用Ollama模型: {DEFAULT_MODEL} ({OLLAMA_BASE_URL})")
+    else:
+        logger.info(f"使用OpenAI模型: {DEFAULT_MODEL}")
+    
+    if not SERPAPI_KEY:
+        logger.info("提示: 未设置SERPAPI_KEY，网页搜索功能将不可用")
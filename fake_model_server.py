@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+假模型服务 - 兼容Ollama和OpenAI接口的本地服务，用于离线压测整个系统
+
+回答和嵌入向量由输入文本哈希决定，延迟、吐字速度和错误率可配置，不需要GPU和网络。
+
+用法:
+    python fake_model_server.py --port 11434 --latency uniform:0.2,0.8 --tokens-per-s 30
+    OLLAMA_BASE_URL=http://127.0.0.1:11434 python main.py
+
+    # OpenAI兼容接口
+    OPENAI_API_BASE=http://127.0.0.1:11434/v1 OPENAI_API_KEY=fake MODEL_PROVIDER=openai python main.py
+"""
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="假模型服务（Ollama / OpenAI兼容）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=11434, help="监听端口")
+    parser.add_argument("--latency", default="fixed:0", help="首个token前的延迟分布，如 fixed:0.2、uniform:0.1,0.5、normal:0.3,0.05、lognormal:-1.5,0.5、exp:0.2")
+    parser.add_argument("--embed-latency", default="fixed:0", help="嵌入请求的延迟分布")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="吐字速度，0表示立即返回")
+    parser.add_argument("--tokens", type=int, default=64, help="默认回答的词数")
+    parser.add_argument("--embedding-dim", type=int, default=768, help="嵌入向量维度")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误响应的比例")
+    parser.add_argument("--error-status", type=int, default=500, help="注入错误的HTTP状态码")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="挂起不响应的比例")
+    parser.add_argument("--stall-seconds", type=float, default=30.0, help="挂起时长（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    from src.utils.fake_model_server import FakeModelServer, FakeServerConfig
+
+    config = FakeServerConfig(
+        latency=args.latency,
+        embed_latency=args.embed_latency,
+        tokens_per_s=args.tokens_per_s,
+        tokens=args.tokens,
+        embedding_dim=args.embedding_dim,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        seed=args.seed
+    )
+    server = FakeModelServer(args.host, args.port, config).start()
+    print(f"假模型服务: {server.url}（Ollama）  {server.url}/v1（OpenAI）  统计: {server.url}/_fake/stats")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+压力测试脚本 - 模拟多个并发会话，按并发梯度报告吞吐、延迟分位数、错误率和饱和点
+
+问题组合: 知识库问题默认从已加载的文档片段中截取（或 --questions 指定JSONL问题文件），
+另按权重混入通用问题和闲聊。报告写入 --output（JSON），同时打印表格。
+
+用法:
+    # 进程内调用 chat_with_sources，使用本地假模型服务（不需要GPU）
+    python loadgen.py --fake-server --levels 1,2,4,8,16 --duration 30
+
+    # 通过HTTP接口压测已启动的服务
+    python loadgen.py --target http --url http://localhost:7860 --levels 1,4,16,64
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+from pathlib import Path
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发会话压力测试")
+    parser.add_argument("--target", choices=["sources", "chat", "http"], default="sources",
+                        help="sources: chat_with_sources；chat: chat_with_ai（带会话）；http: POST /api/chat")
+    parser.add_argument("--url", default="http://localhost:7860", help="HTTP压测的服务地址")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="并发级别，逗号分隔")
+    parser.add_argument("--duration", type=float, default=30.0, help="每个并发级别的运行时长（秒）")
+    parser.add_argument("--warmup", type=float, default=0.0, help="每级开始后不计入统计的时长（秒）")
+    parser.add_argument("--think-time", type=float, default=1.0, help="平均思考时间（秒，指数分布）")
+    parser.add_argument("--questions", default=None, help="知识库问题文件（JSONL，question字段）")
+    parser.add_argument("--mix", default="knowledge=0.7,general=0.2,small_talk=0.1", help="问题类型权重")
+    parser.add_argument("--p99-slo-ms", type=float, default=None, help="p99延迟上限，超过视为饱和")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="错误率上限，超过视为饱和")
+    parser.add_argument("--stop-on-saturation", action="store_true", help="达到饱和点后停止")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--fake-server", action="store_true", help="在本进程启动假模型服务并让Ollama指向它")
+    parser.add_argument("--fake-latency", default="lognormal:-1.5,0.5", help="假模型服务的延迟分布")
+    parser.add_argument("--fake-tokens-per-s", type=float, default=40.0, help="假模型服务的吐字速度")
+    parser.add_argument("--output", default="logs/load_test.json", help="报告文件")
+    args = parser.parse_args()
+
+    from src.core.batch_qa import load_questions
+    from src.core.load_generator import (AssistantTarget, HttpTarget, LoadTestRunner, QuestionMix,
+                                    format_report, questions_from_documents)
+
+    server = None
+    if args.fake_server:
+        from src.utils.fake_model_server import FakeModelServer, FakeServerConfig
+        server = FakeModelServer(config=FakeServerConfig(latency=args.fake_latency, tokens_per_s=args.fake_tokens_per_s,
+                                                         seed=args.seed)).start()
+        os.environ["OLLAMA_BASE_URL"] = server.url
+        os.environ["OLLAMA_ENDPOINTS"] = ""
+
+    knowledge = [item["question"] for item in load_questions(args.questions)] if args.questions else []
+    if args.target == "http":
+        target = HttpTarget(args.url)
+    else:
+        from main import AIDocumentAssistant
+        assistant = AIDocumentAssistant()
+        if server is not None:
+            # 只修改内存中的配置，不写回 cache/model_config.json
+            assistant.model_manager.current_config["provider"] = "ollama"
+            assistant.model_manager.current_config["ollama"]["base_url"] = server.url
+        assistant.initialize_system()
+        if not knowledge:
+            knowledge = questions_from_documents(assistant.get_loaded_documents(), seed=args.seed)
+        target = AssistantTarget(assistant, mode=args.target)
+
+    weights = {name.strip(): float(value) for name, value in (part.split("=") for part in args.mix.split(",") if part.strip())}
+    runner = LoadTestRunner(target, QuestionMix(knowledge=knowledge, weights=weights), think_time=args.think_time,
+                            duration=args.duration, warmup=args.warmup, seed=args.seed)
+    try:
+        report = runner.run([int(level) for level in args.levels.split(",")], p99_slo_ms=args.p99_slo_ms,
+                            max_error_rate=args.max_error_rate, stop_on_saturation=args.stop_on_saturation)
+        if server is not None:
+            report["fake_server"] = server.get_stats()
+    finally:
+        if server is not None:
+            server.stop()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(format_report(report))
+    print(f"报告: {output}")
+
+
+if __name__ == "__main__":
+    main()
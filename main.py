@@ -1,56 +1,247 @@
 # main.py - 增强版主程序
 import os
 import sys
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
-import gradio as gr
-from typing import List, Tuple, Dict
+from typing import Any, Iterator, List, Tuple, Dict
 
 # 添加src到Python路径
 sys.path.insert(0, str(Path(__file__).parent))
 
+# 注意：gradio、langchain、faiss、PyMuPDF等重量级依赖只在首次使用时导入，
+# 保证CLI工具、测试和健康检查能快速启动
 from config import *
 from src.core.chat_manager import ChatManager
-from src.core.pdf_processor import PDFProcessor
 from src.core.document_processor import DocumentProcessor
-from src.core.document_analyzer import DocumentAnalyzer
+from src.core.query_planner import QueryPlanner, build_knowledge_prompt
+from src.core.relevance import RelevanceThresholds, parse_thresholds
+from src.core.retrieval import CoalescingSearcher, QueryEmbeddingCache
 from src.utils.cache_manager import CacheManager
+from src.utils.document_cache import DocumentCache
 from src.utils.logger import get_logger, logger_manager
 from src.utils.model_manager import ModelManager
+from src.utils.profiler import get_slow_request_monitor
+from src.utils.tracing import span, trace_request
+from src.utils.usage import UsageTracker, get_usage_store, merge_usage
 
-# 设置日志
-logger_manager.setup_global_logging()
 logger = get_logger(__name__)
 
-# 全局管理器
-chat_manager = ChatManager()
-pdf_processor = PDFProcessor()
-cache_manager = CacheManager()
+# 每个片段除正文和向量外的常驻内存估算：ID映射的两个字典项和ID字符串、元数据过滤索引中的集合项
+CHUNK_OVERHEAD_BYTES = 400
+
+# 全局管理器（首次使用时创建）
+@lru_cache(maxsize=None)
+def get_chat_manager() -> ChatManager:
+    return ChatManager()
+
+@lru_cache(maxsize=None)
+def get_cache_manager() -> CacheManager:
+    return CacheManager()
+
+@lru_cache(maxsize=None)
+def get_assistant() -> "AIDocumentAssistant":
+    return AIDocumentAssistant()
+
+_LAZY_GLOBALS = {
+    "chat_manager": get_chat_manager,
+    "cache_manager": get_cache_manager,
+    "assistant": get_assistant,
+}
+
+def create_kb_manager(default_assistant: "AIDocumentAssistant"):
+    """创建多知识库管理器，默认知识库即原有的 docs/ 和 cache/"""
+    from src.core.knowledge_bases import KnowledgeBaseManager
+    
+    return KnowledgeBaseManager(
+        lambda name, docs_dir, cache_dir: AIDocumentAssistant(
+            role="standalone", docs_dir=docs_dir, cache_dir=cache_dir, name=name
+        ),
+        root_dir=KB_ROOT,
+        memory_budget_mb=KB_MEMORY_BUDGET_MB,
+        max_loaded=KB_MAX_LOADED,
+        default_assistant=default_assistant
+    )
+
+def __getattr__(name: str):
+    """兼容旧的 main.assistant / main.chat_manager 用法"""
+    if name in _LAZY_GLOBALS:
+        return _LAZY_GLOBALS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class AIDocumentAssistant:
     """AI文档助手主类"""
     
-    def __init__(self):
+    def __init__(self, role: str = None, docs_dir: str = "docs", cache_dir: str = None, name: str = "default"):
+        """
+        Args:
+            role: 服务角色 standalone / writer / reader，默认读取SERVING_ROLE
+            docs_dir: 文档目录
+            cache_dir: 缓存根目录（向量库、快照、解析缓存），默认使用 cache/ 下的原有位置
+            name: 知识库名称
+        """
+        self.role = role or SERVING_ROLE
+        self.name = name
+        self.docs_dir = Path(docs_dir)
+        self.generation = None  # 当前加载的快照代号
+        self._refresh_thread = None
         self.current_session = None
         self.loaded_documents = []
         self.qa_chain = None
         self.llm = None
-        self.agent = None
-        self.document_processor = DocumentProcessor()
+        self._agent = None
+        from src.utils.vector_persistence import VectorPersistenceManager
+        from src.utils.warm_snapshot import SnapshotStore
+        if cache_dir is None:
+            self.vector_manager = VectorPersistenceManager()
+            self.snapshot_store = SnapshotStore()
+            document_cache_dir = "cache/documents"
+        else:
+            self.vector_manager = VectorPersistenceManager(os.path.join(cache_dir, "vector"))
+            self.snapshot_store = SnapshotStore(os.path.join(cache_dir, "snapshot"))
+            document_cache_dir = os.path.join(cache_dir, "documents")
+        # 解析缓存：同一文件版本只解析一次
+        self.document_cache = DocumentCache(document_cache_dir, fingerprint_func=self.vector_manager.calculate_file_fingerprint)
+        self.document_processor = DocumentProcessor(cache=self.document_cache)
+        self.vector_store = None
+        # 查询向量缓存 + 并发查询合并
+        self.searcher = CoalescingSearcher(QueryEmbeddingCache(QUERY_CACHE_SIZE), window_ms=QUERY_COALESCE_MS)
+        # 查询规划：先向量检索（无结果时关键词兜底）确定回答路径，每个问题只调用一次大模型
+        self.query_planner = QueryPlanner(small_talk_gate=SMALL_TALK_GATE)
+        # 相关性距离阈值：显式配置优先，否则按索引自动校准
+        self.relevance_thresholds = RelevanceThresholds(parse_thresholds(RELEVANCE_THRESHOLDS), quantile=RELEVANCE_QUANTILE)
+        self._metadata_index = None  # 元数据过滤索引，随向量库变化重建
+        self._metadata_index_key = None
+        self.docs_watcher = None
+        self._index_lock = threading.RLock()  # 串行化知识库写操作
         self.document_analyzer = None  # 延迟初始化
-        self.model_manager = ModelManager()  # 新增模型管理器
+        self.model_manager = ModelManager(pool_size=HTTP_POOL_SIZE, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES)
+        # 慢请求捕获（进程内共享，SLOW_REQUEST_MS=0 时为None）
+        self.slow_requests = get_slow_request_monitor()
+        
+    @property
+    def agent(self):
+        """工具路由（首次访问时创建，避免每次构建知识库都重建），见 agent_setup.ToolRouter"""
+        if self._agent is None and self.qa_chain is not None and self.llm is not None:
+            from agent_setup import create_agent
+            from tools import get_tools
+            tools = get_tools(self.qa_chain, SERPAPI_KEY)
+            self._agent = create_agent(tools, self.llm)
+        return self._agent
+    
+    @agent.setter
+    def agent(self, value):
+        self._agent = value
+    
+    def _build_qa_chain(self, vector_store):
+        """基于已有向量库创建对话检索链"""
+        from langchain.memory import ConversationBufferMemory
+        from langchain.chains import ConversationalRetrievalChain
         
+        memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        
+        return ConversationalRetrievalChain.from_llm(
+            llm=self.llm,
+            retriever=vector_store.as_retriever(),
+            memory=memory,
+            verbose=True,
+            return_source_documents=True
+        )
+    
+    def _load_snapshot(self, embeddings, fingerprints: Dict):
+        """尝试从预热快照加载向量库和片段存储"""
+        try:
+            manifest = self.snapshot_store.read_manifest()
+            if not self.snapshot_store.is_valid(manifest, fingerprints, self.model_manager.get_embedding_signature()):
+                return None
+            vector_store, chunk_store, _ = self.snapshot_store.load(embeddings)
+            return vector_store, chunk_store
+        except Exception as e:
+            logger.warning(f"加载预热快照失败: {e}")
+            return None
+    
+    def _publish_snapshot(self, vector_store, fingerprints: Dict):
+        """发布预热快照，供新进程快速启动"""
+        # 写进程必须发布快照，只读工作进程依赖它获取新索引
+        if not (WARM_START or self.role == "writer"):
+            return
+        try:
+            self.snapshot_store.publish(vector_store, fingerprints, self.model_manager.get_embedding_signature())
+        except Exception as e:
+            logger.warning(f"发布预热快照失败: {e}")
+    
+    @property
+    def read_only(self) -> bool:
+        return self.role == "reader"
+    
+    def refresh_generation(self) -> bool:
+        """只读工作进程：发现写进程发布的新快照后原子切换
+        
+        Returns:
+            是否切换到了新快照
+        """
+        generation = self.snapshot_store.current_generation()
+        if not generation or generation == self.generation:
+            return False
+        
+        embeddings = self.model_manager.create_embeddings()
+        result = self.snapshot_store.load(embeddings, generation, read_only=True)
+        if result is None:
+            return False
+        vector_store, chunk_store, _ = result
+        
+        if self.llm is None:
+            self.llm = self.model_manager.create_llm()
+        qa_chain = self._build_qa_chain(vector_store)
+        
+        # 新状态准备完毕后再切换引用，进行中的请求继续使用旧快照
+        self.loaded_documents = chunk_store
+        self.vector_store = vector_store
+        self.qa_chain = qa_chain
+        self.agent = None
+        self.generation = generation
+        logger.info(f"已切换到快照 {generation}，共 {len(chunk_store)} 个文档片段")
+        return True
+    
+    def _initialize_reader(self, wait_timeout: float = 300):
+        """只读工作进程初始化：等待写进程发布快照，以只读映射加载并定期检查新版本"""
+        deadline = time.monotonic() + wait_timeout
+        while self.snapshot_store.current_generation() is None:
+            if time.monotonic() > deadline:
+                raise RuntimeError("等待写进程发布索引快照超时")
+            logger.info("等待写进程发布索引快照...")
+            time.sleep(1)
+        
+        self.refresh_generation()
+        
+        def refresh_loop():
+            while True:
+                time.sleep(GENERATION_POLL_INTERVAL)
+                try:
+                    self.refresh_generation()
+                except Exception as e:
+                    logger.warning(f"切换索引快照失败: {e}")
+        
+        if self._refresh_thread is None:
+            self._refresh_thread = threading.Thread(target=refresh_loop, name="generation-refresh", daemon=True)
+            self._refresh_thread.start()
+    
     def initialize_system(self):
         """初始化系统，支持向量数据库持久化，处理docs目录中的所有格式文件"""
+        if self.read_only:
+            return self._initialize_reader()
+        
         try:
-            from src.utils.vector_persistence import VectorPersistenceManager
             from rag_setup import create_rag_chain_from_documents
             from src.core.document_processor import DocumentProcessor
             
-            self.vector_manager = VectorPersistenceManager()
+            # 清理已删除文件的解析缓存
+            self.document_cache.prune()
             
             # 使用docs目录
-            docs_dir = Path("docs")
-            docs_dir.mkdir(exist_ok=True)
+            docs_dir = self.docs_dir
+            docs_dir.mkdir(parents=True, exist_ok=True)
             
             # 确保文档处理器已初始化
             if not hasattr(self, 'document_processor') or not self.document_processor:
@@ -76,51 +267,38 @@ class AIDocumentAssistant:
                     self.loaded_documents, model_manager=self.model_manager
                 )
                 
-                # 创建agent
-                from agent_setup import create_agent
-                from tools import get_tools
-                tools = get_tools(self.qa_chain, SERPAPI_KEY)
-                self.agent = create_agent(tools, self.llm)
+                self.agent = None
                 return
                 
             all_file_paths = [str(f) for f in all_files]
             
             # 检查文件是否有变化 - 使用绝对路径，并确保文件存在
             abs_file_paths = [os.path.abspath(f) for f in all_file_paths if os.path.exists(f)]
-            has_changes = self.vector_manager.has_changes(abs_file_paths)
+            changes = self.vector_manager.get_changes(abs_file_paths)
+            logger.info(f"文件变化检测: {changes.summary()}")
             
-            if not has_changes and all_file_paths:
-                # 尝试从缓存加载
+            if not changes.has_changes and all_file_paths:
+                # 优先从预热快照加载（内存映射，无需反序列化pickle），其次从缓存加载
+                saved_fingerprints = self.vector_manager.load_fingerprints()
                 embeddings = self.model_manager.create_embeddings()
-                result = self.vector_manager.load_vector_store(embeddings)
+                result = self._load_snapshot(embeddings, saved_fingerprints) if WARM_START else None
+                if result is None:
+                    result = self.vector_manager.load_vector_store(
+                        embeddings, self.model_manager.get_embedding_signature()
+                    )
+                    if result:
+                        self._publish_snapshot(result[0], saved_fingerprints)
                 
                 if result:
                     vector_store, self.loaded_documents = result
+                    self.vector_store = vector_store
                     
-                    # 创建LLM
+                    # 创建LLM和检索链，agent在首次使用时创建
                     self.llm = self.model_manager.create_llm()
-                    
-                    # 创建检索器
-                    from langchain.memory import ConversationBufferMemory
-                    from langchain.chains import ConversationalRetrievalChain
-                    
-                    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-                    
-                    self.qa_chain = ConversationalRetrievalChain.from_llm(
-                        llm=self.llm,
-                        retriever=vector_store.as_retriever(),
-                        memory=memory,
-                        verbose=True,
-                        return_source_documents=True
-                    )
+                    self.qa_chain = self._build_qa_chain(vector_store)
+                    self.agent = None
                     
                     logger.info("从缓存加载向量存储成功")
-                    
-                    # 创建agent
-                    from agent_setup import create_agent
-                    from tools import get_tools
-                    tools = get_tools(self.qa_chain, SERPAPI_KEY)
-                    self.agent = create_agent(tools, self.llm)
                     return
                 else:
                     logger.warning("缓存加载失败，将重新处理文档")
@@ -156,25 +334,25 @@ class AIDocumentAssistant:
             
             if self.loaded_documents:
                 # 创建新的向量存储
-                self.qa_chain, self.llm = create_rag_chain_from_documents(
-                    self.loaded_documents, model_manager=self.model_manager
-                )
+                with span("index", documents=len(self.loaded_documents)):
+                    self.qa_chain, self.llm = create_rag_chain_from_documents(
+                        self.loaded_documents, model_manager=self.model_manager
+                    )
                 
                 # 保存到缓存
-                embeddings = self.model_manager.create_embeddings()
                 vector_store = self.qa_chain.retriever.vectorstore
-                self.vector_manager.save_vector_store(vector_store, self.loaded_documents)
+                self.vector_store = vector_store
+                self.vector_manager.save_vector_store(
+                    vector_store, self.loaded_documents, self.model_manager.get_embedding_signature()
+                )
                 
                 # 保存文件指纹 - 使用绝对路径
                 abs_file_paths = [os.path.abspath(f) for f in all_file_paths]
                 fingerprints = self.vector_manager.get_files_fingerprint(abs_file_paths)
                 self.vector_manager.save_fingerprints(fingerprints)
+                self._publish_snapshot(vector_store, fingerprints)
                 
-                # 创建agent
-                from agent_setup import create_agent
-                from tools import get_tools
-                tools = get_tools(self.qa_chain, SERPAPI_KEY)
-                self.agent = create_agent(tools, self.llm)
+                self.agent = None
                 
                 logger.info("向量存储已创建并保存到缓存")
                 
@@ -195,188 +373,200 @@ class AIDocumentAssistant:
             logger.error(f"聊天错误: {e}")
             return f"抱歉，系统遇到了一些问题: {str(e)}"
     
-    def chat_with_sources(self, message: str) -> tuple[str, list[str]]:
-        """增强版聊天方法，返回回复和相关文档源 - 优先知识库+大模型结合"""
-        try:
-            if not message or not message.strip():
-                return "请输入有效的问题", []
-            
-            # 获取当前知识库中的实际文件
-            current_files = []
-            if os.path.exists("docs"):
-                for ext in ['*.pdf', '*.docx', '*.doc', '*.txt', '*.md']:
-                    current_files.extend([f.name for f in Path("docs").glob(ext)])
-            
-            # 优先从知识库获取答案
-            knowledge_response = None
-            source_documents = []
-            
-            if self.qa_chain and self.loaded_documents and current_files:
-                try:
-                    # 直接使用检索器获取相关文档（降低阈值）
-                    if hasattr(self.qa_chain, 'retriever'):
-                        retrieved_docs = self.qa_chain.retriever.get_relevant_documents(message)
-                        
-                        if retrieved_docs:
-                            # 构建上下文
-                            context_parts = []
-                            for i, doc in enumerate(retrieved_docs[:5]):  # 增加到5个文档
-                                context_parts.append(f"文档{i+1}内容：{doc.page_content[:500]}...")
-                            
-                            context_str = "\n\n".join(context_parts)
-                            
-                            # 使用知识库内容回答
-                            enhanced_prompt = f"""
-                            基于以下知识库文档内容回答用户问题：
-                            
-                            知识库内容：
-                            {context_str}
-                            
-                            用户问题：{message}
-                            
-                            要求：
-                            1. 优先使用知识库中的准确信息
-                            2. 结合大模型知识进行补充和完善
-                            3. 明确指出这是基于知识库的回答
-                            4. 回答要准确、详细、有用
-                            """
-                            
-                            if self.llm:
-                                enhanced_response = self.llm.invoke(enhanced_prompt).content
-                                knowledge_response = enhanced_response
-                                source_documents = context_parts
-                        else:
-                            # 即使没有找到高度相关的内容，也尝试全文搜索
-                            logger.info("向量检索未找到高度相关内容，尝试全文搜索...")
-                            try:
-                                # 使用简单的关键词匹配
-                                search_terms = message.lower().split()
-                                relevant_docs = []
-                                
-                                for doc in self.loaded_documents:
-                                    content = doc.page_content.lower()
-                                    score = 0
-                                    for term in search_terms:
-                                        if term in content:
-                                            score += 1
-                                    if score > 0:
-                                        relevant_docs.append((doc, score))
-                                
-                                # 按匹配度排序
-                                relevant_docs.sort(key=lambda x: x[1], reverse=True)
-                                
-                                if relevant_docs:
-                                    context_parts = []
-                                    for i, (doc, score) in enumerate(relevant_docs[:3]):
-                                        context_parts.append(f"相关文档{i+1}：{doc.page_content[:500]}...")
-                                    
-                                    context_str = "\n\n".join(context_parts)
-                                    
-                                    enhanced_prompt = f"""
-                                    基于以下文档内容回答用户问题：
-                                    
-                                    文档内容：
-                                    {context_str}
-                                    
-                                    用户问题：{message}
-                                    
-                                    回答要求：
-                                    1. 基于提供的文档内容回答
-                                    2. 明确指出这是基于知识库的回答
-                                    3. 回答要准确、有用
-                                    """
-                                    
-                                    if self.llm:
-                                        enhanced_response = self.llm.invoke(enhanced_prompt).content
-                                        knowledge_response = enhanced_response
-                                        source_documents = context_parts
-                            except Exception as e:
-                                logger.warning(f"全文搜索失败: {e}")
-                            
-                    else:
-                        # 使用传统QA链
-                        result = self.qa_chain.invoke({"question": message, "chat_history": []})
-                        knowledge_response = result.get("answer", "")
-                        source_docs = result.get("source_documents", [])
-                        if source_docs:
-                            source_documents = [doc.page_content for doc in source_docs]
-                            
-                except Exception as e:
-                    logger.warning(f"知识库查询失败: {e}")
-                    # 如果知识库查询失败，直接搜索文档
-                    try:
-                        from src.core.document_analyzer import DocumentAnalyzer
-                        if hasattr(self, 'llm') and self.llm:
-                            analyzer = DocumentAnalyzer(self.llm)
-                            search_result = analyzer.search_documents(self.loaded_documents, message)
-                            if search_result and len(search_result.strip()) > 10:
-                                knowledge_response = search_result
-                                source_documents = [search_result]
-                    except:
-                        pass
-            
-            # 如果没有知识库答案但有文档，尝试直接分析
-            if not knowledge_response and current_files and self.loaded_documents:
-                try:
-                    # 直接搜索文档内容
-                    from src.core.document_analyzer import DocumentAnalyzer
-                    if hasattr(self, 'llm') and self.llm:
-                        analyzer = DocumentAnalyzer(self.llm)
-                        search_result = analyzer.search_documents(self.loaded_documents, message)
-                        if search_result and len(search_result.strip()) > 10:
-                            knowledge_response = search_result
-                            source_documents = [search_result]
-                except:
-                    pass
-            
-            # 最终处理：始终使用知识库优先策略
-            if knowledge_response and knowledge_response.strip():
-                response = knowledge_response
+    @property
+    def metadata_index(self):
+        """当前向量库的元数据过滤索引，向量库替换或更新后重建"""
+        return self._metadata_index_for(self.vector_store)
+    
+    def _metadata_index_for(self, vector_store):
+        """指定向量库的元数据过滤索引（只缓存最近一个向量库的）"""
+        from src.core.metadata_index import MetadataIndex
+        
+        if vector_store is None:
+            return None
+        key = (id(vector_store), vector_store.index.ntotal)
+        with self._index_lock:
+            if self._metadata_index is None or self._metadata_index_key != key:
+                self._metadata_index = MetadataIndex.from_vector_store(vector_store)
+                self._metadata_index_key = key
+            return self._metadata_index
+    
+    def get_filter_options(self) -> Dict[str, List]:
+        """可用于限定检索范围的属性取值"""
+        index = self.metadata_index
+        if index is None:
+            return {"filename": [], "type": [], "page": []}
+        return {field: index.values(field) for field in ("filename", "type", "page")}
+    
+    def retrieve_with_scores(self, message: str, k: int = None, filters: Dict = None) -> List[Tuple]:
+        """检索与问题相关的文档片段及距离分数（经过查询向量缓存和并发合并）
+        
+        Args:
+            filters: 限定检索范围，如 {"filename": ["a.pdf"], "page": {"gte": 1, "lte": 5}}
+        """
+        # 只读取一次引用：增量入库会整体替换向量库，本次检索始终使用同一个
+        vector_store, qa_chain = self.vector_store, self.qa_chain
+        if vector_store is None:
+            return [(doc, 0.0) for doc in qa_chain.retriever.get_relevant_documents(message)]
+        if k is None:
+            k = qa_chain.retriever.search_kwargs.get("k", 4) if qa_chain else 4
+        id_filter = self._metadata_index_for(vector_store).select(filters) if filters else None
+        return self.searcher.search(vector_store, message, k, id_filter)
+    
+    def retrieve(self, message: str, k: int = None, filters: Dict = None) -> List:
+        """检索与问题相关的文档片段，参数见 retrieve_with_scores()"""
+        return [doc for doc, _ in self.retrieve_with_scores(message, k, filters)]
+    
+    @staticmethod
+    def build_knowledge_prompt(message: str, retrieved_docs: List) -> Tuple[str, List[str]]:
+        """根据检索到的文档构建知识库问答提示词，返回 (提示词, 上下文片段)"""
+        return build_knowledge_prompt(message, retrieved_docs)
+    
+    def plan_query(self, message: str, filters: Dict = None):
+        """确定回答路径（知识库 / 关键词 / 通用）并构建提示词，不调用大模型"""
+        # 限定范围时，关键词兜底检索也只在范围内的片段中进行
+        keyword_filter = None
+        if filters:
+            from src.core.metadata_index import matches_filters
+            keyword_filter = lambda doc: matches_filters(doc.metadata, filters)
+        
+        # 获取当前知识库中的实际文件
+        current_files = []
+        if self.docs_dir.exists():
+            for ext in ['*.pdf', '*.docx', '*.doc', '*.txt', '*.md']:
+                current_files.extend([f.name for f in self.docs_dir.glob(ext)])
+        
+        vector_search = None
+        max_distance = None
+        if self.qa_chain and self.loaded_documents and current_files:
+            vector_search = lambda: self.retrieve_with_scores(message, filters=filters)
+            if self.vector_store is not None:
+                max_distance = self.relevance_thresholds.get(self.vector_store)
+        return self.query_planner.plan(message, vector_search, self.loaded_documents, max_distance, keyword_filter)
+    
+    def generate(self, prompt, session_id: str = None, chain=None) -> Tuple[str, Dict]:
+        """调用大模型（或问答链）并记录token用量
+        
+        Args:
+            prompt: 提示词；传入 chain 时为链的输入
+            chain: 为None时直接调用 self.llm
+        
+        Returns:
+            (回答, 用量)，用量同时计入按天/模型/会话/知识库的汇总
+        """
+        tracker = UsageTracker(**self.model_manager.get_current_model())
+        with span("generate") as current:
+            if chain is None:
+                result = self.llm.invoke(prompt, config=tracker.config)
+                # 聊天模型返回消息对象，Ollama等文本模型直接返回字符串
+                response = getattr(result, "content", result)
+                usage = tracker.finish(prompt, response)
             else:
-                # 使用大模型，但不再提示"未找到相关内容"
+                response = chain.invoke(prompt, config=tracker.config).get("answer", "")
+                usage = tracker.finish(prompt.get("question", ""), response)
+            current.set(prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+        usage["cost"] = get_usage_store().record(usage, session_id=session_id, knowledge_base=self.name)
+        return response, usage
+
+    def generate_stream(self, prompt: str, session_id: str = None) -> Iterator[str]:
+        """流式调用大模型，逐块产生回答文本；生成结束后记录token用量（同 generate()）"""
+        tracker = UsageTracker(**self.model_manager.get_current_model())
+        parts = []
+        with span("generate") as current:
+            for chunk in self.llm.stream(prompt, config=tracker.config):
+                # 聊天模型产生消息块，Ollama等文本模型直接产生字符串
+                text = getattr(chunk, "content", chunk)
+                parts.append(text)
+                yield text
+            usage = tracker.finish(prompt, "".join(parts))
+            current.set(prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+        get_usage_store().record(usage, session_id=session_id, knowledge_base=self.name)
+
+    def get_usage_report(self, days: int = 7) -> Dict:
+        """最近几天的token用量和费用汇总"""
+        return get_usage_store().report(days)
+
+    def chat_with_sources(self, message: str, filters: Dict = None, session_id: str = None) -> tuple[str, list[str]]:
+        """增强版聊天方法，返回回复和相关文档源 - 优先知识库+大模型结合
+        
+        先检索（向量检索无结果时用关键词兜底）并确定回答路径，再只调用一次大模型生成回答。
+        
+        Args:
+            filters: 限定检索范围（文件名、格式、页码），见 retrieve_with_scores()
+            session_id: 会话标识，用于token用量统计和慢请求诊断
+        """
+        with trace_request("chat", knowledge_base=self.name) as trace:
+            trace.tag(session_id=session_id, query=message)
+            try:
+                if not message or not message.strip():
+                    return "请输入有效的问题", []
+                
+                plan = self.plan_query(message, filters)
+                trace.set(route=plan.route, sources=len(plan.sources))
+                if not self.llm:
+                    return "抱歉，我暂时无法回答这个问题。", []
+                
                 try:
-                    if self.llm:
-                        if not current_files:
-                            general_prompt = f"用户问题：{message}\n\n请直接回答这个问题。"
-                        else:
-                            # 即使没有找到具体内容，也基于文档主题回答
-                            doc_themes = []
-                            for doc in self.loaded_documents[:3]:
-                                preview = doc.page_content[:200].replace('\n', ' ')
-                                doc_themes.append(preview)
-                            
-                            themes_str = "；".join(doc_themes)
-                            general_prompt = f"""
-                            用户问题：{message}
-                            
-                            当前知识库包含以下类型的文档内容：{themes_str}
-                            
-                            请基于通用知识回答这个问题，并结合知识库可能相关的背景信息。
-                            """
-                        response = self.llm.invoke(general_prompt).content
-                    else:
-                        response = "抱歉，我暂时无法回答这个问题。"
+                    response, _ = self.generate(plan.prompt, session_id=session_id)
                 except Exception as e:
                     logger.error(f"大模型回复错误: {e}")
-                    response = "抱歉，系统遇到了一些问题，无法回答您的问题。"
-            
-            return response, source_documents
+                    trace.set(status="error")
+                    return "抱歉，系统遇到了一些问题，无法回答您的问题。", []
                 
-        except Exception as e:
-            logger.error(f"聊天错误: {e}")
-            return f"抱歉，系统遇到了一些问题: {str(e)}", []
+                return response, plan.sources
+                    
+            except Exception as e:
+                logger.error(f"聊天错误: {e}")
+                trace.set(status="error")
+                return f"抱歉，系统遇到了一些问题: {str(e)}", []
+
+    def stream_chat_with_sources(self, message: str, filters: Dict = None, session_id: str = None) -> Iterator[Tuple[str, Any]]:
+        """流式版 chat_with_sources()：先产生 ("sources", 片段列表)，再随模型输出产生若干 ("answer", 文本块)
+        
+        追踪上下文保存在contextvars中，生成器需在同一线程中迭代。
+        """
+        with trace_request("chat", knowledge_base=self.name) as trace:
+            trace.tag(session_id=session_id, query=message)
+            if not message or not message.strip():
+                yield "sources", []
+                yield "answer", "请输入有效的问题"
+                return
+            
+            try:
+                plan = self.plan_query(message, filters)
+            except Exception as e:
+                logger.error(f"聊天错误: {e}")
+                trace.set(status="error")
+                yield "sources", []
+                yield "answer", f"抱歉，系统遇到了一些问题: {str(e)}"
+                return
+            
+            trace.set(route=plan.route, sources=len(plan.sources))
+            if not self.llm:
+                yield "sources", []
+                yield "answer", "抱歉，我暂时无法回答这个问题。"
+                return
+            
+            yield "sources", plan.sources
+            try:
+                for text in self.generate_stream(plan.prompt, session_id=session_id):
+                    yield "answer", text
+            except Exception as e:
+                logger.error(f"大模型回复错误: {e}")
+                trace.set(status="error")
+                yield "answer", "抱歉，系统遇到了一些问题，无法回答您的问题。"
 
     def clear_chat(self):
         """清空聊天记录"""
         try:
-            chat_manager.clear_all_sessions()
+            get_chat_manager().clear_all_sessions()
         except Exception as e:
             logger.error(f"清空聊天记录失败: {e}")
 
     def get_knowledge_base_files(self) -> List[str]:
         """获取当前知识库中的文件列表"""
         try:
-            docs_dir = Path("docs")
+            docs_dir = self.docs_dir
             files = []
             if docs_dir.exists():
                 for ext in ['*.pdf', '*.docx', '*.doc', '*.txt', '*.md']:
@@ -392,6 +582,8 @@ class AIDocumentAssistant:
 
     def chat_with_ai(self, message: str, history: List[Dict[str, str]], session_id: str) -> Tuple[List[Dict[str, str]], str]:
         """与AI对话，智能优先从知识库找答案，找不到再用大模型回复"""
+        chat_manager = get_chat_manager()
+        cache_manager = get_cache_manager()
         try:
             if not message.strip():
                 return history, session_id
@@ -401,6 +593,7 @@ class AIDocumentAssistant:
             
             cache_key = f"{message}_{session_id}"
             cached_response = cache_manager.get(cache_key)
+            usage = None
             
             if cached_response:
                 response = cached_response
@@ -410,8 +603,9 @@ class AIDocumentAssistant:
                 if self.qa_chain:
                     try:
                         # 使用知识库查询
-                        result = self.qa_chain.invoke({"question": message, "chat_history": []})
-                        knowledge_response = result.get("answer", "")
+                        knowledge_response, usage = self.generate(
+                            {"question": message, "chat_history": []}, session_id=session_id, chain=self.qa_chain
+                        )
                         
                         # 只有在明确没有相关内容时才使用通用回复
                         if not knowledge_response or len(knowledge_response.strip()) < 5:
@@ -428,7 +622,8 @@ class AIDocumentAssistant:
                         # 使用大模型进行通用回复
                         if self.llm:
                             general_prompt = f"请用中文回答这个问题：{message}"
-                            response = self.llm.invoke(general_prompt).content
+                            response, general_usage = self.generate(general_prompt, session_id=session_id)
+                            usage = merge_usage(usage, general_usage)
                         else:
                             # 如果没有初始化LLM，使用默认回复
                             response = "抱歉，我暂时无法回答这个问题。"
@@ -441,7 +636,9 @@ class AIDocumentAssistant:
                     cache_manager.set(cache_key, response, ttl=3600)
             
             chat_manager.add_message(session_id, "user", message)
-            chat_manager.add_message(session_id, "assistant", response)
+            # 记录本轮回答的token用量（缓存命中时没有模型调用）
+            metadata = {"usage": usage} if usage else {"cached": True} if cached_response else None
+            chat_manager.add_message(session_id, "assistant", response, metadata=metadata)
             
             return chat_manager.get_chat_history(session_id), session_id
             
@@ -467,10 +664,11 @@ class AIDocumentAssistant:
         
         results = []
         new_documents = []
+        uploaded_paths = []
         
         # 确保docs目录存在
-        docs_dir = Path("docs")
-        docs_dir.mkdir(exist_ok=True)
+        docs_dir = self.docs_dir
+        docs_dir.mkdir(parents=True, exist_ok=True)
         
         for file_path in files:
             try:
@@ -491,6 +689,7 @@ class AIDocumentAssistant:
                 # 处理文档
                 documents = self.document_processor.process_file(str(target_path))
                 new_documents.extend(documents)
+                uploaded_paths.append(str(target_path))
                 
                 # 获取文档信息
                 info = self.document_processor.get_document_info(str(target_path))
@@ -505,9 +704,9 @@ class AIDocumentAssistant:
                 results.append(f"[错误] {os.path.basename(str(file_path))} - 处理失败: {str(e)}")
         
         if new_documents:
-            # 重新创建RAG链，包含所有docs目录的文件
-            print("正在重新创建知识库...")
-            self._recreate_rag_chain()
+            # 增量更新知识库，只嵌入新上传的文件
+            print("正在更新知识库...")
+            self.apply_document_changes(uploaded_paths)
             results.append(f"[成功] 成功添加 {len(new_documents)} 个文档到知识库")
             print(f"[成功] 知识库更新完成，当前共加载 {len(self.loaded_documents)} 个文档片段")
         else:
@@ -517,15 +716,18 @@ class AIDocumentAssistant:
     
     def clear_knowledge_base(self) -> str:
         """清空知识库"""
+        if self.read_only:
+            return "❌ 只读工作进程不支持清空知识库，请在写进程中操作"
+        
         try:
             self.loaded_documents = []
             self.qa_chain = None
+            self.vector_store = None
             self.agent = None
             
             # 清除缓存
-            from src.utils.vector_persistence import VectorPersistenceManager
-            vector_manager = VectorPersistenceManager()
-            vector_manager.clear_all()
+            self.vector_manager.clear_all()
+            self.document_cache.clear()
             
             return "[成功] 知识库已清空"
         except Exception as e:
@@ -538,12 +740,15 @@ class AIDocumentAssistant:
     
     def reload_documents(self):
         """强制重新加载所有文档"""
+        if self.read_only:
+            self.refresh_generation()
+            return len(self.loaded_documents)
+        
         print("正在强制重新加载所有文档...")
         try:
             # 清除缓存
-            from src.utils.vector_persistence import VectorPersistenceManager
-            vector_manager = VectorPersistenceManager()
-            vector_manager.clear_all()
+            self.vector_manager.clear_all()
+            self.document_cache.clear()
             
             # 重新初始化
             self.initialize_system()
@@ -557,8 +762,6 @@ class AIDocumentAssistant:
     def _recreate_rag_chain(self):
         """重新创建RAG链并更新持久化存储"""
         from rag_setup import create_rag_chain_from_documents
-        from agent_setup import create_agent
-        from tools import get_tools
         from src.core.document_processor import DocumentProcessor
         
         # 确保文档处理器已初始化
@@ -569,8 +772,8 @@ class AIDocumentAssistant:
         supported_extensions = ['.pdf', '.txt', '.md', '.docx', '.doc', '.wps', '.pptx', '.ppt', '.xlsx', '.xls']
         
         # 使用docs目录
-        docs_dir = Path("docs")
-        docs_dir.mkdir(exist_ok=True)
+        docs_dir = self.docs_dir
+        docs_dir.mkdir(parents=True, exist_ok=True)
         
         all_documents = []
         all_file_paths = []
@@ -589,88 +792,239 @@ class AIDocumentAssistant:
         
         if self.loaded_documents:
             # 创建新的向量存储
-            self.qa_chain, self.llm = create_rag_chain_from_documents(
-                self.loaded_documents, model_manager=self.model_manager
-            )
+            with span("index", documents=len(self.loaded_documents)):
+                self.qa_chain, self.llm = create_rag_chain_from_documents(
+                    self.loaded_documents, model_manager=self.model_manager
+                )
             
             # 更新持久化存储
             if hasattr(self, 'vector_manager'):
-                embeddings = self.model_manager.create_embeddings()
                 vector_store = self.qa_chain.retriever.vectorstore
-                self.vector_manager.save_vector_store(vector_store, self.loaded_documents)
+                self.vector_store = vector_store
+                self.vector_manager.save_vector_store(
+                    vector_store, self.loaded_documents, self.model_manager.get_embedding_signature()
+                )
                 
-                # 更新文件指纹
-                fingerprints = self.vector_manager.get_files_fingerprint(all_file_paths)
+                # 更新文件指纹 - 与initialize_system一致使用绝对路径
+                abs_file_paths = [os.path.abspath(f) for f in all_file_paths]
+                fingerprints = self.vector_manager.get_files_fingerprint(abs_file_paths)
                 self.vector_manager.save_fingerprints(fingerprints)
+                self._publish_snapshot(vector_store, fingerprints)
                 
                 logger.info("向量存储已更新并保存到缓存")
         else:
             logger.warning("没有找到可处理的文档")
             
-        tools = get_tools(self.qa_chain, SERPAPI_KEY)
-        self.agent = create_agent(tools, self.llm)
+        self.agent = None
 
-    def search_in_documents(self, keyword: str) -> str:
-        """在文档中搜索"""
-        if not keyword.strip():
-            return "请输入搜索关键词"
+    def apply_document_changes(self, file_paths: List[str]):
+        """增量更新知识库：只重新处理指定路径中实际发生变化的文件
         
-        try:
-            docs_dir = Path("docs")
-            if not docs_dir.exists():
-                return "抱歉，当前没有任何文档可供搜索，请先上传文档"
+        Args:
+            file_paths: 可能发生变化的文件路径（新增、修改或已删除）
+        
+        Returns:
+            FileDiff 变化明细，只读工作进程返回None
+        """
+        if self.read_only:
+            # 文件已写入共享的docs目录，由写进程的监听器负责入库
+            logger.info(f"只读工作进程：{len(file_paths)}个文件变化交由写进程入库")
+            return None
+        
+        with trace_request("ingest", knowledge_base=self.name, files=len(file_paths)), self._index_lock:
+            affected = sorted({os.path.abspath(p) for p in file_paths})
+            baseline = self.vector_manager.load_fingerprints()
+            existing = [p for p in affected if os.path.exists(p)]
+            diff = self.vector_manager.fingerprint_index.diff(
+                existing, {p: baseline[p] for p in affected if p in baseline}
+            )
+            if not diff.has_changes:
+                return diff
             
-            # 支持多种格式
-            supported_extensions = ['.pdf', '.txt', '.md', '.docx', '.doc', '.wps', '.pptx', '.ppt', '.xlsx', '.xls']
-            all_files = []
-            for ext in supported_extensions:
-                all_files.extend(list(docs_dir.glob(f"*{ext}")))
+            # 知识库为空时没有可增量更新的向量库；嵌入模型变化后旧向量不可用，直接完整构建
+            if (self.vector_store is None or not self.loaded_documents
+                    or not self.vector_manager.signature_matches(self.model_manager.get_embedding_signature())):
+                self._recreate_rag_chain()
+                return diff
             
-            if not all_files:
-                return "抱歉，当前没有任何支持的文档可供搜索，请先上传文档"
+            # 在副本上修改（快照加载的向量库也会转换为可写），检索在替换前继续使用当前向量库
+            from src.utils.warm_snapshot import copy_vector_store
+            vector_store = copy_vector_store(self.vector_store)
             
-            # 确保文档处理器已初始化
-            if not hasattr(self, 'document_processor') or not self.document_processor:
-                from src.core.document_processor import DocumentProcessor
-                self.document_processor = DocumentProcessor()
+            stale_sources = set(diff.modified + diff.removed)
+            changed_sources = stale_sources | set(diff.added)
             
-            # 使用文档分析器搜索
-            from src.core.document_analyzer import DocumentAnalyzer
-            analyzer = DocumentAnalyzer(self.llm)
+            # 删除旧片段
+            if stale_sources:
+                stale_ids = [
+                    doc_id for doc_id, doc in vector_store.docstore._dict.items()
+                    if os.path.abspath(doc.metadata.get("source", "")) in stale_sources
+                ]
+                if stale_ids:
+                    vector_store.delete(stale_ids)
             
-            all_results = []
-            for file_path in all_files:
+            # 嵌入新增和修改的文件
+            new_documents = []
+            for file_path in diff.changed:
                 try:
-                    documents = self.document_processor.process_file(str(file_path))
-                    if documents:
-                        # 在文档内容中搜索关键词
-                        for doc in documents:
-                            if keyword.lower() in doc.page_content.lower():
-                                # 找到关键词位置
-                                content = doc.page_content
-                                keyword_lower = keyword.lower()
-                                content_lower = content.lower()
-                                
-                                # 计算出现次数
-                                occurrences = content_lower.count(keyword_lower)
-                                
-                                # 找到关键词位置并提取预览
-                                start = content_lower.find(keyword_lower)
-                                if start != -1:
-                                    preview_start = max(0, start - 50)
-                                    preview_end = min(len(content), start + len(keyword) + 50)
-                                    preview = content[preview_start:preview_end]
-                                    preview = preview.replace(keyword, f"**{keyword}**")
-                                    
-                                    all_results.append({
-                                        'filename': file_path.name,
-                                        'page': getattr(doc.metadata, 'page', '未知'),
-                                        'occurrences': occurrences,
-                                        'preview': preview
-                                    })
+                    new_documents.extend(self.document_processor.process_file(file_path))
                 except Exception as e:
-                    logger.warning(f"搜索文件 {file_path} 失败: {e}")
+                    logger.warning(f"处理文件 {file_path} 失败: {e}")
+            if new_documents:
+                with span("index", documents=len(new_documents)):
+                    vector_store.add_documents(new_documents)
+            
+            loaded_documents = [
+                doc for doc in self.loaded_documents
+                if os.path.abspath(doc.metadata.get("source", "")) not in changed_sources
+            ] + new_documents
+            qa_chain = self._build_qa_chain(vector_store) if self.llm is not None else self.qa_chain
             
+            # 新状态准备完毕后再切换引用（过滤索引按向量库对象重建）
+            self.vector_store = vector_store
+            self.loaded_documents = loaded_documents
+            self.qa_chain = qa_chain
+            self.agent = None
+            
+            # 持久化向量库和指纹
+            self.vector_manager.save_vector_store(
+                vector_store, self.loaded_documents, self.model_manager.get_embedding_signature()
+            )
+            for file_path in diff.removed:
+                baseline.pop(file_path, None)
+                self.vector_manager.fingerprint_index.forget(file_path)
+            baseline.update(self.vector_manager.get_files_fingerprint(diff.changed))
+            self.vector_manager.save_fingerprints(baseline)
+            self._publish_snapshot(vector_store, baseline)
+            
+            logger.info(f"知识库增量更新完成: {diff.summary()}，当前共 {len(self.loaded_documents)} 个文档片段")
+            return diff
+    
+
+    def start_docs_watcher(self):
+        """启动docs目录监听，变化的文件在后台增量入库"""
+        from src.utils.docs_watcher import DocsWatcher
+        
+        if self.docs_watcher is None:
+            self.docs_watcher = DocsWatcher(
+                str(self.docs_dir),
+                self.apply_document_changes,
+                extensions=self.document_processor.supported_formats.keys(),
+                debounce_seconds=WATCH_DEBOUNCE_SECONDS,
+                poll_interval=WATCH_POLL_INTERVAL
+            )
+        self.docs_watcher.start()
+        return self.docs_watcher
+    
+    def estimate_memory_bytes(self) -> int:
+        """估算知识库常驻内存，用于多知识库的内存预算
+
+        快照加载的向量索引和片段正文是内存映射，不计入；docstore ID映射、元数据过滤索引
+        和关键词索引（首次关键词检索时建立，按正文长度估算）无论是否快照加载都常驻内存。
+        """
+        count = len(self.loaded_documents)
+        if isinstance(self.loaded_documents, list):
+            text_bytes = sum(sys.getsizeof(doc.page_content) for doc in self.loaded_documents)
+            total = text_bytes
+            if self.vector_store is not None:
+                index = self.vector_store.index
+                total += index.ntotal * index.d * 4
+        else:
+            text_bytes = self.loaded_documents.nbytes
+            total = count * 8  # 片段偏移量
+        # 关键词索引每个字符二元组一个4字节位置
+        total += text_bytes * 4
+        return total + count * CHUNK_OVERHEAD_BYTES
+    
+    def close(self):
+        """释放知识库占用的资源
+        
+        多知识库管理器只关闭没有请求在使用的实例（见 KnowledgeBaseManager.use）；
+        这里只解除引用，快照映射由垃圾回收释放。
+        """
+        if self.docs_watcher is not None:
+            self.docs_watcher.stop()
+            self.docs_watcher = None
+        self.loaded_documents = []
+        self.qa_chain = None
+        self.vector_store = None
+        self._metadata_index = None
+        self.agent = None
+    
+    def get_ingest_status(self) -> Dict:
+        """获取文档入库状态"""
+        return {
+            "loaded_documents": len(self.loaded_documents),
+            "knowledge_base_files": len(self.get_knowledge_base_files()),
+            "parse_cache": self.document_cache.get_stats(),
+            "retrieval": self.searcher.get_stats(),
+            "query_plan": {**self.query_planner.get_stats(), "thresholds": self.relevance_thresholds.get_stats()},
+            "watcher": self.docs_watcher.get_status() if self.docs_watcher else None,
+            "endpoints": self.model_manager.get_endpoint_status()
+        }
+
+    def get_slow_requests(self, limit: int = 20) -> List[Dict]:
+        """最近的慢请求（调用栈、阶段耗时、会话ID和问题）"""
+        if self.slow_requests is None:
+            return []
+        return self.slow_requests.get_records(limit)
+
+    def find_keyword(self, keyword: str) -> List[Dict]:
+        """在docs目录的文档中查找关键词，返回结构化的匹配结果"""
+        docs_dir = self.docs_dir
+        if not docs_dir.exists():
+            return []
+        
+        # 支持多种格式
+        supported_extensions = ['.pdf', '.txt', '.md', '.docx', '.doc', '.wps', '.pptx', '.ppt', '.xlsx', '.xls']
+        all_files = []
+        for ext in supported_extensions:
+            all_files.extend(list(docs_dir.glob(f"*{ext}")))
+        
+        # 确保文档处理器已初始化
+        if not hasattr(self, 'document_processor') or not self.document_processor:
+            from src.core.document_processor import DocumentProcessor
+            self.document_processor = DocumentProcessor()
+        
+        keyword_lower = keyword.lower()
+        all_results = []
+        for file_path in all_files:
+            try:
+                documents = self.document_processor.process_file(str(file_path))
+                # 在文档内容中搜索关键词
+                for doc in documents:
+                    content = doc.page_content
+                    content_lower = content.lower()
+                    
+                    # 找到关键词位置并提取预览
+                    start = content_lower.find(keyword_lower)
+                    if start == -1:
+                        continue
+                    preview_start = max(0, start - 50)
+                    preview_end = min(len(content), start + len(keyword) + 50)
+                    preview = content[preview_start:preview_end]
+                    
+                    all_results.append({
+                        'filename': file_path.name,
+                        'page': doc.metadata.get('page', '未知'),
+                        'occurrences': content_lower.count(keyword_lower),
+                        'preview': preview
+                    })
+            except Exception as e:
+                logger.warning(f"搜索文件 {file_path} 失败: {e}")
+        
+        return all_results
+
+    def search_in_documents(self, keyword: str) -> str:
+        """在文档中搜索"""
+        if not keyword.strip():
+            return "请输入搜索关键词"
+        
+        try:
+            if not self.get_knowledge_base_files():
+                return "抱歉，当前没有任何支持的文档可供搜索，请先上传文档"
+            
+            all_results = self.find_keyword(keyword)
             if not all_results:
                 return f"抱歉，在文档中没有查询到包含 '{keyword}' 的相关内容，请尝试使用其他关键词"
             
@@ -685,6 +1039,8 @@ class AIDocumentAssistant:
 
     def analyze_single_document(self, file) -> tuple:
         """分析单个文档"""
+        from src.core.document_analyzer import DocumentAnalyzer
+        
         try:
             if not file:
                 return {}, "请先上传文档", ""
@@ -743,8 +1099,9 @@ class AIDocumentAssistant:
             if not filenames:
                 return "❌ 没有指定要删除的文件"
             
-            docs_dir = Path("docs")
+            docs_dir = self.docs_dir
             results = []
+            removed_paths = []
             
             # 删除docs目录中的文件
             for filename in filenames:
@@ -753,14 +1110,15 @@ class AIDocumentAssistant:
                     try:
                         # 删除文件
                         file_path.unlink()
+                        removed_paths.append(str(file_path))
                         results.append(f"[成功] 已删除文件: {filename}")
                     except Exception as e:
                         results.append(f"[错误] 删除文件失败 {filename}: {str(e)}")
                 else:
                     results.append(f"[错误] 文件不存在: {filename}")
             
-            # 重新加载文档以更新知识库
-            self._recreate_rag_chain()
+            # 从向量库中移除已删除文件的片段
+            self.apply_document_changes(removed_paths)
             
             results.append(f"[成功] 知识库已更新，当前共加载 {len(self.loaded_documents)} 个文档片段")
             return "\n".join(results)
@@ -775,10 +1133,12 @@ class AIDocumentAssistant:
         ui = EnhancedRAGInterface(self)
         return ui.create_interface()
 
-# 创建全局实例
-assistant = AIDocumentAssistant()
-
 if __name__ == "__main__":
+    # 设置日志
+    logger_manager.setup_global_logging()
+    log_config_summary()
+    assistant = get_assistant()
+    
     try:
         # 使用环境变量或默认端口7860
         import os
@@ -789,6 +1149,13 @@ if __name__ == "__main__":
         hostname = socket.gethostname()
         local_ip = socket.gethostbyname(hostname)
         
+        # 端口被占用时顺延一个端口
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            if probe.connect_ex(("127.0.0.1", port)) == 0:
+                logger.warning(f"端口{port}被占用，尝试使用端口{port + 1}")
+                print(f"端口{port}被占用，尝试使用端口{port + 1}")
+                port += 1
+        
         print("=" * 50)
         print("AI文档问答系统启动中...")
         print("=" * 50)
@@ -796,26 +1163,11 @@ if __name__ == "__main__":
         print(f"局域网访问: http://{local_ip}:{port}")
         print("如需修改端口，请设置环境变量 GRADIO_SERVER_PORT")
         
-        assistant.create_interface().launch(
-            server_name="0.0.0.0",  # 监听所有网络接口
-            server_port=port, 
-            show_error=True,
-            share=False  # 关闭Gradio的分享功能，使用本地网络
-        )
-    except OSError as e:
-        if "Cannot find empty port" in str(e):
-            logger.warning(f"端口{port}被占用，尝试使用随机端口")
-            new_port = port + 1
-            print(f"端口{port}被占用，尝试使用端口{new_port}")
-            assistant.create_interface().launch(
-                server_name="0.0.0.0", 
-                server_port=new_port, 
-                show_error=True,
-                share=False
-            )
-        else:
-            logger.error(f"启动失败: {e}")
-            raise
+        print(f"HTTP接口: http://localhost:{port}/api  健康检查: http://localhost:{port}/health")
+        
+        # Gradio界面与HTTP接口共用同一端口和同一个助手实例
+        from src.api.http_api import serve_http
+        serve_http(assistant, host="0.0.0.0", port=port, kb_manager=create_kb_manager(assistant))
     except Exception as e:
         logger.error(f"启动失败: {e}")
         raise
@@ -26,8 +26,8 @@ def create_rag_chain_from_texts(texts: List[str], model_name: str = None, api_ke
     
     # 使用模型管理器
     if model_manager is None:
-        from src.utils.model_manager import ModelManager
-        model_manager = ModelManager()
+        from src.utils.model_manager import get_default_model_manager
+        model_manager = get_default_model_manager()
     
     embeddings = model_manager.create_embeddings()
     vector_store = FAISS.from_texts(texts, embeddings)
@@ -54,8 +54,8 @@ def create_rag_chain_from_documents(documents: List[Document], model_name: str =
     """从文档创建RAG链"""
     # 使用模型管理器
     if model_manager is None:
-        from src.utils.model_manager import ModelManager
-        model_manager = ModelManager()
+        from src.utils.model_manager import get_default_model_manager
+        model_manager = get_default_model_manager()
     
     embeddings = model_manager.create_embeddings()
     
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+多进程服务启动脚本 - 一个写进程 + 多个只读工作进程共享同一份索引
+
+写进程负责文档入库（含docs目录监听），每次更新后发布新的索引快照；
+只读工作进程以内存映射方式加载快照，并在写进程发布新版本后原子切换。
+各进程监听连续端口（界面和/api接口同端口），前面可放置nginx等负载均衡器。
+
+用法:
+    python serve.py --workers 4 --base-port 7860
+    # 写进程: 7860，只读工作进程: 7861-7864
+"""
+import os
+import sys
+import argparse
+import logging
+import multiprocessing
+from pathlib import Path
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("serve")
+
+
+def run_worker(role: str, port: int, host: str):
+    """在子进程中启动一个服务实例"""
+    os.environ["SERVING_ROLE"] = role
+    from main import AIDocumentAssistant
+    from src.api.http_api import serve_http
+    from src.utils.logger import logger_manager
+
+    logger_manager.setup_global_logging()
+
+    assistant = AIDocumentAssistant(role=role)
+    assistant.initialize_system()
+    if role == "writer":
+        assistant.start_docs_watcher()
+
+    logger.info(f"{role} 进程已就绪: http://{host}:{port}")
+    serve_http(assistant, host=host, port=port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程服务：一个写进程 + 多个只读工作进程")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="只读工作进程数量")
+    parser.add_argument("--base-port", type=int, default=7860, help="写进程端口，工作进程依次递增")
+    parser.add_argument("--host", default="0.0.0.0")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=run_worker, args=("writer", args.base_port, args.host), name="writer")]
+    for i in range(1, args.workers + 1):
+        processes.append(ctx.Process(
+            target=run_worker,
+            args=("reader", args.base_port + i, args.host),
+            name=f"reader-{i}"
+        ))
+
+    for process in processes:
+        process.start()
+    logger.info(f"已启动 1 个写进程和 {args.workers} 个只读工作进程")
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("正在停止所有进程...")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
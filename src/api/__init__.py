@@ -0,0 +1 @@
+# API模块初始化文件
\ No newline at end of file
@@ -0,0 +1,298 @@
+"""
+无界面HTTP接口 - 与Gradio界面共用同一个AIDocumentAssistant实例
+接口:
+    GET  /health              健康检查（docker-compose / Dockerfile 使用）
+    GET  /metrics             Prometheus指标（各阶段耗时、token数、缓存命中）
+    GET  /api/debug/slow_requests  最近的慢请求（调用栈、阶段耗时、会话ID和问题）
+    POST /api/debug/profile   按时间窗口采样，返回折叠栈（PROFILING_ENABLED=true 时可用）
+    GET  /api/usage           最近几天的token用量和费用（按天、模型、会话、知识库）
+    POST /api/chat            问答，stream=true 时以SSE返回（随模型输出逐块推送）
+    POST /api/search          关键词搜索
+    GET  /api/filters         可用的检索范围（文件名、格式、页码）
+    GET  /api/ingest/status   文档入库状态
+    GET  /api/kb              知识库列表和加载状态
+    POST /api/kb              创建知识库
+    POST /api/kb/{name}/reload  知识库文档目录变化后增量入库
+    DELETE /api/kb/{name}     删除知识库
+问答、搜索、过滤和入库状态接口可通过 knowledge_base 指定知识库，默认为原有知识库
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class ChatRequest(BaseModel):
+    """问答请求"""
+    message: str
+    stream: bool = False
+    # 限定检索范围，如 {"filename": ["a.pdf"], "page": {"gte": 1, "lte": 5}}
+    filters: Optional[Dict[str, Any]] = None
+    knowledge_base: Optional[str] = None
+    # 只用于慢请求诊断
+    session_id: Optional[str] = None
+
+
+class SearchRequest(BaseModel):
+    """搜索请求"""
+    keyword: str
+    knowledge_base: Optional[str] = None
+
+
+class KnowledgeBaseRequest(BaseModel):
+    """创建知识库请求"""
+    name: str
+
+
+class ProfileRequest(BaseModel):
+    """采样请求"""
+    seconds: float = 10.0
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """格式化一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _iterate_in_thread(make_iterator: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+    """在一个独立线程中迭代完同步生成器（追踪上下文不能跨线程），逐项交给事件循环；客户端断开时停止"""
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    finished = object()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = make_iterator()
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        except Exception as e:
+            logger.error(f"流式输出出错: {e}")
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, finished)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+    threading.Thread(target=produce, name="sse-chat", daemon=True).start()
+    try:
+        while True:
+            item = await items.get()
+            if item is finished:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+async def _sse_chat(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    """把流式问答事件按SSE输出：sources -> answer(随模型输出逐块) -> done"""
+    start = time.perf_counter()
+    async for event, data in events:
+        yield _sse_event(event, data)
+    yield _sse_event("done", {"elapsed_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+
+def create_api_app(assistant, kb_manager=None):
+    """创建HTTP接口应用
+
+    Args:
+        assistant: 已初始化的AIDocumentAssistant实例（默认知识库）
+        kb_manager: KnowledgeBaseManager，为None时只提供默认知识库
+    """
+    from fastapi import FastAPI, HTTPException
+    from fastapi.responses import PlainTextResponse, StreamingResponse
+    from starlette.concurrency import run_in_threadpool
+
+    app = FastAPI(title="AI文档问答系统 API")
+
+    def require_manager():
+        if kb_manager is None:
+            raise HTTPException(status_code=404, detail="未启用多知识库")
+        return kb_manager
+
+    async def acquire(name: Optional[str]):
+        """按名称获取知识库（首次访问时在线程池中加载）并登记为正在使用，不会被卸载"""
+        if not name:
+            return assistant
+        try:
+            return await run_in_threadpool(require_manager().acquire, name)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0]))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def check(name: Optional[str]):
+        """检查知识库名称（不加载），用于在开始流式响应前返回404/400"""
+        if not name:
+            return
+        try:
+            found = require_manager().exists(name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not found:
+            raise HTTPException(status_code=404, detail=f"知识库不存在: {name}")
+
+    async def release(target):
+        if target is not assistant:
+            await run_in_threadpool(kb_manager.release, target)
+
+    @asynccontextmanager
+    async def resolve(name: Optional[str]) -> AsyncIterator[Any]:
+        """请求处理期间持有知识库"""
+        target = await acquire(name)
+        try:
+            yield target
+        finally:
+            await release(target)
+
+    @app.get("/health")
+    def health() -> Dict[str, Any]:
+        # 只读取内存中的状态，供健康检查高频调用
+        return {
+            "status": "ok" if assistant.qa_chain is not None or assistant.llm is not None else "starting",
+            "role": assistant.role,
+            "generation": assistant.generation,
+            "loaded_documents": len(assistant.loaded_documents)
+        }
+
+    @app.get("/metrics")
+    def metrics() -> PlainTextResponse:
+        from src.utils.tracing import render_metrics
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.get("/api/debug/slow_requests")
+    def slow_requests(limit: int = 20) -> Dict[str, Any]:
+        return {"requests": assistant.get_slow_requests(limit)}
+
+    @app.get("/api/usage")
+    def usage(days: int = 7) -> Dict[str, Any]:
+        if days < 1:
+            raise HTTPException(status_code=400, detail="days需大于0")
+        return assistant.get_usage_report(days)
+
+    @app.post("/api/debug/profile")
+    async def profile(request: ProfileRequest) -> PlainTextResponse:
+        from src.utils.profiler import get_profiler
+        profiler = get_profiler()
+        if profiler is None:
+            raise HTTPException(status_code=404, detail="未启用采样分析（PROFILING_ENABLED=true）")
+        if not 0 < request.seconds <= 300:
+            raise HTTPException(status_code=400, detail="采样时长需在0到300秒之间")
+        try:
+            path = await run_in_threadpool(profiler.profile, request.seconds)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return PlainTextResponse(path.read_text(encoding="utf-8"), headers={"X-Profile-Path": str(path)})
+
+    @app.post("/api/chat")
+    async def chat(request: ChatRequest):
+        if not request.message.strip():
+            raise HTTPException(status_code=400, detail="请输入有效的问题")
+
+        if request.stream:
+            check(request.knowledge_base)
+
+            async def stream_events() -> AsyncIterator[str]:
+                # 在响应体开始输出时才获取知识库：客户端在此之前断开时生成器不会运行，也就不需要释放
+                async with resolve(request.knowledge_base) as target:
+                    events = _iterate_in_thread(
+                        lambda: target.stream_chat_with_sources(request.message, request.filters, request.session_id)
+                    )
+                    async for chunk in _sse_chat(events):
+                        yield chunk
+
+            return StreamingResponse(
+                stream_events(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        async with resolve(request.knowledge_base) as target:
+            start = time.perf_counter()
+            answer, sources = await run_in_threadpool(target.chat_with_sources, request.message, request.filters, request.session_id)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        return {"answer": answer, "sources": sources, "elapsed_ms": elapsed_ms}
+
+    @app.post("/api/search")
+    async def search(request: SearchRequest):
+        if not request.keyword.strip():
+            raise HTTPException(status_code=400, detail="请输入搜索关键词")
+        async with resolve(request.knowledge_base) as target:
+            results = await run_in_threadpool(target.find_keyword, request.keyword)
+        return {"keyword": request.keyword, "results": results}
+
+    @app.get("/api/filters")
+    async def filters(knowledge_base: Optional[str] = None) -> Dict[str, Any]:
+        async with resolve(knowledge_base) as target:
+            return await run_in_threadpool(target.get_filter_options)
+
+    @app.get("/api/ingest/status")
+    async def ingest_status(knowledge_base: Optional[str] = None) -> Dict[str, Any]:
+        async with resolve(knowledge_base) as target:
+            return await run_in_threadpool(target.get_ingest_status)
+
+    @app.get("/api/kb")
+    def list_knowledge_bases() -> Dict[str, Any]:
+        manager = require_manager()
+        return {"names": manager.list(), **manager.get_stats()}
+
+    @app.post("/api/kb")
+    def create_knowledge_base(request: KnowledgeBaseRequest) -> Dict[str, Any]:
+        try:
+            docs_dir = require_manager().create(request.name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"name": request.name, "docs_dir": str(docs_dir)}
+
+    @app.post("/api/kb/{name}/reload")
+    async def reload_knowledge_base(name: str) -> Dict[str, Any]:
+        def reload(target):
+            # 当前文件 + 上次入库的文件，删除的文件也能被发现
+            files = [str(target.docs_dir / filename) for filename in target.get_knowledge_base_files()]
+            files += list(target.vector_manager.load_fingerprints())
+            diff = target.apply_document_changes(files)
+            require_manager().refresh_memory(name)
+            return diff
+
+        async with resolve(name) as target:
+            diff = await run_in_threadpool(reload, target)
+        return {"name": name, "changes": diff.summary() if diff else None}
+
+    @app.delete("/api/kb/{name}")
+    def delete_knowledge_base(name: str) -> Dict[str, Any]:
+        manager = require_manager()
+        try:
+            if not manager.exists(name):
+                raise HTTPException(status_code=404, detail=f"知识库不存在: {name}")
+            manager.delete(name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"name": name, "deleted": True}
+
+    return app
+
+
+def serve_http(assistant, host: str = "0.0.0.0", port: int = 7860, with_ui: bool = True, kb_manager=None):
+    """在同一端口同时提供HTTP接口和Gradio界面"""
+    import uvicorn
+
+    app = create_api_app(assistant, kb_manager)
+    if with_ui:
+        import gradio as gr
+        app = gr.mount_gradio_app(app, assistant.create_interface(), path="/")
+
+    logger.info(f"HTTP接口已启动: http://{host}:{port}/api，健康检查: /health")
+    uvicorn.run(app, host=host, port=port, log_level="warning")
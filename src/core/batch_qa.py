@@ -0,0 +1,140 @@
+"""
+批量问答 - 用于离线评测和批量生成报告
+流程: 读取JSONL问题 -> 一次批量生成查询向量 -> 矩阵检索 -> 限制并发调用大模型 -> 写出JSONL结果
+"""
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from src.core.retrieval import embed_queries, search_by_vectors
+
+logger = logging.getLogger(__name__)
+
+
+def load_questions(input_path: str) -> List[Dict[str, Any]]:
+    """读取问题文件，每行一个JSON对象，问题字段为 question（或 message）"""
+    questions = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            question = item.get("question") or item.get("message")
+            if not question:
+                logger.warning(f"第{line_no}行缺少question字段，已跳过")
+                continue
+            questions.append({"id": item.get("id", line_no), "question": question})
+    return questions
+
+
+class BatchQARunner:
+    """批量问答执行器，共用AIDocumentAssistant的向量库和大模型"""
+
+    def __init__(self, assistant, concurrency: int = 4, k: int = None):
+        """
+        Args:
+            assistant: 已初始化的AIDocumentAssistant实例
+            concurrency: 同时进行的大模型调用数量
+            k: 每个问题检索的片段数量，默认与问答链的检索器一致
+        """
+        self.assistant = assistant
+        self.concurrency = max(1, concurrency)
+        if k is None:
+            retriever = getattr(assistant.qa_chain, "retriever", None)
+            k = getattr(retriever, "search_kwargs", {}).get("k", 4)
+        self.k = k
+
+    def _retrieve(self, questions: List[str], timings: Dict[str, float]) -> List[List[Tuple[Any, float]]]:
+        """批量检索，没有向量库时返回空结果"""
+        vector_store = self.assistant.vector_store
+        if vector_store is None:
+            return [[] for _ in questions]
+
+        start = time.perf_counter()
+        searcher = getattr(self.assistant, "searcher", None)
+        if searcher is not None:
+            # 与交互问答共用查询向量缓存，重复的回归问题无需重新计算
+            vectors = searcher.embedding_cache.get_many(vector_store.embeddings, questions)
+        else:
+            vectors = embed_queries(vector_store.embeddings, questions)
+        timings["embed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        start = time.perf_counter()
+        results = search_by_vectors(vector_store, vectors, self.k)
+        timings["search_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return results
+
+    def _answer(self, item: Dict[str, Any], hits: List[Tuple[Any, float]]) -> Dict[str, Any]:
+        """调用大模型回答单个问题"""
+        question = item["question"]
+        docs = [doc for doc, _ in hits]
+        if docs:
+            prompt, sources = self.assistant.build_knowledge_prompt(question, docs)
+        else:
+            prompt, sources = f"用户问题：{question}\n\n请直接回答这个问题。", []
+
+        record = {
+            "id": item["id"],
+            "question": question,
+            "answer": None,
+            "sources": sources,
+            "scores": [round(score, 4) for _, score in hits],
+            "error": None
+        }
+        start = time.perf_counter()
+        try:
+            record["answer"] = self.assistant.llm.invoke(prompt).content
+        except Exception as e:
+            logger.warning(f"问题 {item['id']} 回答失败: {e}")
+            record["error"] = str(e)
+        record["llm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+
+    def run(self, questions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """执行批量问答
+
+        Returns:
+            (每个问题的结果, 各阶段耗时汇总)
+        """
+        if self.assistant.llm is None:
+            raise RuntimeError("大模型未初始化，请先调用 initialize_system()")
+
+        total_start = time.perf_counter()
+        timings: Dict[str, Any] = {"questions": len(questions), "embed_ms": 0.0, "search_ms": 0.0}
+        hits = self._retrieve([item["question"] for item in questions], timings)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch-qa") as executor:
+            records = list(executor.map(self._answer, questions, hits))
+        timings["llm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        timings["total_ms"] = round((time.perf_counter() - total_start) * 1000, 1)
+        timings["errors"] = sum(1 for record in records if record["error"])
+        timings["concurrency"] = self.concurrency
+        return records, timings
+
+    def run_file(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """读取问题文件，结果写入JSONL，耗时汇总写入同名 .summary.json"""
+        start = time.perf_counter()
+        questions = load_questions(input_path)
+        load_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        records, timings = self.run(questions)
+        timings["load_ms"] = load_ms
+
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        with open(output_path.with_suffix(".summary.json"), "w", encoding="utf-8") as f:
+            json.dump(timings, f, ensure_ascii=False, indent=2)
+
+        logger.info(
+            f"批量问答完成: {timings['questions']}个问题，向量 {timings['embed_ms']}ms，"
+            f"检索 {timings['search_ms']}ms，大模型 {timings['llm_ms']}ms，总计 {timings['total_ms']}ms"
+        )
+        return timings
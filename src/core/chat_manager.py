@@ -9,6 +9,8 @@ from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+from src.utils.tracing import span
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -58,14 +60,15 @@ class ChatManager:
     def _save_sessions(self):
         """保存会话到文件"""
         try:
-            data = {}
-            for session_id, session in self.sessions.items():
-                session_dict = asdict(session)
-                session_dict['messages'] = [asdict(msg) for msg in session.messages]
-                data[session_id] = session_dict
-            
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with span("persist", sessions=len(self.sessions)):
+                data = {}
+                for session_id, session in self.sessions.items():
+                    session_dict = asdict(session)
+                    session_dict['messages'] = [asdict(msg) for msg in session.messages]
+                    data[session_id] = session_dict
+                
+                with open(self.sessions_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.error(f"保存会话失败: {e}")
     
@@ -115,11 +118,31 @@ class ChatManager:
             metadata=metadata
         )
         
-        self.sessions[session_id].messages.append(message)
-        self.sessions[session_id].updated_at = datetime.now().isoformat()
+        session = self.sessions[session_id]
+        session.messages.append(message)
+        session.updated_at = datetime.now().isoformat()
+        if metadata and metadata.get("usage"):
+            self._add_usage(session, metadata["usage"])
         self._save_sessions()
         return True
     
+    @staticmethod
+    def _add_usage(session: ChatSession, usage: Dict):
+        """累加会话的token用量和费用"""
+        session.metadata = session.metadata or {}
+        totals = session.metadata.setdefault("usage", {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+        totals["requests"] += 1
+        totals["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        totals["completion_tokens"] += usage.get("completion_tokens", 0)
+        totals["cost"] = round(totals["cost"] + usage.get("cost", 0.0), 6)
+    
+    def get_session_usage(self, session_id: str) -> Optional[Dict]:
+        """获取会话累计的token用量"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        return (session.metadata or {}).get("usage", {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+    
     def delete_session(self, session_id: str) -> bool:
         """删除会话"""
         if session_id in self.sessions:
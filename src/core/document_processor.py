@@ -1,12 +1,18 @@
 import os
 from pathlib import Path
 from typing import List, Dict
-from langchain.schema import Document
+
+from src.utils.tracing import span
 
 class DocumentProcessor:
     """文档处理器，支持多种格式包括Word/WPS"""
     
-    def __init__(self):
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache: 可选的DocumentCache，命中时跳过解析
+        """
+        self.cache = cache
         self.supported_formats = {
             '.pdf': self._process_pdf,
             '.txt': self._process_text,
@@ -20,7 +26,7 @@ class DocumentProcessor:
             '.xls': self._process_excel
         }
     
-    def process_file(self, file_path: str) -> List[Document]:
+    def process_file(self, file_path: str) -> List["Document"]:
         """处理任意格式的文档"""
         file_path = Path(file_path)
         ext = file_path.suffix.lower()
@@ -28,16 +34,24 @@ class DocumentProcessor:
         if ext not in self.supported_formats:
             raise ValueError(f"不支持的格式: {ext}")
         
-        return self.supported_formats[ext](file_path)
+        with span("parse", format=ext.lstrip(".")) as current:
+            if self.cache is not None:
+                documents = self.cache.get_or_parse(str(file_path), self.supported_formats[ext])
+            else:
+                documents = self.supported_formats[ext](file_path)
+            current.set(documents=len(documents))
+        return documents
     
-    def _process_pdf(self, file_path: Path) -> List[Document]:
+    def _process_pdf(self, file_path: Path) -> List["Document"]:
         """处理PDF文档"""
         from src.core.pdf_processor import PDFProcessor
         processor = PDFProcessor()
         return processor.process_pdf(str(file_path))
     
-    def _process_text(self, file_path: Path) -> List[Document]:
+    def _process_text(self, file_path: Path) -> List["Document"]:
         """处理文本文件"""
+        from langchain.schema import Document
+        
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
@@ -45,8 +59,10 @@ class DocumentProcessor:
         except Exception as e:
             return [Document(page_content=f"文本处理失败: {str(e)}", metadata={"source": str(file_path), "type": "text"})]
     
-    def _process_markdown(self, file_path: Path) -> List[Document]:
+    def _process_markdown(self, file_path: Path) -> List["Document"]:
         """处理Markdown文件"""
+        from langchain.schema import Document
+        
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
@@ -54,8 +70,10 @@ class DocumentProcessor:
         except Exception as e:
             return [Document(page_content=f"Markdown处理失败: {str(e)}", metadata={"source": str(file_path), "type": "markdown"})]
     
-    def _process_word(self, file_path: Path) -> List[Document]:
+    def _process_word(self, file_path: Path) -> List["Document"]:
         """处理Word/WPS文档"""
+        from langchain.schema import Document
+        
         try:
             from docx import Document as DocxDocument
             doc = DocxDocument(file_path)
@@ -84,8 +102,10 @@ class DocumentProcessor:
         except Exception as e:
             return [Document(page_content=f"Word处理失败: {str(e)}", metadata={"source": str(file_path), "type": "word"})]
     
-    def _process_powerpoint(self, file_path: Path) -> List[Document]:
+    def _process_powerpoint(self, file_path: Path) -> List["Document"]:
         """处理PowerPoint文档"""
+        from langchain.schema import Document
+        
         try:
             from pptx import Presentation
             prs = Presentation(file_path)
@@ -113,8 +133,10 @@ class DocumentProcessor:
         except Exception as e:
             return [Document(page_content=f"PowerPoint处理失败: {str(e)}", metadata={"source": str(file_path), "type": "powerpoint"})]
     
-    def _process_excel(self, file_path: Path) -> List[Document]:
+    def _process_excel(self, file_path: Path) -> List["Document"]:
         """处理Excel文档"""
+        from langchain.schema import Document
+        
         try:
             import openpyxl
             wb = openpyxl.load_workbook(file_path)
@@ -142,8 +164,10 @@ class DocumentProcessor:
         except Exception as e:
             return [Document(page_content=f"Excel处理失败: {str(e)}", metadata={"source": str(file_path), "type": "excel"})]
     
-    def process_image(self, file_path: Path) -> List[Document]:
+    def process_image(self, file_path: Path) -> List["Document"]:
         """处理图片（OCR）"""
+        from langchain.schema import Document
+        
         image = Image.open(file_path)
         text = pytesseract.image_to_string(image, lang='chi_sim+eng')
         
@@ -0,0 +1,251 @@
+"""
+多知识库管理 - 每个知识库有独立的文档目录、指纹、向量索引和快照
+目录结构:
+    knowledge_bases/
+        <名称>/
+            docs/     文档
+            cache/    vector/、snapshot/、documents/
+知识库在首次访问时加载；超出内存预算或数量上限时，按最近最少使用卸载空闲的知识库。
+处理请求时用 use(name)（或 acquire / release）登记正在使用，正在使用的知识库不会被卸载；
+显式卸载或删除时，关闭推迟到最后一个请求结束。
+"""
+import re
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KB = "default"
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class KnowledgeBaseManager:
+    """知识库注册与懒加载
+
+    factory(name, docs_dir, cache_dir) 创建知识库实例（AIDocumentAssistant），
+    实例需提供 initialize_system()、estimate_memory_bytes() 和 close()。
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, str, str], Any],
+        root_dir: str = "knowledge_bases",
+        memory_budget_mb: float = 2048,
+        max_loaded: int = 16,
+        default_assistant=None
+    ):
+        """
+        Args:
+            factory: 知识库实例工厂
+            root_dir: 知识库根目录
+            memory_budget_mb: 已加载知识库的内存预算
+            max_loaded: 同时加载的知识库数量上限
+            default_assistant: 默认知识库（原有的 docs/ 和 cache/），常驻不卸载
+        """
+        self.factory = factory
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.max_loaded = max(1, max_loaded)
+        self.default_assistant = default_assistant
+
+        self._loaded: "OrderedDict[str, Any]" = OrderedDict()
+        self._memory: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # id(实例) -> 正在处理的请求数；已移出但仍在使用、等待关闭的实例
+        self._in_use: Dict[int, int] = {}
+        self._pending_close: Dict[int, tuple] = {}
+        self.loads = 0
+        self.unloads = 0
+
+    @staticmethod
+    def validate_name(name: str) -> str:
+        """校验知识库名称（只允许字母、数字、下划线和连字符）"""
+        if not name or not _NAME_PATTERN.match(name):
+            raise ValueError(f"无效的知识库名称: {name!r}，只允许字母、数字、下划线和连字符")
+        return name
+
+    def docs_dir(self, name: str) -> Path:
+        return self.root_dir / self.validate_name(name) / "docs"
+
+    def cache_dir(self, name: str) -> Path:
+        return self.root_dir / self.validate_name(name) / "cache"
+
+    def exists(self, name: str) -> bool:
+        return name == DEFAULT_KB and self.default_assistant is not None or self.docs_dir(name).is_dir()
+
+    def list(self) -> List[str]:
+        """列出所有知识库"""
+        names = sorted(p.parent.name for p in self.root_dir.glob("*/docs") if p.is_dir())
+        if self.default_assistant is not None and DEFAULT_KB not in names:
+            names.insert(0, DEFAULT_KB)
+        return names
+
+    def create(self, name: str) -> Path:
+        """创建知识库目录，返回文档目录"""
+        docs_dir = self.docs_dir(name)
+        docs_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir(name).mkdir(parents=True, exist_ok=True)
+        logger.info(f"知识库已创建: {name}")
+        return docs_dir
+
+    def delete(self, name: str):
+        """卸载并删除知识库（包括文档和缓存）"""
+        if name == DEFAULT_KB and self.default_assistant is not None:
+            raise ValueError("默认知识库不能删除")
+        self.unload(name)
+        with self._lock:
+            self._load_locks.pop(name, None)
+        shutil.rmtree(self.root_dir / self.validate_name(name), ignore_errors=True)
+        logger.info(f"知识库已删除: {name}")
+
+    def get(self, name: str = DEFAULT_KB):
+        """获取知识库实例，未加载时加载并按需卸载其他知识库
+
+        返回的实例不登记为正在使用，随时可能被卸载；处理请求时应使用 use() / acquire()。
+        """
+        return self._get(name, acquire=False)
+
+    def acquire(self, name: str = DEFAULT_KB):
+        """获取知识库实例并登记为正在使用，用完后必须调用 release()"""
+        return self._get(name, acquire=True)
+
+    def release(self, assistant):
+        """结束一次使用；实例已被卸载且没有其他请求在用时关闭，并按预算卸载其他空闲知识库"""
+        if assistant is self.default_assistant:
+            return
+        with self._lock:
+            key = id(assistant)
+            count = self._in_use.get(key, 0) - 1
+            if count > 0:
+                self._in_use[key] = count
+                return
+            self._in_use.pop(key, None)
+            pending = self._pending_close.pop(key, None)
+            evicted = [pending] if pending is not None else self._evict(keep=None)
+        for evicted_name, evicted_assistant in evicted:
+            self._close(evicted_name, evicted_assistant)
+
+    @contextmanager
+    def use(self, name: str = DEFAULT_KB) -> Iterator[Any]:
+        """with manager.use(name) as assistant: 期间该知识库不会被卸载"""
+        assistant = self.acquire(name)
+        try:
+            yield assistant
+        finally:
+            self.release(assistant)
+
+    def _mark_used(self, name: str, acquire: bool):
+        """调用方持有 self._lock"""
+        assistant = self._loaded[name]
+        self._loaded.move_to_end(name)
+        if acquire:
+            self._in_use[id(assistant)] = self._in_use.get(id(assistant), 0) + 1
+        return assistant
+
+    def _get(self, name: str, acquire: bool):
+        if name == DEFAULT_KB and self.default_assistant is not None:
+            return self.default_assistant
+        self.validate_name(name)
+
+        with self._lock:
+            if name in self._loaded:
+                return self._mark_used(name, acquire)
+            if not self.docs_dir(name).is_dir():
+                raise KeyError(f"知识库不存在: {name}")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # 同一知识库只加载一次，不同知识库可以并行加载
+        with load_lock:
+            with self._lock:
+                if name in self._loaded:
+                    return self._mark_used(name, acquire)
+
+            assistant = self.factory(name, str(self.docs_dir(name)), str(self.cache_dir(name)))
+            assistant.initialize_system()
+            memory = assistant.estimate_memory_bytes()
+
+            with self._lock:
+                self._loaded[name] = assistant
+                self._memory[name] = memory
+                self.loads += 1
+                self._mark_used(name, acquire)
+                evicted = self._evict(keep=name)
+            logger.info(f"知识库已加载: {name}（约{memory / 1024 / 1024:.1f}MB）")
+
+        for evicted_name, evicted_assistant in evicted:
+            self._close(evicted_name, evicted_assistant)
+        return assistant
+
+    def _over_budget(self) -> bool:
+        return len(self._loaded) > self.max_loaded or sum(self._memory.values()) > self.memory_budget
+
+    def _evict(self, keep: Optional[str]) -> List[tuple]:
+        """按最近最少使用选出需要卸载的空闲知识库（调用方持有 self._lock）
+
+        正在使用的知识库跳过，暂时超出预算，等请求结束 release() 时再卸载。
+        """
+        evicted = []
+        for name in list(self._loaded):
+            if len(self._loaded) <= 1 or not self._over_budget():
+                break
+            if name == keep or self._in_use.get(id(self._loaded[name])):
+                continue
+            evicted.append((name, self._loaded.pop(name)))
+            self._memory.pop(name, None)
+            self.unloads += 1
+        return evicted
+
+    def _close(self, name: str, assistant):
+        try:
+            assistant.close()
+            logger.info(f"知识库已卸载: {name}")
+        except Exception as e:
+            logger.warning(f"卸载知识库 {name} 失败: {e}")
+
+    def unload(self, name: str) -> bool:
+        """卸载指定知识库，返回是否确实卸载（仍有请求在使用时，最后一个请求结束后关闭）"""
+        with self._lock:
+            assistant = self._loaded.pop(name, None)
+            self._memory.pop(name, None)
+            if assistant is None:
+                return False
+            self.unloads += 1
+            if self._in_use.get(id(assistant)):
+                self._pending_close[id(assistant)] = (name, assistant)
+                return True
+        self._close(name, assistant)
+        return True
+
+    def refresh_memory(self, name: str):
+        """知识库内容变化后重新估算内存并按预算卸载"""
+        with self._lock:
+            assistant = self._loaded.get(name)
+            if assistant is None:
+                return
+            self._loaded.move_to_end(name)
+            self._memory[name] = assistant.estimate_memory_bytes()
+            evicted = self._evict(keep=name)
+        for evicted_name, evicted_assistant in evicted:
+            self._close(evicted_name, evicted_assistant)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取加载状态"""
+        total = len(self.list())
+        with self._lock:
+            return {
+                "knowledge_bases": total,
+                "loaded": list(self._loaded),
+                "in_use": [name for name, assistant in self._loaded.items() if self._in_use.get(id(assistant))],
+                "memory_mb": round(sum(self._memory.values()) / 1024 / 1024, 1),
+                "memory_budget_mb": round(self.memory_budget / 1024 / 1024, 1),
+                "max_loaded": self.max_loaded,
+                "loads": self.loads,
+                "unloads": self.unloads
+            }
@@ -0,0 +1,356 @@
+"""
+压力测试 - 模拟多个并发会话端到端调用问答，用于容量规划
+流程: 按并发梯度（如 1,2,4,8,16）逐级运行，每个虚拟用户循环 "思考 -> 提问 -> 等待回答"，
+每级统计吞吐、延迟分位数和错误率，最后找出饱和点（再加并发吞吐不再增长、延迟或错误率超限）
+
+压测目标:
+    sources  AIDocumentAssistant.chat_with_sources（无会话）
+    chat     AIDocumentAssistant.chat_with_ai（每个虚拟用户一个会话，带历史）
+    http     POST /api/chat（服务以 main.py 或 serve.py 启动）
+"""
+import json
+import math
+import time
+import random
+import logging
+import os
+import platform
+import threading
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# chat_with_sources / chat_with_ai 出错时返回固定提示而不抛异常，按前缀识别
+ERROR_PREFIXES = ("抱歉，系统遇到了一些问题", "抱歉，我暂时无法回答")
+
+_SMALL_TALK = ["你好", "谢谢", "你是谁", "再见", "hello"]
+_GENERAL = ["什么是机器学习？", "如何写一份项目周报？", "解释一下HTTP和HTTPS的区别", "Python中列表和元组有什么区别？"]
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """最近秩法分位数，ordered 需已排序"""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def questions_from_documents(documents: List[Any], count: int = 50, seed: int = 0, words: int = 12) -> List[str]:
+    """从已加载的文档片段中截取句子作为知识库问题"""
+    rng = random.Random(seed)
+    texts = [doc.page_content for doc in documents if getattr(doc, "page_content", "").strip()]
+    questions = []
+    for _ in range(count if texts else 0):
+        tokens = rng.choice(texts).split()
+        if len(tokens) > 1:
+            # 英文按词截取
+            start = rng.randrange(max(1, len(tokens) - words))
+            snippet = " ".join(tokens[start:start + words])
+        else:
+            # 中文按字截取
+            text = tokens[0] if tokens else ""
+            start = rng.randrange(max(1, len(text) - words * 2))
+            snippet = text[start:start + words * 2]
+        questions.append(f"文档中关于“{snippet}”是怎么说的？")
+    return questions
+
+
+@dataclass
+class QuestionMix:
+    """问题组合：知识库问题、通用问题、闲聊按权重抽取"""
+    knowledge: List[str] = field(default_factory=list)
+    general: List[str] = field(default_factory=lambda: list(_GENERAL))
+    small_talk: List[str] = field(default_factory=lambda: list(_SMALL_TALK))
+    weights: Dict[str, float] = field(default_factory=lambda: {"knowledge": 0.7, "general": 0.2, "small_talk": 0.1})
+
+    def sample(self, rng: random.Random) -> Dict[str, str]:
+        kinds = [kind for kind in ("knowledge", "general", "small_talk") if getattr(self, kind) and self.weights.get(kind, 0) > 0]
+        if not kinds:
+            raise ValueError("问题组合为空")
+        kind = rng.choices(kinds, weights=[self.weights[kind] for kind in kinds])[0]
+        return {"kind": kind, "question": rng.choice(getattr(self, kind))}
+
+
+@dataclass
+class StageResult:
+    """一个并发级别的统计"""
+    concurrency: int
+    requests: int
+    errors: int
+    elapsed_s: float
+    throughput_rps: float
+    error_rate: float
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    by_kind: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+def summarize_stage(concurrency: int, samples: List[Dict[str, Any]], elapsed_s: float) -> StageResult:
+    """汇总一个并发级别的请求样本（每个样本含 kind、seconds、error）"""
+    ordered = sorted(sample["seconds"] for sample in samples)
+    errors = sum(1 for sample in samples if sample["error"])
+
+    by_kind: Dict[str, Dict[str, float]] = {}
+    for kind in sorted({sample["kind"] for sample in samples}):
+        kind_latencies = sorted(sample["seconds"] for sample in samples if sample["kind"] == kind)
+        by_kind[kind] = {
+            "requests": len(kind_latencies),
+            "p50_ms": round(percentile(kind_latencies, 50) * 1000, 1),
+            "p99_ms": round(percentile(kind_latencies, 99) * 1000, 1)
+        }
+
+    return StageResult(
+        concurrency=concurrency,
+        requests=len(samples),
+        errors=errors,
+        elapsed_s=round(elapsed_s, 3),
+        throughput_rps=round(len(samples) / elapsed_s, 3) if elapsed_s > 0 else 0.0,
+        error_rate=round(errors / len(samples), 4) if samples else 0.0,
+        mean_ms=round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+        p50_ms=round(percentile(ordered, 50) * 1000, 1),
+        p90_ms=round(percentile(ordered, 90) * 1000, 1),
+        p99_ms=round(percentile(ordered, 99) * 1000, 1),
+        max_ms=round(ordered[-1] * 1000, 1) if ordered else 0.0,
+        by_kind=by_kind
+    )
+
+
+def find_saturation(stages: List[StageResult], min_gain: float = 0.1, p99_slo_ms: Optional[float] = None,
+                    max_error_rate: float = 0.01) -> Dict[str, Any]:
+    """找出饱和点：最后一个吞吐仍有明显增长且延迟、错误率未超限的并发级别
+
+    Args:
+        min_gain: 相比上一级吞吐至少增长的比例，低于该值视为饱和
+        p99_slo_ms: p99延迟上限（毫秒），为None时不检查
+        max_error_rate: 错误率上限
+    """
+    best = None
+    for i, stage in enumerate(stages):
+        if stage.error_rate > max_error_rate:
+            reason = f"并发{stage.concurrency}时错误率{stage.error_rate:.1%}超过{max_error_rate:.1%}"
+        elif p99_slo_ms is not None and stage.p99_ms > p99_slo_ms:
+            reason = f"并发{stage.concurrency}时p99 {stage.p99_ms}ms超过{p99_slo_ms}ms"
+        elif i > 0 and best is not None and stage.throughput_rps < best.throughput_rps * (1 + min_gain):
+            reason = f"并发{stage.concurrency}时吞吐{stage.throughput_rps}/s相比并发{best.concurrency}增长不足{min_gain:.0%}"
+        else:
+            best = stage
+            continue
+        return {
+            "concurrency": best.concurrency if best else None,
+            "throughput_rps": best.throughput_rps if best else None,
+            "p99_ms": best.p99_ms if best else None,
+            "reason": reason
+        }
+    return {
+        "concurrency": best.concurrency if best else None,
+        "throughput_rps": best.throughput_rps if best else None,
+        "p99_ms": best.p99_ms if best else None,
+        "reason": "测试的最高并发仍未饱和"
+    }
+
+
+def hardware_profile() -> Dict[str, Any]:
+    """记录运行环境，便于按硬件比较容量"""
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version()
+    }
+
+
+class AssistantTarget:
+    """进程内压测目标：直接调用AIDocumentAssistant"""
+
+    def __init__(self, assistant, mode: str = "sources", chat_manager=None):
+        """
+        Args:
+            mode: sources 调用 chat_with_sources，chat 调用 chat_with_ai（每个虚拟用户一个会话）
+            chat_manager: 用于清理压测会话，默认为 main.get_chat_manager()
+        """
+        if mode not in ("sources", "chat"):
+            raise ValueError(f"未知的压测模式: {mode}")
+        self.assistant = assistant
+        self.mode = mode
+        self.chat_manager = chat_manager
+        self.session_ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def new_session(self) -> Dict[str, Any]:
+        return {"session_id": None, "history": []}
+
+    def ask(self, session: Dict[str, Any], question: str) -> str:
+        """提问并返回回答"""
+        if self.mode == "sources":
+            answer, _ = self.assistant.chat_with_sources(question)
+            return answer
+        history, session_id = self.assistant.chat_with_ai(question, session["history"], session["session_id"])
+        if session["session_id"] is None and session_id:
+            with self._lock:
+                self.session_ids.append(session_id)
+        session["session_id"], session["history"] = session_id, history
+        return history[-1]["content"] if history else ""
+
+    def cleanup(self):
+        """删除压测创建的会话，避免污染聊天记录"""
+        if not self.session_ids:
+            return
+        chat_manager = self.chat_manager
+        if chat_manager is None:
+            from main import get_chat_manager
+            chat_manager = get_chat_manager()
+        for session_id in self.session_ids:
+            chat_manager.delete_session(session_id)
+        self.session_ids = []
+
+
+class HttpTarget:
+    """HTTP压测目标：POST /api/chat"""
+
+    def __init__(self, base_url: str, timeout: float = 120.0, knowledge_base: Optional[str] = None):
+        self.url = base_url.rstrip("/") + "/api/chat"
+        self.timeout = timeout
+        self.knowledge_base = knowledge_base
+
+    def new_session(self) -> Dict[str, Any]:
+        return {}
+
+    def ask(self, session: Dict[str, Any], question: str) -> str:
+        payload = {"message": question}
+        if self.knowledge_base:
+            payload["knowledge_base"] = self.knowledge_base
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))["answer"]
+
+    def cleanup(self):
+        pass
+
+
+class LoadTestRunner:
+    """按并发梯度运行压测"""
+
+    def __init__(self, target, mix: QuestionMix, think_time: float = 1.0, duration: float = 30.0,
+                 warmup: float = 0.0, seed: int = 0, clock: Callable[[], float] = time.perf_counter):
+        """
+        Args:
+            target: AssistantTarget 或 HttpTarget
+            mix: 问题组合
+            think_time: 两次提问之间的平均思考时间（秒，指数分布），0表示连续提问
+            duration: 每个并发级别的运行时长（秒）
+            warmup: 每级开始后不计入统计的时长（秒）
+            seed: 随机种子，相同配置下问题序列和思考时间可复现
+        """
+        self.target = target
+        self.mix = mix
+        self.think_time = think_time
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.clock = clock
+
+    def _user(self, user_id: int, concurrency: int, start: float, deadline: float, samples: List[Dict[str, Any]], lock: threading.Lock):
+        """一个虚拟用户：思考 -> 提问 -> 等待回答，直到本级结束"""
+        rng = random.Random(self.seed * 1_000_003 + concurrency * 1009 + user_id)
+        session = self.target.new_session()
+        # 错开首次提问，避免所有用户同时发出请求
+        if self.think_time > 0:
+            time.sleep(rng.uniform(0, self.think_time))
+        while self.clock() < deadline:
+            item = self.mix.sample(rng)
+            sent = self.clock()
+            error = None
+            try:
+                answer = self.target.ask(session, item["question"])
+                if not answer or answer.startswith(ERROR_PREFIXES):
+                    error = "error_response"
+            except Exception as e:
+                error = type(e).__name__
+            finished = self.clock()
+            if sent - start >= self.warmup:
+                with lock:
+                    samples.append({"kind": item["kind"], "seconds": finished - sent, "error": error})
+            if self.think_time > 0:
+                pause = min(rng.expovariate(1 / self.think_time), max(0.0, deadline - self.clock()))
+                time.sleep(pause)
+
+    def run_stage(self, concurrency: int) -> StageResult:
+        """运行一个并发级别"""
+        samples: List[Dict[str, Any]] = []
+        lock = threading.Lock()
+        start = self.clock()
+        deadline = start + self.duration
+        threads = [
+            threading.Thread(target=self._user, args=(i, concurrency, start, deadline, samples, lock),
+                             name=f"load-user-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 进行中的请求在截止后完成，按实际结束时间计算吞吐
+        elapsed = self.clock() - start - self.warmup
+        result = summarize_stage(concurrency, samples, elapsed)
+        logger.info(
+            f"并发{concurrency}: {result.requests}个请求，{result.throughput_rps}/s，"
+            f"p50 {result.p50_ms}ms，p99 {result.p99_ms}ms，错误率 {result.error_rate:.1%}"
+        )
+        return result
+
+    def run(self, levels: Sequence[int], p99_slo_ms: Optional[float] = None, max_error_rate: float = 0.01,
+            min_gain: float = 0.1, stop_on_saturation: bool = False) -> Dict[str, Any]:
+        """逐级运行并返回报告
+
+        Args:
+            levels: 并发级别，如 [1, 2, 4, 8, 16]
+            stop_on_saturation: 达到饱和点后不再运行更高的并发级别
+        """
+        stages: List[StageResult] = []
+        try:
+            for concurrency in levels:
+                stages.append(self.run_stage(concurrency))
+                saturation = find_saturation(stages, min_gain, p99_slo_ms, max_error_rate)
+                if stop_on_saturation and saturation["reason"] != "测试的最高并发仍未饱和":
+                    break
+        finally:
+            self.target.cleanup()
+
+        return {
+            "target": type(self.target).__name__,
+            "mode": getattr(self.target, "mode", "http"),
+            "settings": {
+                "levels": list(levels),
+                "duration_s": self.duration,
+                "warmup_s": self.warmup,
+                "think_time_s": self.think_time,
+                "weights": self.mix.weights,
+                "seed": self.seed
+            },
+            "hardware": hardware_profile(),
+            "stages": [asdict(stage) for stage in stages],
+            "saturation": find_saturation(stages, min_gain, p99_slo_ms, max_error_rate)
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """格式化为文本表格"""
+    lines = [f"{'并发':>4} {'请求':>6} {'吞吐/s':>8} {'p50ms':>9} {'p90ms':>9} {'p99ms':>9} {'错误率':>7}"]
+    for stage in report["stages"]:
+        lines.append(
+            f"{stage['concurrency']:>4} {stage['requests']:>6} {stage['throughput_rps']:>8} "
+            f"{stage['p50_ms']:>9} {stage['p90_ms']:>9} {stage['p99_ms']:>9} {stage['error_rate']:>7.1%}"
+        )
+    saturation = report["saturation"]
+    lines.append(f"饱和点: 并发 {saturation['concurrency']}，吞吐 {saturation['throughput_rps']}/s（{saturation['reason']}）")
+    return "\n".join(lines)
@@ -0,0 +1,131 @@
+"""
+元数据过滤索引 - 按文件名、格式、页码等属性预先建立片段ID集合
+检索时把过滤结果作为 IDSelector 传给FAISS，在索引内部完成过滤，不损失召回
+
+过滤条件示例:
+    {"filename": ["a.pdf", "b.docx"]}           # 列表表示任一匹配
+    {"type": "pdf", "page": {"gte": 3, "lte": 10}}  # 多个属性之间为"且"
+"""
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+FILTER_FIELDS = ("filename", "type", "page", "source")
+
+# 解析器没有写入type时按扩展名推断
+_EXTENSION_TYPES = {
+    ".pdf": "pdf", ".txt": "text", ".md": "markdown",
+    ".docx": "word", ".doc": "word", ".wps": "word",
+    ".pptx": "powerpoint", ".ppt": "powerpoint",
+    ".xlsx": "excel", ".xls": "excel"
+}
+
+
+def filter_attributes(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """从片段元数据中提取可过滤的属性"""
+    source = metadata.get("source") or ""
+    filename = metadata.get("filename") or os.path.basename(source)
+    return {
+        "source": source,
+        "filename": filename,
+        "type": metadata.get("type") or _EXTENSION_TYPES.get(os.path.splitext(filename)[1].lower()),
+        "page": metadata.get("page")
+    }
+
+
+def _matches_value(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict):
+        if value is None:
+            return False
+        return ("gte" not in condition or value >= condition["gte"]) and ("lte" not in condition or value <= condition["lte"])
+    if isinstance(condition, (list, tuple, set)):
+        return value in condition
+    return value == condition
+
+
+def matches_filters(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """判断单个片段是否满足过滤条件（用于不经过向量索引的场景）"""
+    if not filters:
+        return True
+    attributes = filter_attributes(metadata)
+    return all(_matches_value(attributes.get(field), condition) for field, condition in filters.items())
+
+
+class MetadataIndex:
+    """属性值 -> FAISS索引位置集合"""
+
+    def __init__(self, cache_size: int = 256):
+        self._positions: Dict[str, Dict[Any, Set[int]]] = {field: {} for field in FILTER_FIELDS}
+        self.size = 0
+        self._selections: "OrderedDict[str, Any]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "MetadataIndex":
+        """根据向量库的docstore建立索引"""
+        index = cls()
+        for position, doc_id in vector_store.index_to_docstore_id.items():
+            doc = vector_store.docstore.search(doc_id)
+            if not isinstance(doc, str):
+                index.add(position, doc.metadata)
+        logger.info(f"元数据过滤索引已建立: {index.size}个片段")
+        return index
+
+    def add(self, position: int, metadata: Dict[str, Any]):
+        """登记一个片段"""
+        for field, value in filter_attributes(metadata).items():
+            if value is not None:
+                self._positions[field].setdefault(value, set()).add(position)
+        self.size += 1
+
+    def values(self, field: str) -> List[Any]:
+        """某个属性的全部取值"""
+        return sorted(self._positions.get(field, {}))
+
+    def _resolve(self, field: str, condition: Any) -> Set[int]:
+        if field not in self._positions:
+            raise ValueError(f"不支持的过滤字段: {field}，可用字段: {', '.join(FILTER_FIELDS)}")
+        by_value = self._positions[field]
+        if isinstance(condition, dict):
+            matched = [ids for value, ids in by_value.items() if _matches_value(value, condition)]
+        elif isinstance(condition, (list, tuple, set)):
+            matched = [by_value.get(value, set()) for value in condition]
+        else:
+            matched = [by_value.get(condition, set())]
+        return set().union(*matched) if matched else set()
+
+    def select(self, filters: Optional[Dict[str, Any]]):
+        """解析过滤条件
+
+        Returns:
+            None 表示不过滤；否则为排好序的int64位置数组。
+            相同条件返回同一个数组对象，便于合并检索按条件分组。
+        """
+        if not filters:
+            return None
+        key = json.dumps(filters, sort_keys=True, ensure_ascii=False, default=list)
+        with self._lock:
+            selection = self._selections.get(key)
+            if selection is not None:
+                self._selections.move_to_end(key)
+                return selection
+
+        import numpy as np
+
+        positions: Optional[Set[int]] = None
+        for field, condition in filters.items():
+            ids = self._resolve(field, condition)
+            positions = ids if positions is None else positions & ids
+        selection = np.fromiter(sorted(positions or ()), dtype=np.int64)
+
+        with self._lock:
+            self._selections[key] = selection
+            while len(self._selections) > self._cache_size:
+                self._selections.popitem(last=False)
+        return selection
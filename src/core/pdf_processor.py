@@ -5,12 +5,8 @@ import os
 import logging
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
-import fitz  # PyMuPDF
-from PIL import Image
-import io
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
 
+# PyMuPDF和langchain在实际处理PDF时才导入，避免拖慢进程启动
 logger = logging.getLogger(__name__)
 
 class PDFProcessor:
@@ -19,15 +15,27 @@ class PDFProcessor:
     def __init__(self, upload_dir: str = "uploads", chunk_size: int = 1000, chunk_overlap: int = 200):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
-        )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._text_splitter = None
+    
+    @property
+    def text_splitter(self):
+        """文本分割器（首次使用时创建）"""
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=len,
+                separators=["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
+            )
+        return self._text_splitter
     
     def extract_text_and_images(self, pdf_path: str) -> Dict:
         """提取PDF文本和图像"""
+        import fitz  # PyMuPDF
+        
         try:
             doc = fitz.open(pdf_path)
             pages_data = []
@@ -86,11 +94,14 @@ class PDFProcessor:
             logger.error(f"PDF处理失败 {pdf_path}: {e}")
             raise
     
-    def process_pdf(self, file_path: str) -> List[Document]:
+    def process_pdf(self, file_path: str) -> List["Document"]:
         """处理单个PDF文件"""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"PDF文件不存在: {file_path}")
-            
+        
+        import fitz  # PyMuPDF
+        from langchain.schema import Document
+        
         try:
             with fitz.open(file_path) as doc:
                 documents = []
@@ -119,6 +130,8 @@ class PDFProcessor:
     
     def get_pdf_info(self, pdf_path: str) -> Dict:
         """获取PDF基本信息"""
+        import fitz  # PyMuPDF
+        
         try:
             doc = fitz.open(pdf_path)
             info = {
@@ -133,7 +146,7 @@ class PDFProcessor:
             logger.error(f"获取PDF信息失败 {pdf_path}: {e}")
             raise
     
-    def process_multiple_pdfs(self, pdf_paths: List[str]) -> List[Document]:
+    def process_multiple_pdfs(self, pdf_paths: List[str]) -> List["Document"]:
         """批量处理多个PDF"""
         all_documents = []
         
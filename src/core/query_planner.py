@@ -0,0 +1,234 @@
+"""
+查询规划 - 调用大模型之前先确定回答路径，每个问题只调用一次大模型
+闲聊直接回答；其余问题先做向量检索，只有向量检索失败或没有结果时才做关键词检索，再按检索结果选择路径:
+    small_talk: 问候、致谢等闲聊，不做检索，使用简短提示词
+    knowledge:  向量检索有距离在阈值内的片段，基于检索片段回答
+    keyword:    向量检索失败或没有结果时，关键词索引命中，基于匹配片段回答
+    general:    与知识库无关，不附带上下文，使用简短提示词
+"""
+import time
+import logging
+import threading
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.core.relevance import build_small_talk_prompt, is_small_talk
+from src.utils.tracing import record_span, span
+
+logger = logging.getLogger(__name__)
+
+ROUTE_KNOWLEDGE = "knowledge"
+ROUTE_KEYWORD = "keyword"
+ROUTE_GENERAL = "general"
+ROUTE_SMALL_TALK = "small_talk"
+
+
+@dataclass
+class QueryPlan:
+    """规划结果：回答路径、唯一一次生成使用的提示词和引用片段"""
+    route: str
+    prompt: str
+    sources: List[str] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class KeywordIndex:
+    """片段正文的字符二元组倒排索引，关键词检索只校验候选片段，不逐个扫描（解码）全部片段
+
+    计分方式：问题中按空白切分的词在正文中出现即计1分；
+    单字词没有二元组，只在其他词命中的片段中计分。
+    """
+
+    def __init__(self, documents: Sequence[Any]):
+        self.documents = documents
+        self.size = len(documents)
+        postings: Dict[str, array] = defaultdict(lambda: array("I"))
+        for position, doc in enumerate(documents):
+            content = doc.page_content.lower()
+            for gram in {content[i:i + 2] for i in range(len(content) - 1)}:
+                postings[gram].append(position)
+        self.postings = dict(postings)
+
+    def _candidates(self, term: str) -> set:
+        """包含词语全部二元组的片段位置"""
+        lists = sorted((self.postings.get(term[i:i + 2], ()) for i in range(len(term) - 1)), key=len)
+        if not lists or not lists[0]:
+            return set()
+        candidates = set(lists[0])
+        for positions in lists[1:]:
+            candidates.intersection_update(positions)
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, message: str, k: int = 3,
+               accept: Optional[Callable[[Any], bool]] = None) -> List[Tuple[Any, int]]:
+        """返回前k个 [(Document, 命中数)]，accept 用于按元数据过滤候选片段"""
+        search_terms = message.lower().split()
+        candidates = set()
+        for term in search_terms:
+            if len(term) > 1:
+                candidates |= self._candidates(term)
+        scored = []
+        for position in sorted(candidates):
+            doc = self.documents[position]
+            if accept is not None and not accept(doc):
+                continue
+            content = doc.page_content.lower()
+            score = sum(1 for term in search_terms if term in content)
+            if score > 0:
+                scored.append((doc, score))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored[:k]
+
+
+def build_knowledge_prompt(message: str, retrieved_docs: Sequence[Any]) -> Tuple[str, List[str]]:
+    """根据向量检索到的文档构建知识库问答提示词，返回 (提示词, 上下文片段)"""
+    context_parts = []
+    for i, doc in enumerate(retrieved_docs[:5]):
+        context_parts.append(f"文档{i+1}内容：{doc.page_content[:500]}...")
+
+    context_str = "\n\n".join(context_parts)
+
+    prompt = f"""
+                            基于以下知识库文档内容回答用户问题：
+
+                            知识库内容：
+                            {context_str}
+
+                            用户问题：{message}
+
+                            要求：
+                            1. 优先使用知识库中的准确信息
+                            2. 结合大模型知识进行补充和完善
+                            3. 明确指出这是基于知识库的回答
+                            4. 回答要准确、详细、有用
+                            """
+    return prompt, context_parts
+
+
+def build_keyword_prompt(message: str, matched_docs: Sequence[Any]) -> Tuple[str, List[str]]:
+    """根据关键词匹配的文档构建提示词，返回 (提示词, 上下文片段)"""
+    context_parts = []
+    for i, doc in enumerate(matched_docs[:3]):
+        context_parts.append(f"相关文档{i+1}：{doc.page_content[:500]}...")
+
+    context_str = "\n\n".join(context_parts)
+
+    prompt = f"""
+                                    基于以下文档内容回答用户问题：
+
+                                    文档内容：
+                                    {context_str}
+
+                                    用户问题：{message}
+
+                                    回答要求：
+                                    1. 基于提供的文档内容回答
+                                    2. 明确指出这是基于知识库的回答
+                                    3. 回答要准确、有用
+                                    """
+    return prompt, context_parts
+
+
+def build_general_prompt(message: str) -> str:
+    """构建通用回答提示词（与知识库无关的问题不附带任何上下文）"""
+    return f"用户问题：{message}\n\n请直接回答这个问题。"
+
+
+class QueryPlanner:
+    """执行检索策略并确定回答路径"""
+
+    def __init__(self, keyword_k: int = 3, small_talk_gate: bool = True):
+        """
+        Args:
+            keyword_k: 关键词兜底检索返回的片段数
+            small_talk_gate: 是否识别闲聊并跳过检索
+        """
+        self.keyword_k = keyword_k
+        self.small_talk_gate = small_talk_gate
+        self._keyword_index: Optional[KeywordIndex] = None
+        self.route_counts: Dict[str, int] = {ROUTE_KNOWLEDGE: 0, ROUTE_KEYWORD: 0, ROUTE_GENERAL: 0, ROUTE_SMALL_TALK: 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        result = fn()
+        return result, round((time.perf_counter() - start) * 1000, 1)
+
+    def _index_for(self, documents: Sequence[Any]) -> KeywordIndex:
+        """片段列表变化（重建或增量更新后是新的列表对象，或列表仍在加载中）时重建关键词索引"""
+        with self._lock:
+            index = self._keyword_index
+            if index is None or index.documents is not documents or index.size != len(documents):
+                index = self._keyword_index = KeywordIndex(documents)
+            return index
+
+    def plan(
+        self,
+        message: str,
+        vector_search: Optional[Callable[[], List[Tuple[Any, float]]]],
+        documents: Sequence[Any],
+        max_distance: Optional[float] = None,
+        keyword_filter: Optional[Callable[[Any], bool]] = None
+    ) -> QueryPlan:
+        """确定回答路径并构建提示词
+
+        Args:
+            vector_search: 向量检索函数，返回 [(Document, 距离分数)]；为None表示知识库不可用
+            documents: 关键词兜底检索的全部片段（按对象缓存索引，不要每次传入新列表）
+            max_distance: 相关片段的最大距离，None表示不按距离过滤
+            keyword_filter: 关键词兜底检索的片段过滤条件（如限定文档范围）
+        """
+        timings: Dict[str, float] = {}
+        vector_hits: List[Tuple[Any, float]] = []
+        keyword_hits: List[Tuple[Any, int]] = []
+
+        if self.small_talk_gate and is_small_talk(message):
+            plan = QueryPlan(ROUTE_SMALL_TALK, build_small_talk_prompt(message))
+            with self._lock:
+                self.route_counts[plan.route] += 1
+            return plan
+
+        if vector_search is not None:
+            try:
+                vector_hits, timings["vector_ms"] = self._timed(vector_search)
+            except Exception as e:
+                logger.warning(f"向量检索失败，使用关键词检索: {e}")
+            # 关键词结果只在向量检索没有结果时使用，其余情况不做关键词检索
+            if not vector_hits:
+                try:
+                    keyword_hits, timings["keyword_ms"] = self._timed(
+                        lambda: self._index_for(documents).search(message, self.keyword_k, keyword_filter))
+                    record_span("keyword", timings["keyword_ms"] / 1000, hits=len(keyword_hits))
+                except Exception as e:
+                    logger.warning(f"关键词检索失败: {e}")
+
+        # 按距离阈值筛选检索结果
+        with span("rerank", candidates=len(vector_hits), max_distance=max_distance) as current:
+            relevant_hits = [(doc, score) for doc, score in vector_hits if max_distance is None or score <= max_distance]
+            current.set(kept=len(relevant_hits))
+        if relevant_hits:
+            prompt, sources = build_knowledge_prompt(message, [doc for doc, _ in relevant_hits])
+            plan = QueryPlan(ROUTE_KNOWLEDGE, prompt, sources, [float(score) for _, score in relevant_hits])
+        elif keyword_hits and not vector_hits:
+            # 向量检索有结果但都超过阈值时，问题与知识库无关，不再用关键词兜底
+            logger.info("向量检索没有结果，使用关键词匹配结果")
+            prompt, sources = build_keyword_prompt(message, [doc for doc, _ in keyword_hits])
+            plan = QueryPlan(ROUTE_KEYWORD, prompt, sources, [float(score) for _, score in keyword_hits])
+        else:
+            plan = QueryPlan(ROUTE_GENERAL, build_general_prompt(message), scores=[float(score) for _, score in vector_hits])
+
+        plan.timings = timings
+        with self._lock:
+            self.route_counts[plan.route] += 1
+        return plan
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各回答路径的使用次数"""
+        with self._lock:
+            return {"routes": dict(self.route_counts)}
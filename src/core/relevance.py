@@ -0,0 +1,119 @@
+"""
+相关性判断 - 决定问题是否需要知识库上下文
+- is_small_talk: 问候、致谢、告别等闲聊直接用简短提示词回答，不做检索
+- RelevanceThresholds: 按嵌入模型给出FAISS距离阈值，超过阈值的检索结果视为不相关
+
+距离阈值优先使用显式配置（RELEVANCE_THRESHOLDS="模型=阈值,..."），
+否则按当前索引校准：随机抽取片段两两计算距离，取其分位数。
+与问题最接近的片段如果比"随机两个片段"还远，说明问题与知识库无关。
+"""
+import re
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.core.retrieval import embedding_model_key
+
+logger = logging.getLogger(__name__)
+
+_SMALL_TALK_PATTERN = re.compile(
+    r"^(你好|您好|嗨|哈喽|hi|hello|hey|早上好|上午好|中午好|下午好|晚上好|早安|晚安|"
+    r"谢谢|多谢|谢谢你|谢谢您|感谢|thanks|thank you|thx|"
+    r"再见|拜拜|bye|goodbye|好的|好|嗯|嗯嗯|ok|okay|收到|明白了|"
+    r"你是谁|你叫什么|你叫什么名字|你能做什么|你会什么|who are you|"
+    r"在吗|在不在|在么)"
+    r"[\s!！。.~～?？,，呀啊呢吧哦哈啦]*$",
+    re.IGNORECASE
+)
+
+
+def is_small_talk(message: str) -> bool:
+    """判断是否为闲聊（只匹配完整的寒暄短句，带具体问题的句子不算）"""
+    text = message.strip()
+    return len(text) <= 20 and bool(_SMALL_TALK_PATTERN.match(text))
+
+
+def build_small_talk_prompt(message: str) -> str:
+    """闲聊使用的简短提示词"""
+    return f"你是文档问答助手，请用一两句话友好地回复用户：{message}"
+
+
+def parse_thresholds(spec: str) -> Dict[str, float]:
+    """解析阈值配置，如 "nomic-embed-text=0.9,text-embedding-ada-002=0.45" """
+    thresholds = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        model, value = item.rsplit("=", 1)
+        try:
+            thresholds[model.strip()] = float(value)
+        except ValueError:
+            logger.warning(f"忽略无效的相关性阈值配置: {item}")
+    return thresholds
+
+
+def calibrate_threshold(index, quantile: float = 0.5, sample_size: int = 256, seed: int = 0) -> Optional[float]:
+    """按索引中随机片段两两之间的距离分布估计阈值
+
+    与FAISS检索返回的分数一致：L2索引为距离平方，越小越相关。
+    片段太少（少于3个）时无法校准，返回None。
+    """
+    import numpy as np
+
+    total = index.ntotal
+    if total < 3:
+        return None
+    rng = np.random.default_rng(seed)
+    positions = np.sort(rng.choice(total, size=min(sample_size, total), replace=False))
+    vectors = np.vstack([index.reconstruct(int(position)) for position in positions]).astype(np.float32)
+
+    squared = (vectors ** 2).sum(axis=1)
+    distances = squared[:, None] + squared[None, :] - 2 * vectors @ vectors.T
+    pairs = distances[np.triu_indices(len(vectors), k=1)]
+    return float(np.quantile(np.maximum(pairs, 0), quantile))
+
+
+class RelevanceThresholds:
+    """按嵌入模型获取距离阈值，校准结果随索引变化重新计算"""
+
+    def __init__(self, overrides: Optional[Dict[str, float]] = None, quantile: float = 0.5, sample_size: int = 256):
+        """
+        Args:
+            overrides: 嵌入模型名 -> 阈值，优先于自动校准
+            quantile: 自动校准时使用的分位数，越小越严格
+            sample_size: 自动校准抽取的片段数
+        """
+        self.overrides = overrides or {}
+        self.quantile = quantile
+        self.sample_size = sample_size
+        self._calibrated: Dict[Tuple, Optional[float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, vector_store) -> Optional[float]:
+        """获取当前向量库的距离阈值，None表示不按阈值过滤"""
+        model_key = embedding_model_key(vector_store.embeddings)
+        if model_key[1] in self.overrides:
+            return self.overrides[model_key[1]]
+
+        # 内积索引的分数越大越相关，无法用距离阈值判断（faiss.METRIC_L2 == 1）
+        if getattr(vector_store.index, "metric_type", 1) != 1:
+            return None
+
+        key = (model_key, id(vector_store.index), vector_store.index.ntotal)
+        with self._lock:
+            if key not in self._calibrated:
+                try:
+                    threshold = calibrate_threshold(vector_store.index, self.quantile, self.sample_size)
+                except Exception as e:
+                    logger.warning(f"相关性阈值校准失败: {e}")
+                    threshold = None
+                # 只保留当前索引的校准结果
+                self._calibrated = {key: threshold}
+                if threshold is not None:
+                    logger.info(f"相关性阈值已校准: {model_key[1]} -> {threshold:.4f}")
+            return self._calibrated[key]
+
+    def get_stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            calibrated = {key[0][1]: value for key, value in self._calibrated.items()}
+        return {"overrides": dict(self.overrides), "calibrated": calibrated}
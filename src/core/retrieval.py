@@ -0,0 +1,264 @@
+"""
+向量检索工具 - 批量生成查询向量，并以矩阵形式一次性查询FAISS索引
+- QueryEmbeddingCache: 查询向量LRU缓存，键为 (嵌入模型, 归一化文本)
+- CoalescingSearcher: 把几毫秒内并发到达的查询合并为一次 index.search
+"""
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+
+def embed_queries(embeddings, texts: Sequence[str]) -> List[List[float]]:
+    """一次调用生成多个查询向量
+
+    与逐条 embed_query 的结果保持一致：Ollama嵌入会给查询加 query_instruction 前缀，
+    这里同样加上前缀后批量计算。
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    instruction = getattr(embeddings, "query_instruction", None)
+    if instruction is not None and hasattr(embeddings, "_embed"):
+        return embeddings._embed([f"{instruction}{text}" for text in texts])
+    return embeddings.embed_documents(texts)
+
+
+def search_by_vectors(vector_store, vectors: Sequence[Sequence[float]], k: int = 4, id_filter=None) -> List[List[Tuple["Document", float]]]:
+    """用一次矩阵查询检索多个向量的近邻
+
+    Args:
+        id_filter: 允许返回的索引位置（int64数组，见 MetadataIndex.select），None表示不过滤
+
+    Returns:
+        每个查询对应的 [(Document, 距离分数)]，顺序与输入一致
+    """
+    import numpy as np
+    import faiss
+
+    if len(vectors) == 0:
+        return []
+    if id_filter is not None and len(id_filter) == 0:
+        return [[] for _ in vectors]
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        faiss.normalize_L2(matrix)
+
+    if id_filter is None:
+        scores, indices = vector_store.index.search(matrix, k)
+    else:
+        # 在索引内部按ID过滤，结果仍是过滤范围内的真实top-k
+        id_filter = np.ascontiguousarray(id_filter, dtype=np.int64)
+        selector = faiss.IDSelectorBatch(len(id_filter), faiss.swig_ptr(id_filter))
+        if isinstance(vector_store.index, faiss.IndexIVF):
+            # 快照索引（见 warm_snapshot.write_snapshot_index）需要IVF参数，遍历全部倒排表
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=vector_store.index.nlist)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        scores, indices = vector_store.index.search(matrix, k, params=params)
+
+    results = []
+    for row_scores, row_indices in zip(scores, indices):
+        docs = []
+        for score, position in zip(row_scores, row_indices):
+            if position == -1:
+                continue
+            doc_id = vector_store.index_to_docstore_id[int(position)]
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, str):
+                logger.warning(f"向量库中找不到文档: {doc_id}")
+                continue
+            docs.append((doc, float(score)))
+        results.append(docs)
+    return results
+
+
+def normalize_query(text: str) -> str:
+    """归一化查询文本：全角转半角、合并空白"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def embedding_model_key(embeddings) -> Tuple[str, str, str]:
+    """嵌入模型标识，切换模型后缓存自然失效"""
+    return (
+        type(embeddings).__name__,
+        str(getattr(embeddings, "model", "")),
+        str(getattr(embeddings, "base_url", None) or getattr(embeddings, "openai_api_base", None) or "")
+    )
+
+
+class QueryEmbeddingCache:
+    """查询向量LRU缓存（线程安全）"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, embeddings, texts: Sequence[str]) -> List[List[float]]:
+        """获取多个查询向量，未命中的部分一次批量计算"""
+        return self.get_many_with_hits(embeddings, texts)[0]
+
+    def get_many_with_hits(self, embeddings, texts: Sequence[str]) -> Tuple[List[List[float]], List[bool]]:
+        """同 get_many，另外返回每个查询是否命中缓存"""
+        model_key = embedding_model_key(embeddings)
+        keys = [(model_key, normalize_query(text)) for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(keys)
+        hit_flags = [False] * len(keys)
+        missing: Dict[Tuple, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    vectors[i] = vector
+                    hit_flags[i] = True
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            computed = embed_queries(embeddings, [key[1] for key in missing])
+            with self._lock:
+                for (key, positions), vector in zip(missing.items(), computed):
+                    for i in positions:
+                        vectors[i] = vector
+                    self._entries[key] = vector
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return vectors, hit_flags
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+
+class _PendingQuery:
+    """等待合并执行的查询"""
+
+    __slots__ = ("vector_store", "text", "k", "id_filter", "event", "result", "error",
+                 "embed_seconds", "search_seconds", "cache_hit", "batch_size")
+
+    def __init__(self, vector_store, text: str, k: int, id_filter=None):
+        self.vector_store = vector_store
+        self.text = text
+        self.k = k
+        self.id_filter = id_filter
+        self.event = threading.Event()
+        self.result: List[Tuple[Any, float]] = []
+        self.error: Optional[BaseException] = None
+        # 所在批次的耗时，由执行者填写后在调用方线程计入追踪
+        self.embed_seconds = 0.0
+        self.search_seconds = 0.0
+        self.cache_hit = False
+        self.batch_size = 1
+
+
+class CoalescingSearcher:
+    """合并并发查询的检索器
+
+    第一个到达的查询成为本批的执行者，等待 window_ms 毫秒收集其他并发查询，
+    然后一次计算所有未缓存的查询向量、一次矩阵检索，再把结果分发给各个调用方。
+    """
+
+    def __init__(self, embedding_cache: Optional[QueryEmbeddingCache] = None, window_ms: float = 5.0):
+        self.embedding_cache = embedding_cache or QueryEmbeddingCache()
+        self.window = max(window_ms, 0) / 1000
+        self._lock = threading.Lock()
+        self._pending: List[_PendingQuery] = []
+        self._leader_active = False
+        self.queries = 0
+        self.batches = 0
+
+    def search(self, vector_store, text: str, k: int = 4, id_filter=None) -> List[Tuple["Document", float]]:
+        """检索单个查询，返回 [(Document, 距离分数)]
+
+        Args:
+            id_filter: MetadataIndex.select 返回的位置数组，None表示不过滤
+        """
+        item = _PendingQuery(vector_store, text, k, id_filter)
+        with self._lock:
+            self._pending.append(item)
+            is_leader = not self._leader_active
+            self._leader_active = True
+
+        if is_leader:
+            if self.window:
+                time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._leader_active = False
+            self._execute(batch)
+
+        item.event.wait()
+        record_span("embed", item.embed_seconds, cache_hit=item.cache_hit, batch_size=item.batch_size)
+        record_span("search", item.search_seconds, k=k, hits=len(item.result))
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _execute(self, batch: List[_PendingQuery]):
+        """按向量库和过滤条件分组执行一批查询"""
+        groups: Dict[Tuple[int, int], List[_PendingQuery]] = {}
+        for item in batch:
+            groups.setdefault((id(item.vector_store), id(item.id_filter)), []).append(item)
+
+        for items in groups.values():
+            try:
+                vector_store = items[0].vector_store
+                start = time.perf_counter()
+                vectors, hit_flags = self.embedding_cache.get_many_with_hits(vector_store.embeddings, [item.text for item in items])
+                embedded = time.perf_counter()
+                for item, cache_hit in zip(items, hit_flags):
+                    item.embed_seconds = embedded - start
+                    item.cache_hit = cache_hit
+                    item.batch_size = len(items)
+                results = search_by_vectors(vector_store, vectors, max(item.k for item in items), items[0].id_filter)
+                searched = time.perf_counter()
+                for item, hits in zip(items, results):
+                    item.result = hits[:item.k]
+                    item.search_seconds = searched - embedded
+            except Exception as e:
+                for item in items:
+                    item.error = e
+            finally:
+                for item in items:
+                    item.event.set()
+
+        with self._lock:
+            self.queries += len(batch)
+            self.batches += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并检索和向量缓存统计"""
+        with self._lock:
+            stats = {
+                "queries": self.queries,
+                "batches": self.batches,
+                "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+                "window_ms": self.window * 1000
+            }
+        stats["embedding_cache"] = self.embedding_cache.get_stats()
+        return stats
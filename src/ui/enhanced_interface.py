@@ -8,6 +8,7 @@ import os
 from dotenv import load_dotenv
 import json
 import time
+import html
 
 from src.utils.logger import get_logger
 
@@ -206,7 +207,7 @@ class EnhancedRAGInterface:
             if files:
                 file_details = []
                 for filename in files:
-                    file_path = os.path.join("docs", filename)
+                    file_path = os.path.join(self.rag_system.docs_dir, filename)
                     if os.path.exists(file_path):
                         size = os.path.getsize(file_path)
                         file_type = filename.split('.')[-1].upper()
@@ -228,6 +229,68 @@ class EnhancedRAGInterface:
         except Exception as e:
             return f"<div class='status-error'>❌ 获取知识库状态失败: {str(e)}</div>"
 
+    def render_slow_requests(self) -> str:
+        """慢请求列表：阶段耗时和调用栈"""
+        monitor = getattr(self.rag_system, "slow_requests", None)
+        if monitor is None:
+            return "<div class='status-info'>慢请求捕获未启用（SLOW_REQUEST_MS=0）</div>"
+        records = self.rag_system.get_slow_requests()
+        if not records:
+            return f"<div class='status-success'>✅ 暂无超过 {monitor.threshold * 1000:.0f}ms 的请求</div>"
+        
+        items = []
+        for record in records:
+            stages = "，".join(f"{name} {ms:.0f}ms" for name, ms in record["stages_ms"].items())
+            items.append(f"""
+            <details style='margin-bottom: 8px;'>
+                <summary>🐢 {record['timestamp'][11:19]} · {record['total_ms']:.0f}ms · {html.escape(record['query'] or '')[:60]}</summary>
+                <div>请求: {record['request_id']} · 会话: {html.escape(str(record['session_id'] or '-'))} · 路径: {record['route'] or '-'}</div>
+                <div>阶段耗时: {stages or '-'}</div>
+                <pre style='white-space: pre-wrap; font-size: 12px;'>{html.escape(record['stacks']) or '（无采样）'}</pre>
+            </details>""")
+        return f"<div class='status-info'>最近 {len(records)} 个慢请求（阈值 {monitor.threshold * 1000:.0f}ms）</div>" + "".join(items)
+
+    def render_usage(self, days: int = 7) -> str:
+        """token用量和费用：按天、模型、知识库汇总，以及用量最多的会话"""
+        try:
+            report = self.rag_system.get_usage_report(int(days))
+        except Exception as e:
+            return f"<div class='status-error'>❌ 获取用量统计失败: {str(e)}</div>"
+        total = report["total"]
+        if not total["requests"]:
+            return f"<div class='status-info'>最近 {report['days']} 天暂无模型调用</div>"
+        
+        def rows(buckets, label):
+            lines = "".join(
+                f"<tr><td>{html.escape(str(name))}</td><td>{bucket['requests']}</td><td>{bucket['prompt_tokens']}</td>"
+                f"<td>{bucket['completion_tokens']}</td><td>{bucket['cost']:.4f}</td></tr>"
+                for name, bucket in buckets
+            )
+            return (f"<table style='width: 100%; margin-bottom: 8px;'><tr><th>{label}</th><th>请求</th><th>提示词token</th>"
+                    f"<th>回答token</th><th>费用</th></tr>{lines}</table>")
+        
+        sessions = [(item["session_id"], item) for item in report["top_sessions"]]
+        return (
+            f"<div class='status-info'>最近 {report['days']} 天：{total['requests']} 次请求，"
+            f"{total['prompt_tokens'] + total['completion_tokens']} token，费用 {total['cost']:.4f}</div>"
+            + rows(sorted(report["by_day"].items()), "日期")
+            + rows(report["by_model"].items(), "模型")
+            + rows(report["by_knowledge_base"].items(), "知识库")
+            + rows(sessions, "会话")
+        )
+
+    def run_profile(self, seconds: float):
+        """采样一段时间，返回折叠栈文件（可用 flamegraph.pl / speedscope 打开）"""
+        from src.utils.profiler import get_profiler
+        profiler = get_profiler()
+        if profiler is None:
+            return None, "<div class='status-info'>采样分析未启用，请设置 PROFILING_ENABLED=true</div>"
+        try:
+            path = profiler.profile(float(seconds))
+        except RuntimeError as e:
+            return None, f"<div class='status-error'>❌ {str(e)}</div>"
+        return str(path), f"<div class='status-success'>✅ 采样 {profiler.samples} 次，已保存 {path}</div>"
+
     def create_interface(self) -> gr.Blocks:
         """创建完整的Gradio界面"""
         # CSS样式 - 超宽屏优化设计
@@ -508,6 +571,14 @@ class EnhancedRAGInterface:
                 visible=True
             )
             
+            # 检索范围：只在选中的文档中检索（不选表示全部文档）
+            scope_dropdown = gr.Dropdown(
+                choices=[],
+                value=[],
+                multiselect=True,
+                label="🎯 限定检索文档（不选则检索全部）"
+            )
+            
             with gr.Row():
                 msg_input = gr.Textbox(
                     label="",
@@ -532,10 +603,24 @@ class EnhancedRAGInterface:
                     analyze_btn = gr.Button("🔍 分析", variant="primary")
                 analysis_summary = gr.HTML()
 
+            # 系统信息：token用量、慢请求和按需采样
+            with gr.Accordion("ℹ️ 系统信息", open=False):
+                usage_html = gr.HTML()
+                with gr.Row(equal_height=True):
+                    usage_days = gr.Slider(1, 90, value=7, step=1, label="统计天数")
+                    refresh_usage_btn = gr.Button("🔄 刷新用量", variant="secondary")
+                slow_requests_html = gr.HTML()
+                with gr.Row(equal_height=True):
+                    refresh_slow_btn = gr.Button("🔄 刷新慢请求", variant="secondary")
+                    profile_seconds = gr.Slider(1, 120, value=10, step=1, label="采样时长（秒）")
+                    profile_btn = gr.Button("🔥 开始采样", variant="secondary")
+                profile_status = gr.HTML()
+                profile_file = gr.File(label="折叠栈（火焰图）")
+
             # 事件绑定 - 所有功能
             
             # 聊天功能 - 知识库优先
-            def chat_stream(message, history):
+            def chat_stream(message, history, scope, request: gr.Request = None):
                 """聊天流式响应 - 知识库优先检索"""
                 if not message or not message.strip():
                     return "", history, ""
@@ -546,7 +631,9 @@ class EnhancedRAGInterface:
                 
                 try:
                     # 获取AI回复和检索信息
-                    response, sources = self.rag_system.chat_with_sources(message)
+                    filters = {"filename": scope} if scope else None
+                    session_id = getattr(request, "session_hash", None)
+                    response, sources = self.rag_system.chat_with_sources(message, filters=filters, session_id=session_id)
                     
                     # 格式化检索结果
                     sources_html = ""
@@ -572,30 +659,34 @@ class EnhancedRAGInterface:
             
             send_btn.click(
                 chat_stream,
-                inputs=[msg_input, chatbot],
+                inputs=[msg_input, chatbot, scope_dropdown],
                 outputs=[msg_input, chatbot, retrieved_docs]
             )
             
             msg_input.submit(
                 chat_stream,
-                inputs=[msg_input, chatbot],
+                inputs=[msg_input, chatbot, scope_dropdown],
                 outputs=[msg_input, chatbot, retrieved_docs]
             )
             
             clear_btn.click(self.clear_chat_func, outputs=[chatbot])
             
             # 知识库管理
+            def refresh_scope_choices(scope):
+                files = self.rag_system.get_knowledge_base_files() or []
+                return gr.Dropdown(choices=files, value=[f for f in (scope or []) if f in files])
+            
             upload_btn.click(
                 lambda files: (self.upload_files(files), gr.CheckboxGroup(choices=self.rag_system.get_knowledge_base_files(), value=[]), self.refresh_knowledge_base_status()),
                 inputs=[file_input],
                 outputs=[file_status, kb_files_list, kb_status]
-            )
+            ).then(refresh_scope_choices, inputs=[scope_dropdown], outputs=[scope_dropdown])
             
             delete_btn.click(
                 self.delete_files_func,
                 inputs=[kb_files_list],
                 outputs=[file_status, kb_files_list, kb_status]
-            )
+            ).then(refresh_scope_choices, inputs=[scope_dropdown], outputs=[scope_dropdown])
             
             # 文档识别分析
             analyze_btn.click(
@@ -604,6 +695,11 @@ class EnhancedRAGInterface:
                 outputs=[analysis_summary]
             )
             
+            # 系统信息
+            refresh_usage_btn.click(self.render_usage, inputs=[usage_days], outputs=[usage_html])
+            refresh_slow_btn.click(self.render_slow_requests, outputs=[slow_requests_html])
+            profile_btn.click(self.run_profile, inputs=[profile_seconds], outputs=[profile_file, profile_status])
+            
             # 模型配置
             def update_models(provider):
                 models = self.get_model_choices(provider)
@@ -658,6 +754,6 @@ class EnhancedRAGInterface:
             app.load(
                 load_initial_config,
                 outputs=[model_dropdown, provider_dropdown, kb_files_list, kb_status]
-            )
+            ).then(refresh_scope_choices, inputs=[scope_dropdown], outputs=[scope_dropdown])
     
             return app
\ No newline at end of file
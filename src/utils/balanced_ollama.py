@@ -0,0 +1,91 @@
+"""
+多节点Ollama客户端 - 把请求分发到EndpointPool中的多个Ollama服务
+每个节点对应一个单节点Ollama客户端，调度、摘除和对冲由EndpointPool负责
+"""
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk, LLMResult
+
+
+class BalancedOllama(LLM):
+    """多节点Ollama语言模型"""
+
+    pool: Any
+    clients: Dict[str, Any]
+    model: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "balanced-ollama"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "endpoints": self.pool.urls}
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> str:
+        return self._generate([prompt], stop=stop, run_manager=run_manager, **kwargs).generations[0][0].text
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> LLMResult:
+        # 直接返回节点客户端的生成结果，保留Ollama在 generation_info 中返回的token用量（UsageTracker使用）；
+        # 不把 run_manager 传给节点客户端：对冲时两个节点的输出会混在同一次调用的回调中
+        generations = []
+        for prompt in prompts:
+            result = self.pool.call(lambda url, prompt=prompt: self.clients[url]._generate([prompt], stop=stop, **kwargs))
+            generations.extend(result.generations)
+        return LLMResult(generations=generations)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[GenerationChunk]:
+        # 流式输出无法对冲，只按最少未完成请求选择节点
+        endpoint = self.pool.acquire()
+        with self.pool.track(endpoint):
+            for chunk in self.clients[endpoint.url]._stream(prompt, stop=stop, **kwargs):
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+
+class BalancedOllamaEmbeddings(Embeddings):
+    """多节点Ollama嵌入模型（各节点需部署相同的嵌入模型）"""
+
+    def __init__(self, pool, clients: Dict[str, Any], model: str):
+        self.pool = pool
+        self.clients = clients
+        self.model = model
+
+    @property
+    def base_url(self) -> str:
+        return ",".join(self.pool.urls)
+
+    @property
+    def query_instruction(self) -> str:
+        return next(iter(self.clients.values())).query_instruction
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        return self.pool.call(lambda url: self.clients[url]._embed(texts))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.pool.call(lambda url: self.clients[url].embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.pool.call(lambda url: self.clients[url].embed_query(text))
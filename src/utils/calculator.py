@@ -0,0 +1,205 @@
+"""
+安全计算器 - 基于AST的表达式求值（替代 eval）
+
+只允许数字、四则运算、幂、取模、白名单中的数学函数和常量；数值使用 Decimal（0.1+0.2 得到 0.3），
+支持百分号（15% -> 0.15）和中文数量单位（3万 -> 30000）。
+为保证单次计算的开销有上限：限制表达式长度、语法树节点数和嵌套深度、幂指数和阶乘参数，
+并检查每一步结果的数量级；相同表达式的结果会被缓存。
+"""
+import ast
+import math
+import re
+import unicodedata
+from decimal import ROUND_FLOOR, Decimal, DecimalException, localcontext
+from functools import lru_cache
+from typing import Callable, Dict, Union
+
+MAX_LENGTH = 200  # 表达式最大字符数
+MAX_NODES = 200  # 语法树最大节点数（求值步数上限）
+MAX_DEPTH = 40  # 最大嵌套深度
+MAX_EXPONENT = 1000  # 幂指数绝对值上限
+MAX_FACTORIAL = 69  # 阶乘参数上限（70! 超过结果上限）
+MAX_MAGNITUDE = Decimal("1e100")  # 任一步结果的绝对值上限
+PRECISION = 28  # 计算精度（有效数字）
+DISPLAY_DIGITS = 15  # 小数结果显示的有效数字
+
+
+class CalculatorError(ValueError):
+    """表达式不合法或超出计算限制"""
+
+
+def _factorial(value: float) -> float:
+    if value != int(value) or not 0 <= value <= MAX_FACTORIAL:
+        raise CalculatorError(f"阶乘参数需为0到{MAX_FACTORIAL}之间的整数")
+    return math.factorial(int(value))
+
+
+# 函数名 -> (函数, 参数个数，None表示至少一个)
+FUNCTIONS: Dict[str, tuple] = {
+    "sqrt": (math.sqrt, 1),
+    "abs": (abs, 1),
+    "round": (round, 1),
+    "floor": (math.floor, 1),
+    "ceil": (math.ceil, 1),
+    "exp": (math.exp, 1),
+    "ln": (math.log, 1),
+    "log": (math.log, None),  # log(x) 或 log(x, 底数)
+    "log10": (math.log10, 1),
+    "log2": (math.log2, 1),
+    "sin": (math.sin, 1),
+    "cos": (math.cos, 1),
+    "tan": (math.tan, 1),
+    "asin": (math.asin, 1),
+    "acos": (math.acos, 1),
+    "atan": (math.atan, 1),
+    "radians": (math.radians, 1),
+    "degrees": (math.degrees, 1),
+    "factorial": (_factorial, 1),
+    "min": (min, None),
+    "max": (max, None),
+}
+
+CONSTANTS: Dict[str, Decimal] = {
+    "pi": Decimal(repr(math.pi)),
+    "e": Decimal(repr(math.e)),
+}
+
+_UNITS = {"千": "1000", "万": "10000", "亿": "100000000"}
+_NUMBER = r"\d+(?:\.\d+)?"
+_UNIT_PATTERN = re.compile(rf"({_NUMBER})\s*([千万亿])")
+# 数字后的 % 且后面不是数字或括号时视为百分号，否则为取模
+_PERCENT_PATTERN = re.compile(rf"({_NUMBER})\s*%(?!\s*[\d(])")
+
+
+def normalize_expression(expression: str) -> str:
+    """统一写法：全角转半角，×÷^ 转运算符，百分号和中文单位展开"""
+    text = unicodedata.normalize("NFKC", expression).strip().lower()
+    text = text.replace("×", "*").replace("÷", "/").replace("^", "**")
+    text = _UNIT_PATTERN.sub(lambda m: f"({m.group(1)}*{_UNITS[m.group(2)]})", text)
+    text = _PERCENT_PATTERN.sub(r"(\1/100)", text)
+    return " ".join(text.split())
+
+
+def _check(value: Decimal) -> Decimal:
+    if not value.is_finite() or abs(value) >= MAX_MAGNITUDE:
+        raise CalculatorError("结果超出计算范围")
+    return value
+
+
+def _to_decimal(value: Union[int, float, Decimal]) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float) and not math.isfinite(value):
+        raise CalculatorError("结果超出计算范围")
+    return Decimal(value) if isinstance(value, int) else Decimal(repr(value))
+
+
+def _power(base: Decimal, exponent: Decimal) -> Decimal:
+    if abs(exponent) > MAX_EXPONENT:
+        raise CalculatorError(f"幂指数绝对值不能超过{MAX_EXPONENT}")
+    # 按数量级预估结果大小，避免计算后才发现溢出
+    if base != 0 and exponent > 0 and float(exponent) * math.log10(abs(float(base))) >= 100:
+        raise CalculatorError("结果超出计算范围")
+    if exponent == exponent.to_integral_value():
+        return base ** int(exponent)
+    if base < 0:
+        raise CalculatorError("负数不能开非整数次方")
+    return base ** exponent
+
+
+def _floordiv(a: Decimal, b: Decimal) -> Decimal:
+    # Decimal 的 // 和 % 向0取整（-7//2 得 -3），这里按Python语义向下取整
+    return (a / b).to_integral_value(ROUND_FLOOR)
+
+
+def _mod(a: Decimal, b: Decimal) -> Decimal:
+    return a - b * _floordiv(a, b)
+
+
+_BINARY: Dict[type, Callable[[Decimal, Decimal], Decimal]] = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: _floordiv,
+    ast.Mod: _mod,
+    ast.Pow: _power,
+}
+
+
+class _Evaluator:
+    """逐节点求值，只处理白名单中的节点类型"""
+
+    def evaluate(self, node: ast.AST, depth: int = 0) -> Decimal:
+        if depth > MAX_DEPTH:
+            raise CalculatorError("表达式嵌套过深")
+        if isinstance(node, ast.Expression):
+            return self.evaluate(node.body, depth + 1)
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return _check(_to_decimal(node.value) if isinstance(node.value, int) else Decimal(str(node.value)))
+        if isinstance(node, ast.Name):
+            if node.id not in CONSTANTS:
+                raise CalculatorError(f"未知的名称: {node.id}")
+            return CONSTANTS[node.id]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            operand = self.evaluate(node.operand, depth + 1)
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            left = self.evaluate(node.left, depth + 1)
+            right = self.evaluate(node.right, depth + 1)
+            if isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)) and right == 0:
+                raise CalculatorError("除数不能为0")
+            return _check(_BINARY[type(node.op)](left, right))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            return self.call(node, depth)
+        raise CalculatorError(f"不支持的语法: {type(node).__name__}")
+
+    def call(self, node: ast.Call, depth: int) -> Decimal:
+        name = node.func.id
+        if name not in FUNCTIONS:
+            raise CalculatorError(f"不支持的函数: {name}")
+        func, arity = FUNCTIONS[name]
+        args = [self.evaluate(arg, depth + 1) for arg in node.args]
+        if (arity is not None and len(args) != arity) or not args:
+            raise CalculatorError(f"函数 {name} 的参数个数不正确")
+        if func in (abs, min, max):
+            return func(*args)
+        return _check(_to_decimal(func(*[float(arg) for arg in args])))
+
+
+def format_number(value: Decimal) -> str:
+    """整数原样显示，小数保留 DISPLAY_DIGITS 位有效数字并去掉末尾的0"""
+    if value == value.to_integral_value():
+        return str(int(value))
+    with localcontext() as ctx:
+        ctx.prec = DISPLAY_DIGITS
+        value = (+value).normalize()
+    return format(value, "f") if abs(value.adjusted()) < DISPLAY_DIGITS else str(value)
+
+
+@lru_cache(maxsize=1024)
+def _evaluate_normalized(text: str) -> str:
+    if not text:
+        raise CalculatorError("表达式为空")
+    if len(text) > MAX_LENGTH:
+        raise CalculatorError(f"表达式不能超过{MAX_LENGTH}个字符")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except (SyntaxError, RecursionError, MemoryError):
+        raise CalculatorError("表达式格式不正确") from None
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise CalculatorError("表达式过于复杂")
+    with localcontext() as ctx:
+        ctx.prec = PRECISION
+        try:
+            value = _Evaluator().evaluate(tree)
+        except CalculatorError:
+            raise
+        except (DecimalException, ArithmeticError, ValueError) as e:
+            raise CalculatorError(f"数学错误: {e}") from None
+    return format_number(value)
+
+
+def evaluate(expression: str) -> str:
+    """计算表达式，返回结果文本；表达式不合法或超出限制时抛出 CalculatorError"""
+    return _evaluate_normalized(normalize_expression(expression))
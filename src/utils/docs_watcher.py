@@ -0,0 +1,195 @@
+"""
+文档目录监听器 - 后台监听docs目录变化并增量更新知识库
+优先使用watchdog（Linux下基于inotify），未安装时退回轮询
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _EventHandler(FileSystemEventHandler):
+    """把watchdog事件转发给监听器"""
+
+    def __init__(self, watcher: "DocsWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        self.watcher.notify(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.notify(dest_path)
+
+
+class DocsWatcher:
+    """文档目录监听器
+
+    文件事件先进入待处理集合，静默 debounce_seconds 秒后合并为一批，
+    放入增量索引队列，由后台工作线程调用 callback(文件路径列表) 处理。
+    """
+
+    def __init__(
+        self,
+        docs_dir: str,
+        callback: Callable[[List[str]], Any],
+        extensions: Iterable[str],
+        debounce_seconds: float = 2.0,
+        poll_interval: float = 2.0,
+        use_inotify: bool = True
+    ):
+        self.docs_dir = Path(docs_dir)
+        self.callback = callback
+        self.extensions = {ext.lower() for ext in extensions}
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        self.mode = "inotify" if use_inotify and Observer is not None else "polling"
+
+        self._pending: Dict[str, float] = {}
+        self._pending_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[List[str]]]" = queue.Queue()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+        self.processed_batches = 0
+        self.processed_files = 0
+        self.last_batch: List[str] = []
+        self.last_batch_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._busy = False
+
+    def _is_supported(self, file_path: str) -> bool:
+        name = os.path.basename(file_path)
+        if name.startswith(".") or name.startswith("~$"):
+            return False
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    def notify(self, file_path: str):
+        """记录一次文件变化（由事件源调用）"""
+        if not self._is_supported(file_path):
+            return
+        with self._pending_lock:
+            self._pending[os.path.abspath(file_path)] = time.monotonic()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """扫描目录的stat信息（轮询模式）"""
+        snapshot = {}
+        try:
+            with os.scandir(self.docs_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._is_supported(entry.name):
+                        stat = entry.stat()
+                        snapshot[os.path.abspath(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def _poll_loop(self):
+        """轮询模式：比较前后两次扫描结果"""
+        while not self._stop_event.wait(self.poll_interval):
+            current = self._scan()
+            for path in set(current) | set(self._snapshot):
+                if current.get(path) != self._snapshot.get(path):
+                    self.notify(path)
+            self._snapshot = current
+
+    def _debounce_loop(self):
+        """合并静默期内的变化，整批放入索引队列"""
+        tick = min(0.5, self.debounce_seconds / 2) or 0.1
+        while not self._stop_event.wait(tick):
+            now = time.monotonic()
+            with self._pending_lock:
+                if not self._pending or now - max(self._pending.values()) < self.debounce_seconds:
+                    continue
+                batch = sorted(self._pending)
+                self._pending.clear()
+            logger.info(f"检测到{len(batch)}个文档变化，加入增量索引队列")
+            self._queue.put(batch)
+
+    def _worker_loop(self):
+        """增量索引工作线程"""
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                break
+            self._busy = True
+            try:
+                self.callback(batch)
+                self.processed_batches += 1
+                self.processed_files += len(batch)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"增量索引失败: {e}")
+            finally:
+                self.last_batch = batch
+                self.last_batch_at = time.time()
+                self._busy = False
+
+    def start(self):
+        """启动监听"""
+        if self._threads:
+            return
+        self.docs_dir.mkdir(parents=True, exist_ok=True)
+        self._stop_event.clear()
+
+        if self.mode == "inotify":
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), str(self.docs_dir), recursive=False)
+            self._observer.start()
+        else:
+            self._snapshot = self._scan()
+            self._threads.append(threading.Thread(target=self._poll_loop, name="docs-watcher-poll", daemon=True))
+
+        self._threads.append(threading.Thread(target=self._debounce_loop, name="docs-watcher-debounce", daemon=True))
+        self._threads.append(threading.Thread(target=self._worker_loop, name="docs-watcher-indexer", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"文档监听已启动: {self.docs_dir} ({self.mode}模式)")
+
+    def stop(self, timeout: float = 5.0):
+        """停止监听，等待当前批次处理完成"""
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout)
+            self._observer = None
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("文档监听已停止")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取监听和索引队列状态"""
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "running": bool(self._threads),
+            "mode": self.mode,
+            "docs_dir": str(self.docs_dir),
+            "pending_files": pending,
+            "queued_batches": self._queue.qsize(),
+            "indexing": self._busy,
+            "processed_batches": self.processed_batches,
+            "processed_files": self.processed_files,
+            "last_batch": self.last_batch,
+            "last_batch_at": self.last_batch_at,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,149 @@
+"""
+文档解析缓存 - 按文件指纹缓存解析结果
+同一文件版本（内容哈希 + 修改时间 + 大小）只解析一次
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+# 参与比对的指纹字段
+FINGERPRINT_KEYS = ("hash", "last_modified", "file_size")
+
+
+class DocumentCache:
+    """解析结果缓存管理器
+
+    每个源文件对应一个gzip压缩的JSON条目，保存指纹和解析出的文档片段
+    （page_content + metadata）。指纹不变时直接复用，不再调用PyMuPDF等解析库。
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir: str = "cache/documents", fingerprint_func: Optional[Callable[[str], Dict[str, Any]]] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._fingerprint_func = fingerprint_func
+        self.hits = 0
+        self.misses = 0
+
+    def _fingerprint(self, file_path: str) -> Dict[str, Any]:
+        """计算文件指纹，默认复用VectorPersistenceManager的实现"""
+        if self._fingerprint_func is None:
+            from src.utils.vector_persistence import VectorPersistenceManager
+            self._fingerprint_func = VectorPersistenceManager().calculate_file_fingerprint
+        fingerprint = self._fingerprint_func(file_path)
+        return {key: fingerprint.get(key) for key in FINGERPRINT_KEYS}
+
+    def _entry_path(self, file_path: str) -> Path:
+        """获取缓存条目路径（按绝对路径哈希，避免中文和特殊字符问题）"""
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.json.gz"
+
+    def _read_entry(self, entry_path: Path) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，损坏或版本不符时返回None"""
+        try:
+            with gzip.open(entry_path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get("version") != self.FORMAT_VERSION:
+                return None
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取解析缓存失败 {entry_path}: {e}")
+            return None
+
+    def _write_entry(self, entry_path: Path, entry: Dict[str, Any]):
+        """原子写入缓存条目"""
+        tmp_path = entry_path.with_suffix(".tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, entry_path)
+
+    def _to_documents(self, entry: Dict[str, Any]) -> List[Any]:
+        """将缓存条目还原为Document列表"""
+        from langchain.schema import Document
+        return [
+            Document(page_content=content, metadata=metadata)
+            for content, metadata in entry["documents"]
+        ]
+
+    def get(self, file_path: str) -> Optional[List[Any]]:
+        """获取文件的缓存解析结果，指纹不匹配时返回None"""
+        entry = self._read_entry(self._entry_path(file_path))
+        if entry is None or entry.get("fingerprint") != self._fingerprint(file_path):
+            return None
+        return self._to_documents(entry)
+
+    def put(self, file_path: str, documents: List[Any], fingerprint: Optional[Dict[str, Any]] = None):
+        """写入文件的解析结果"""
+        try:
+            entry = {
+                "version": self.FORMAT_VERSION,
+                "source": os.path.abspath(file_path),
+                "fingerprint": fingerprint or self._fingerprint(file_path),
+                "documents": [[doc.page_content, doc.metadata] for doc in documents]
+            }
+            self._write_entry(self._entry_path(file_path), entry)
+        except Exception as e:
+            logger.error(f"写入解析缓存失败 {file_path}: {e}")
+
+    def get_or_parse(self, file_path: str, parser: Callable[[Path], List[Any]]) -> List[Any]:
+        """优先读取缓存，未命中时调用解析函数并写入缓存"""
+        fingerprint = self._fingerprint(file_path)
+        entry = self._read_entry(self._entry_path(file_path))
+
+        if entry is not None and entry.get("fingerprint") == fingerprint:
+            self.hits += 1
+            annotate(cache_hit=True)
+            return self._to_documents(entry)
+
+        self.misses += 1
+        annotate(cache_hit=False)
+        documents = parser(Path(file_path))
+        self.put(file_path, documents, fingerprint)
+        return documents
+
+    def remove(self, file_path: str) -> bool:
+        """删除文件对应的缓存条目"""
+        entry_path = self._entry_path(file_path)
+        if entry_path.exists():
+            entry_path.unlink()
+            return True
+        return False
+
+    def prune(self) -> int:
+        """清除源文件已不存在的缓存条目"""
+        removed = 0
+        for entry_path in self.cache_dir.glob("*.json.gz"):
+            entry = self._read_entry(entry_path)
+            if entry is None or not os.path.exists(entry.get("source", "")):
+                entry_path.unlink()
+                removed += 1
+        return removed
+
+    def clear(self) -> int:
+        """清除所有解析缓存"""
+        removed = 0
+        for entry_path in self.cache_dir.glob("*.json.gz"):
+            entry_path.unlink()
+            removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        entries = list(self.cache_dir.glob("*.json.gz"))
+        return {
+            "entries": len(entries),
+            "total_size_mb": round(sum(p.stat().st_size for p in entries) / 1024 / 1024, 2),
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,245 @@
+"""
+多服务节点负载均衡 - 用于多台Ollama GPU服务器
+- 选择未完成请求最少的健康节点（相同时选延迟较低的）
+- 连续失败或平均延迟超过阈值的节点被暂时摘除，到期后经健康检查重新加入
+- 对冲请求：主请求超过 hedge_after 秒未返回时，向另一个节点发出相同请求，取先返回的结果
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """单个服务节点的状态"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency: Optional[float] = None  # 指数移动平均延迟（秒）
+        self.ejected_until = 0.0
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "available": self.is_available(now),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "ejected_for_s": round(max(self.ejected_until - now, 0), 1)
+        }
+
+
+class EndpointPool:
+    """节点池：最少未完成请求调度 + 故障摘除 + 对冲请求"""
+
+    def __init__(
+        self,
+        urls: List[str],
+        health_check: Optional[Callable[[str], bool]] = None,
+        failure_threshold: int = 3,
+        latency_threshold: Optional[float] = None,
+        eject_seconds: float = 30.0,
+        hedge_after: Optional[float] = None,
+        health_interval: float = 10.0,
+        max_attempts: int = 2
+    ):
+        """
+        Args:
+            urls: 节点地址列表
+            health_check: 健康检查函数 url -> bool，被摘除的节点到期后用它确认恢复
+            failure_threshold: 连续失败多少次后摘除
+            latency_threshold: 平均延迟超过该值（秒）时摘除，None表示不按延迟摘除
+            eject_seconds: 摘除时长
+            hedge_after: 主请求超过该时长（秒）未返回时发出对冲请求，None表示不对冲
+            health_interval: 后台健康检查间隔
+            max_attempts: 单次调用最多尝试的节点数（失败转移）
+        """
+        if not urls:
+            raise ValueError("节点列表不能为空")
+        self.endpoints = [Endpoint(url.rstrip("/")) for url in dict.fromkeys(urls)]
+        self.health_check = health_check
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.eject_seconds = eject_seconds
+        self.hedge_after = hedge_after
+        self.health_interval = health_interval
+        self.max_attempts = max(1, max_attempts)
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._health_thread: Optional[threading.Thread] = None
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def acquire(self, exclude: Optional[Set[str]] = None) -> Optional[Endpoint]:
+        """选择一个节点；全部被摘除时选择最早恢复的节点"""
+        self._ensure_health_thread()
+        exclude = exclude or set()
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude]
+            if not candidates:
+                return None
+            available = [e for e in candidates if e.is_available(now)]
+            if available:
+                return min(available, key=lambda e: (e.outstanding, e.latency or 0.0))
+            return min(candidates, key=lambda e: e.ejected_until)
+
+    def _eject(self, endpoint: Endpoint, reason: str):
+        """摘除节点（调用方持有锁）"""
+        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        endpoint.consecutive_failures = 0
+        endpoint.latency = None
+        logger.warning(f"节点已摘除 {self.eject_seconds:.0f}s: {endpoint.url}（{reason}）")
+
+    @contextmanager
+    def track(self, endpoint: Endpoint):
+        """记录一次请求的未完成数、延迟和失败情况（流式调用也可直接使用）"""
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        start = time.monotonic()
+        succeeded = False
+        try:
+            yield endpoint
+            succeeded = True
+        except Exception as e:
+            with self._lock:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.failure_threshold:
+                    self._eject(endpoint, f"连续失败{self.failure_threshold}次: {e}")
+            raise
+        finally:
+            # 流式调用被提前关闭时也要释放未完成计数
+            elapsed = time.monotonic() - start
+            with self._lock:
+                endpoint.outstanding -= 1
+                if succeeded:
+                    endpoint.consecutive_failures = 0
+                    endpoint.latency = elapsed if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * elapsed
+                    if self.latency_threshold and endpoint.latency > self.latency_threshold and len(self.endpoints) > 1:
+                        self._eject(endpoint, f"平均延迟{endpoint.latency:.1f}s超过阈值")
+
+    def _run(self, endpoint: Endpoint, fn: Callable[[str], Any]) -> Any:
+        """在指定节点上执行调用并记录结果"""
+        with self.track(endpoint):
+            return fn(endpoint.url)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(4, len(self.endpoints) * 4), thread_name_prefix="endpoint-hedge")
+            return self._executor
+
+    def _run_hedged(self, primary: Endpoint, fn: Callable[[str], Any], tried: Set[str]) -> Any:
+        """执行主请求，超时未返回时向另一节点发出对冲请求
+
+        对冲计时从主请求实际开始执行时算起，线程池排队的时间不计入 hedge_after。
+        """
+        executor = self._get_executor()
+        started = threading.Event()
+
+        def run_primary(url: str) -> Any:
+            started.set()
+            return fn(url)
+
+        primary_future = executor.submit(self._run, primary, run_primary)
+        primary_future.add_done_callback(lambda _: started.set())
+        futures = {primary_future: primary}
+        started.wait()
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            backup = self.acquire(exclude=tried)
+            if backup is not None:
+                tried.add(backup.url)
+                futures[executor.submit(self._run, backup, fn)] = backup
+                with self._lock:
+                    self.hedged += 1
+
+        pending = set(futures)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if futures[future] is not primary:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def call(self, fn: Callable[[str], Any]) -> Any:
+        """在选中的节点上执行 fn(url)，失败时转移到其他节点"""
+        tried: Set[str] = set()
+        last_error: Optional[BaseException] = None
+        for _ in range(min(self.max_attempts, len(self.endpoints))):
+            endpoint = self.acquire(exclude=tried)
+            if endpoint is None:
+                break
+            tried.add(endpoint.url)
+            try:
+                if self.hedge_after and len(self.endpoints) > 1:
+                    return self._run_hedged(endpoint, fn, tried)
+                return self._run(endpoint, fn)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"节点调用失败 {endpoint.url}: {e}")
+        raise last_error
+
+    def _ensure_health_thread(self):
+        if self.health_check is None or self._health_thread is not None:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(target=self._health_loop, name="endpoint-health", daemon=True)
+                self._health_thread.start()
+
+    def check_health(self):
+        """检查所有节点：不可用的节点摘除（仍不可用则延长摘除），摘除到期且检查通过后恢复"""
+        for endpoint in self.endpoints:
+            healthy = self.health_check(endpoint.url)
+            with self._lock:
+                now = time.monotonic()
+                if not healthy and endpoint.is_available(now):
+                    self._eject(endpoint, "健康检查失败")
+                elif not healthy:
+                    endpoint.ejected_until = now + self.eject_seconds
+                elif endpoint.ejected_until and endpoint.is_available(now):
+                    endpoint.ejected_until = 0.0
+                    logger.info(f"节点已恢复: {endpoint.url}")
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.warning(f"节点健康检查出错: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取各节点状态"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "endpoints": [endpoint.to_dict(now) for endpoint in self.endpoints],
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins
+            }
@@ -0,0 +1,159 @@
+"""
+确定性的假模型后端 - 用于基准测试和离线压测
+- hash_embedding: 基于哈希的词袋向量，相同文本在任何机器上得到相同向量，共享词语的文本距离更近
+- fake_completion: 由提示词哈希决定的固定回答
+- FakeEmbeddings / FakeChatModel: 可直接替换Ollama/OpenAI客户端
+- FakeModelManager: create_llm / create_embeddings 返回上述假后端
+
+结果只取决于输入文本，不依赖网络和GPU，不同提交之间的基准结果可以直接比较。
+"""
+import re
+import time
+import math
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.utils.model_manager import ModelManager
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+|[^\sA-Za-z0-9_]")
+
+_WORDS = (
+    "the document system index vector query answer model cache search result "
+    "文档 知识 检索 向量 模型 回答 问题 缓存 系统 数据"
+).split()
+
+
+def tokenize(text: str) -> List[str]:
+    """英文按单词、中文按单字切分（小写）"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def hash_embedding(text: str, dim: int = 256) -> List[float]:
+    """哈希词袋向量（L2归一化）：每个词哈希到一个维度和符号"""
+    vector = [0.0] * dim
+    for token in tokenize(text):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dim] += 1.0 if (value >> 63) & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        # 空文本返回固定的单位向量，避免FAISS出现全零向量
+        vector[0] = 1.0
+        return vector
+    return [x / norm for x in vector]
+
+
+def fake_completion(prompt: str, tokens: int = 32) -> str:
+    """由提示词哈希决定的固定回答，约 tokens 个词"""
+    seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+    words = []
+    while len(words) < tokens:
+        for byte in seed:
+            words.append(_WORDS[byte % len(_WORDS)])
+            if len(words) >= tokens:
+                break
+        seed = hashlib.sha256(seed).digest()
+    return "（模拟回答）" + " ".join(words)
+
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:  # 未安装langchain时仍可在纯Python基准中使用
+    _EmbeddingsBase = object
+
+
+class FakeEmbeddings(_EmbeddingsBase):
+    """哈希嵌入模型"""
+
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        """
+        Args:
+            dim: 向量维度
+            latency: 每次调用的模拟耗时（秒）
+        """
+        self.dim = dim
+        self.latency = latency
+        self.model = f"fake-hash-{dim}"
+        self.base_url = "fake://local"
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [hash_embedding(text, self.dim) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_fake_chat_model(latency: float = 0.0, tokens: int = 32, token_interval: float = 0.0):
+    """创建假对话模型（LangChain BaseChatModel，可用于RetrievalQA等链）
+
+    Args:
+        latency: 首个token前的模拟耗时（秒）
+        tokens: 回答的词数
+        token_interval: 流式输出时每个词的间隔（秒）
+    """
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class FakeChatModel(BaseChatModel):
+        latency: float = 0.0
+        tokens: int = 32
+        token_interval: float = 0.0
+
+        @property
+        def _llm_type(self) -> str:
+            return "fake-chat"
+
+        @staticmethod
+        def _prompt(messages) -> str:
+            return "\n".join(str(message.content) for message in messages)
+
+        def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+            if self.latency:
+                time.sleep(self.latency)
+            if self.token_interval:
+                time.sleep(self.token_interval * self.tokens)
+            text = fake_completion(self._prompt(messages), self.tokens)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+        def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+            if self.latency:
+                time.sleep(self.latency)
+            for i, word in enumerate(fake_completion(self._prompt(messages), self.tokens).split(" ")):
+                if self.token_interval:
+                    time.sleep(self.token_interval)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+    return FakeChatModel(latency=latency, tokens=tokens, token_interval=token_interval)
+
+
+class FakeModelManager(ModelManager):
+    """返回假后端的模型管理器，其余行为（配置、签名）与ModelManager一致"""
+
+    def __init__(self, config_file: str = "cache/fake_model_config.json", dim: int = 256,
+                 embed_latency: float = 0.0, llm_latency: float = 0.0, tokens: int = 32):
+        super().__init__(config_file)
+        self.embeddings = FakeEmbeddings(dim, embed_latency)
+        self.llm_options = {"latency": llm_latency, "tokens": tokens}
+        self._llm = None
+
+    def create_llm(self, provider: Optional[str] = None, model: Optional[str] = None):
+        if self._llm is None:
+            self._llm = create_fake_chat_model(**self.llm_options)
+        return self._llm
+
+    def create_embeddings(self, provider: Optional[str] = None, model: Optional[str] = None):
+        return self.embeddings
+
+    def get_embedding_signature(self, provider: Optional[str] = None) -> Dict[str, Any]:
+        return {"provider": "fake", "model": self.embeddings.model, "base_url": None}
+
+    def get_endpoint_status(self) -> Optional[Dict[str, Any]]:
+        return None
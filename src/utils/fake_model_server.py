@@ -0,0 +1,395 @@
+"""
+本地假模型服务 - 兼容Ollama和OpenAI的HTTP接口，用于离线压测
+接口:
+    Ollama:  GET /api/tags, POST /api/generate, POST /api/chat, POST /api/embeddings
+    OpenAI:  GET /v1/models, POST /v1/chat/completions, POST /v1/completions, POST /v1/embeddings
+    管理:    GET /_fake/stats, POST /_fake/config（运行中调整延迟、错误率等）
+
+回答和嵌入向量只由输入文本决定（见 fake_backends），延迟、吐字速度和错误由 FakeServerConfig 控制，
+随机数使用固定种子，同一请求序列下的行为可以复现。
+"""
+import json
+import math
+import time
+import random
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.fake_backends import fake_completion, hash_embedding
+
+logger = logging.getLogger(__name__)
+
+
+def parse_latency(spec: str) -> Tuple[str, List[float]]:
+    """解析延迟分布，如 "fixed:0.2"、"uniform:0.1,0.5"、"normal:0.3,0.05"、"lognormal:-1.5,0.5"、"exp:0.2" """
+    kind, _, args = (spec or "fixed:0").partition(":")
+    params = [float(x) for x in args.split(",") if x.strip()] if args else []
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+    if kind not in expected or len(params) != expected[kind]:
+        raise ValueError(f"无效的延迟分布: {spec!r}，可用: fixed:s / uniform:a,b / normal:mean,std / lognormal:mu,sigma / exp:mean")
+    return kind, params
+
+
+@dataclass
+class FakeServerConfig:
+    """假模型服务的行为配置"""
+    latency: str = "fixed:0"          # 首个token前的延迟分布（秒）
+    embed_latency: str = "fixed:0"    # 嵌入请求的延迟分布（秒）
+    tokens_per_s: float = 0.0         # 吐字速度，0表示立即返回全部内容
+    tokens: int = 64                  # 默认回答的词数（请求中的 max_tokens / num_predict 优先）
+    embedding_dim: int = 768
+    error_rate: float = 0.0           # 返回错误响应的比例
+    error_status: int = 500
+    stall_rate: float = 0.0           # 挂起不响应的比例（模拟超时）
+    stall_seconds: float = 30.0
+    seed: int = 0
+    models: Tuple[str, ...] = ("llama2", "llama3", "mistral", "nomic-embed-text", "gpt-3.5-turbo", "text-embedding-ada-002")
+
+    def __post_init__(self):
+        parse_latency(self.latency)
+        parse_latency(self.embed_latency)
+
+
+class FakeModelServer:
+    """在后台线程运行的假模型服务"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[FakeServerConfig] = None):
+        """
+        Args:
+            port: 端口，0表示自动分配（启动后见 self.port）
+        """
+        self.config = config or FakeServerConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"requests": {}, "errors_injected": 0, "stalls_injected": 0, "tokens": 0, "in_flight": 0}
+
+        server = self
+
+        class Handler(_FakeHandler):
+            owner = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeModelServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-model-server", daemon=True)
+        self._thread.start()
+        logger.info(f"假模型服务已启动: {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeModelServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def update_config(self, **changes) -> FakeServerConfig:
+        """运行中调整配置（如压测过程中提高错误率）"""
+        with self._lock:
+            values = asdict(self.config)
+            values.update({k: v for k, v in changes.items() if k in values})
+            if "models" in changes:
+                values["models"] = tuple(values["models"])
+            self.config = FakeServerConfig(**values)
+            if "seed" in changes:
+                self._rng = random.Random(self.config.seed)
+            return self.config
+
+    def sample_latency(self, spec: str) -> float:
+        kind, params = parse_latency(spec)
+        with self._lock:
+            if kind == "fixed":
+                value = params[0]
+            elif kind == "uniform":
+                value = self._rng.uniform(*params)
+            elif kind == "normal":
+                value = self._rng.gauss(*params)
+            elif kind == "lognormal":
+                value = self._rng.lognormvariate(*params)
+            else:
+                value = self._rng.expovariate(1 / params[0]) if params[0] > 0 else 0.0
+        return max(value, 0.0)
+
+    def draw_fault(self) -> Optional[str]:
+        """按配置的比例决定本次请求是否注入错误或挂起"""
+        with self._lock:
+            roll = self._rng.random()
+            if roll < self.config.error_rate:
+                self.stats["errors_injected"] += 1
+                return "error"
+            if roll < self.config.error_rate + self.config.stall_rate:
+                self.stats["stalls_injected"] += 1
+                return "stall"
+        return None
+
+    def record(self, path: str, tokens: int = 0):
+        with self._lock:
+            self.stats["requests"][path] = self.stats["requests"].get(path, 0) + 1
+            self.stats["tokens"] += tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps({**self.stats, "config": asdict(self.config)}))
+
+
+def _prompt_from_messages(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(message.get("content", "")) for message in messages or [])
+
+
+def _embedding_input(item: Any) -> str:
+    """OpenAI客户端可能发送token id列表，按数字文本计算向量"""
+    if isinstance(item, list):
+        return " ".join(str(token) for token in item)
+    return str(item)
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    """请求处理：HTTP/1.1长连接，流式响应使用分块传输"""
+
+    protocol_version = "HTTP/1.1"
+    owner: FakeModelServer = None
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    # ---- 响应工具 ----
+
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, content_type: str, chunks: Iterator[str]):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _inject_fault(self, openai: bool) -> bool:
+        """注入错误或挂起，返回是否已处理本次请求"""
+        fault = self.owner.draw_fault()
+        if fault == "stall":
+            time.sleep(self.owner.config.stall_seconds)
+        if fault == "error":
+            message = "fake server injected error"
+            payload = {"error": {"message": message, "type": "server_error"}} if openai else {"error": message}
+            self._send_json(self.owner.config.error_status, payload)
+            return True
+        return False
+
+    def _generate_tokens(self, prompt: str, max_tokens: Optional[int]) -> Iterator[str]:
+        """按配置的首token延迟和吐字速度产出回答的各个词"""
+        config = self.owner.config
+        time.sleep(self.owner.sample_latency(config.latency))
+        words = fake_completion(prompt, max_tokens or config.tokens).split(" ")
+        interval = 1 / config.tokens_per_s if config.tokens_per_s > 0 else 0.0
+        for i, word in enumerate(words):
+            if interval:
+                time.sleep(interval)
+            yield word if i == 0 else " " + word
+
+    # ---- 路由 ----
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self.owner.record(self.path)
+            self._send_json(200, {"models": [{"name": f"{name}:latest", "model": f"{name}:latest"} for name in self.owner.config.models]})
+        elif self.path == "/v1/models":
+            self.owner.record(self.path)
+            self._send_json(200, {"object": "list", "data": [{"id": name, "object": "model", "owned_by": "fake"} for name in self.owner.config.models]})
+        elif self.path == "/_fake/stats":
+            self._send_json(200, self.owner.get_stats())
+        elif self.path in ("/", "/health"):
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"not found: {self.path}"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+
+        routes = {
+            "/api/generate": self._ollama_generate,
+            "/api/chat": self._ollama_chat,
+            "/api/embeddings": self._ollama_embeddings,
+            "/api/embed": self._ollama_embeddings,
+            "/v1/chat/completions": self._openai_chat,
+            "/v1/completions": self._openai_completions,
+            "/v1/embeddings": self._openai_embeddings,
+            "/_fake/config": self._update_config,
+        }
+        handler = routes.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"not found: {self.path}"})
+            return
+
+        with self.owner._lock:
+            self.owner.stats["in_flight"] += 1
+        try:
+            if self.path != "/_fake/config" and self._inject_fault(self.path.startswith("/v1/")):
+                self.owner.record(self.path)
+                return
+            handler(request)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug(f"客户端提前断开: {self.path}")
+        finally:
+            with self.owner._lock:
+                self.owner.stats["in_flight"] -= 1
+
+    def _update_config(self, request: Dict[str, Any]):
+        try:
+            config = self.owner.update_config(**request)
+        except (TypeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(200, asdict(config))
+
+    # ---- Ollama ----
+
+    def _ollama_generate(self, request: Dict[str, Any]):
+        self._ollama_complete(request, request.get("prompt", ""), chat=False)
+
+    def _ollama_chat(self, request: Dict[str, Any]):
+        self._ollama_complete(request, _prompt_from_messages(request.get("messages")), chat=True)
+
+    def _ollama_complete(self, request: Dict[str, Any], prompt: str, chat: bool):
+        model = request.get("model", "llama2")
+        max_tokens = (request.get("options") or {}).get("num_predict")
+        if max_tokens is not None and max_tokens < 0:
+            max_tokens = None
+        start = time.perf_counter()
+
+        def payload(text: str, done: bool, count: int = 0) -> Dict[str, Any]:
+            item = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "done": done}
+            if chat:
+                item["message"] = {"role": "assistant", "content": text}
+            else:
+                item["response"] = text
+            if done:
+                item.update({
+                    "total_duration": int((time.perf_counter() - start) * 1e9),
+                    "prompt_eval_count": len(prompt.split()),
+                    "eval_count": count
+                })
+            return item
+
+        # Ollama默认流式返回（NDJSON），stream=false 时一次返回
+        if request.get("stream", True):
+            def lines():
+                count = 0
+                for token in self._generate_tokens(prompt, max_tokens):
+                    count += 1
+                    yield json.dumps(payload(token, False), ensure_ascii=False) + "\n"
+                self.owner.record(self.path, count)
+                yield json.dumps(payload("", True, count), ensure_ascii=False) + "\n"
+            self._send_stream("application/x-ndjson", lines())
+        else:
+            tokens = list(self._generate_tokens(prompt, max_tokens))
+            self.owner.record(self.path, len(tokens))
+            self._send_json(200, payload("".join(tokens), True, len(tokens)))
+
+    def _ollama_embeddings(self, request: Dict[str, Any]):
+        time.sleep(self.owner.sample_latency(self.owner.config.embed_latency))
+        dim = self.owner.config.embedding_dim
+        self.owner.record(self.path)
+        if self.path == "/api/embed":
+            inputs = request.get("input", "")
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            self._send_json(200, {"model": request.get("model"), "embeddings": [hash_embedding(str(text), dim) for text in inputs]})
+        else:
+            self._send_json(200, {"embedding": hash_embedding(request.get("prompt", ""), dim)})
+
+    # ---- OpenAI ----
+
+    def _openai_chat(self, request: Dict[str, Any]):
+        self._openai_complete(request, _prompt_from_messages(request.get("messages")), chat=True)
+
+    def _openai_completions(self, request: Dict[str, Any]):
+        prompt = request.get("prompt", "")
+        self._openai_complete(request, prompt if isinstance(prompt, str) else "\n".join(map(str, prompt)), chat=False)
+
+    def _openai_complete(self, request: Dict[str, Any], prompt: str, chat: bool):
+        model = request.get("model", "gpt-3.5-turbo")
+        completion_id = f"fake-{int(time.time() * 1000)}"
+        created = int(time.time())
+        obj = "chat.completion" if chat else "text_completion"
+        prompt_tokens = len(prompt.split())
+
+        if request.get("stream"):
+            def events():
+                count = 0
+                for token in self._generate_tokens(prompt, request.get("max_tokens")):
+                    count += 1
+                    choice = {"index": 0, "finish_reason": None}
+                    choice.update({"delta": {"content": token}} if chat else {"text": token})
+                    yield "data: " + json.dumps({"id": completion_id, "object": f"{obj}.chunk" if chat else obj, "created": created, "model": model, "choices": [choice]}, ensure_ascii=False) + "\n\n"
+                final = {"index": 0, "finish_reason": "stop"}
+                final.update({"delta": {}} if chat else {"text": ""})
+                self.owner.record(self.path, count)
+                yield "data: " + json.dumps({"id": completion_id, "object": f"{obj}.chunk" if chat else obj, "created": created, "model": model, "choices": [final]}) + "\n\n"
+                yield "data: [DONE]\n\n"
+            self._send_stream("text/event-stream", events())
+            return
+
+        tokens = list(self._generate_tokens(prompt, request.get("max_tokens")))
+        text = "".join(tokens)
+        self.owner.record(self.path, len(tokens))
+        choice = {"index": 0, "finish_reason": "stop"}
+        choice.update({"message": {"role": "assistant", "content": text}} if chat else {"text": text})
+        self._send_json(200, {
+            "id": completion_id,
+            "object": obj,
+            "created": created,
+            "model": model,
+            "choices": [choice],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+        })
+
+    def _openai_embeddings(self, request: Dict[str, Any]):
+        time.sleep(self.owner.sample_latency(self.owner.config.embed_latency))
+        inputs = request.get("input", "")
+        # 单个token id列表视为一条输入
+        if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dim = self.owner.config.embedding_dim
+        texts = [_embedding_input(item) for item in inputs]
+        self.owner.record(self.path)
+        usage = sum(len(text.split()) for text in texts)
+        self._send_json(200, {
+            "object": "list",
+            "model": request.get("model", "text-embedding-ada-002"),
+            "data": [{"object": "embedding", "index": i, "embedding": hash_embedding(text, dim)} for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": usage, "total_tokens": usage}
+        })
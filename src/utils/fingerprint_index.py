@@ -0,0 +1,168 @@
+"""
+文件指纹索引 - 先比对stat信息，只对变化的文件重新计算哈希
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import xxhash  # 可选依赖，比hashlib更快
+except ImportError:
+    xxhash = None
+
+# 每次读取1MB，减少系统调用次数
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def _new_hasher():
+    """创建哈希对象，优先使用xxh3_128，否则退回blake2b"""
+    if xxhash is not None:
+        return "xxh3_128", xxhash.xxh3_128()
+    return "blake2b", hashlib.blake2b(digest_size=16)
+
+
+@dataclass
+class FileDiff:
+    """文件变化明细"""
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    @property
+    def changed(self) -> List[str]:
+        """需要重新处理的文件（新增 + 修改）"""
+        return self.added + self.modified
+
+    def summary(self) -> str:
+        return f"新增{len(self.added)}个, 修改{len(self.modified)}个, 删除{len(self.removed)}个, 未变化{len(self.unchanged)}个"
+
+
+class FingerprintIndex:
+    """基于stat信息的指纹索引
+
+    记录每个文件的 (size, mtime_ns, inode) 和内容哈希。stat未变化时直接信任
+    已记录的哈希，只有stat变化的文件才重新读取全部内容。
+    """
+
+    def __init__(self, index_file: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self.buffer_size = buffer_size
+        self.hash_algo, _ = _new_hasher()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """加载已保存的索引"""
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("hash_algo") == self.hash_algo:
+                self.entries = data.get("entries", {})
+        except Exception as e:
+            logger.warning(f"加载指纹索引失败: {e}")
+
+    def save(self):
+        """保存索引（无变化时跳过）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"hash_algo": self.hash_algo, "entries": self.entries}
+            self._dirty = False
+        tmp_file = self.index_file.with_suffix(".tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            logger.error(f"保存指纹索引失败: {e}")
+
+    def hash_file(self, file_path: str) -> str:
+        """使用大缓冲区计算文件内容哈希"""
+        _, hasher = _new_hasher()
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        with open(file_path, "rb", buffering=0) as f:
+            while True:
+                size = f.readinto(buffer)
+                if not size:
+                    break
+                hasher.update(view[:size])
+        return hasher.hexdigest()
+
+    def fingerprint(self, file_path: str) -> Dict[str, Any]:
+        """获取文件指纹，stat未变化时不读取文件内容"""
+        path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {}
+
+        with self._lock:
+            entry = self.entries.get(path)
+        if (entry is None or entry["file_size"] != stat.st_size
+                or entry["mtime_ns"] != stat.st_mtime_ns or entry["inode"] != stat.st_ino):
+            entry = {
+                "hash": self.hash_file(path),
+                "hash_algo": self.hash_algo,
+                "file_size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "inode": stat.st_ino,
+                "last_modified": stat.st_mtime
+            }
+            with self._lock:
+                self.entries[path] = entry
+                self._dirty = True
+
+        return {
+            **entry,
+            "filename": os.path.basename(path),
+            "relative_path": os.path.relpath(path)
+        }
+
+    def forget(self, file_path: str):
+        """移除文件的索引记录"""
+        with self._lock:
+            if self.entries.pop(os.path.abspath(file_path), None) is not None:
+                self._dirty = True
+
+    def diff(self, current_files: List[str], baseline: Dict[str, Dict[str, Any]]) -> FileDiff:
+        """比较当前文件与基线指纹，返回逐文件的变化明细
+
+        Args:
+            current_files: 当前文件路径列表
+            baseline: 上次构建时保存的 {路径: 指纹}
+        """
+        result = FileDiff()
+        current = set()
+        for file_path in current_files:
+            current.add(file_path)
+            saved = baseline.get(file_path)
+            if not saved:
+                result.added.append(file_path)
+                continue
+            fingerprint = self.fingerprint(file_path)
+            if fingerprint.get("hash") != saved.get("hash") or fingerprint.get("file_size") != saved.get("file_size"):
+                result.modified.append(file_path)
+            else:
+                result.unchanged.append(file_path)
+
+        result.removed = [file_path for file_path in baseline if file_path not in current]
+        self.save()
+        return result
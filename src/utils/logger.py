@@ -1,109 +1,197 @@
 """
 日志管理器 - 统一的日志配置
+
+日志调用只把记录放入内存队列（QueueHandler），由后台线程（QueueListener）统一写控制台和文件，
+请求线程不做磁盘IO。各模块的logger不挂处理器，统一传递到根logger，每条记录只写一次。
+全局配置只由入口（main.py / start.py / serve.py）调用 setup_global_logging() 完成，导入模块不会改动日志配置。
+- 文件: LOG_FILE，每行一个JSON对象（含 request_id），按 LOG_MAX_BYTES / LOG_BACKUP_COUNT 滚动
+- 控制台: 可读文本，INFO及以上
+- DEBUG日志按调用位置采样（LOG_DEBUG_SAMPLE_RATE），避免高频调试日志刷屏
 """
 import os
+import json
+import atexit
+import queue
 import logging
 import logging.handlers
-from pathlib import Path
+import threading
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.utils.tracing import current_trace
+
+# LogRecord的标准属性，其余属性（logger.info(..., extra={...})）作为结构化字段输出
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sampled"}
+
+
+class RequestContextFilter(logging.Filter):
+    """在产生日志的线程上附加当前请求ID（追踪上下文在入队后不可见）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            trace = current_trace()
+            record.request_id = trace.request_id if trace is not None else None
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """DEBUG日志按调用位置采样：每个位置每 1/rate 条保留1条，INFO及以上全部保留"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+            "module": record.module,
+            "line": record.lineno
+        }
+        if getattr(record, "sampled", None):
+            payload["sampled"] = record.sampled
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """入队前只合并消息参数和异常文本，格式化留给后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 class LoggerManager:
     """日志管理器"""
-    
-    def __init__(self, log_dir: str = "logs", log_level: str = "INFO"):
-        self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(exist_ok=True)
+
+    def __init__(self, log_file: str = "logs/app.log", log_level: str = "INFO", max_bytes: int = 50 * 1024 * 1024,
+                 backup_count: int = 10, debug_sample_rate: float = 0.1, json_file: bool = True):
+        """
+        Args:
+            log_file: 日志文件，为空时只输出到控制台
+            max_bytes / backup_count: 文件滚动策略
+            debug_sample_rate: DEBUG日志保留比例
+            json_file: 文件是否使用JSON格式
+        """
+        self.log_file = Path(log_file) if log_file else None
         self.log_level = getattr(logging, log_level.upper())
-        
-        # 确保子目录存在
-        (self.log_dir / "app").mkdir(exist_ok=True)
-        (self.log_dir / "error").mkdir(exist_ok=True)
-        (self.log_dir / "debug").mkdir(exist_ok=True)
-    
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.debug_sample_rate = debug_sample_rate
+        self.json_file = json_file
+        self.queue: Optional[queue.Queue] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._queue_handler: Optional[logging.Handler] = None
+        self._lock = threading.Lock()
+
     def get_logger(self, name: str) -> logging.Logger:
-        """获取配置好的logger"""
-        logger = logging.getLogger(name)
-        
-        if logger.handlers:  # 避免重复配置
-            return logger
-        
-        logger.setLevel(self.log_level)
-        
-        # 格式化器
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
-        # 控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
-        
-        # 文件处理器 - 应用日志
-        app_handler = logging.handlers.RotatingFileHandler(
-            self.log_dir / "app" / f"{name}.log",
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5
-        )
-        app_handler.setLevel(logging.INFO)
-        app_handler.setFormatter(formatter)
-        logger.addHandler(app_handler)
-        
-        # 文件处理器 - 错误日志
-        error_handler = logging.handlers.RotatingFileHandler(
-            self.log_dir / "error" / f"{name}_error.log",
-            maxBytes=10*1024*1024,
-            backupCount=5
-        )
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-        logger.addHandler(error_handler)
-        
-        # 文件处理器 - 调试日志
-        debug_handler = logging.handlers.RotatingFileHandler(
-            self.log_dir / "debug" / f"{name}_debug.log",
-            maxBytes=10*1024*1024,
-            backupCount=3
-        )
-        debug_handler.setLevel(logging.DEBUG)
-        debug_handler.setFormatter(formatter)
-        logger.addHandler(debug_handler)
-        
-        return logger
-    
-    def setup_global_logging(self):
-        """设置全局日志配置"""
-        # 设置根logger
-        root_logger = logging.getLogger()
-        root_logger.setLevel(self.log_level)
-        
-        # 移除现有的handler
-        for handler in root_logger.handlers[:]:
-            root_logger.removeHandler(handler)
-        
-        # 添加新的handler
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
+        """获取logger（不挂处理器，也不改动全局配置）"""
+        return logging.getLogger(name)
+
+    def _build_handlers(self):
+        text_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
         # 控制台
         console = logging.StreamHandler()
-        console.setFormatter(formatter)
-        root_logger.addHandler(console)
-        
-        # 文件
-        file_handler = logging.handlers.RotatingFileHandler(
-            self.log_dir / "app.log",
-            maxBytes=50*1024*1024,
-            backupCount=10
-        )
-        file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        console.setLevel(logging.INFO)
+        console.setFormatter(text_formatter)
+        handlers = [console]
+
+        # 文件（单一滚动策略）
+        if self.log_file is not None:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                self.log_file,
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count,
+                encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonFormatter() if self.json_file else text_formatter)
+            handlers.append(file_handler)
+        return handlers
+
+    def setup_global_logging(self):
+        """设置全局日志配置：根logger只挂一个队列处理器，重复调用时不重复配置"""
+        with self._lock:
+            if self.listener is not None:
+                return
+
+            root_logger = logging.getLogger()
+            root_logger.setLevel(self.log_level)
+
+            # 移除现有的handler（如启动脚本的basicConfig）
+            for handler in root_logger.handlers[:]:
+                root_logger.removeHandler(handler)
+
+            self.queue = queue.Queue(-1)
+            queue_handler = _QueueHandler(self.queue)
+            queue_handler.addFilter(DebugSampler(self.debug_sample_rate))
+            queue_handler.addFilter(RequestContextFilter())
+            root_logger.addHandler(queue_handler)
+            self._queue_handler = queue_handler
+
+            self.listener = logging.handlers.QueueListener(self.queue, *self._build_handlers(), respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """写完队列中剩余的日志并停止后台线程"""
+        with self._lock:
+            if self.listener is None:
+                return
+            logging.getLogger().removeHandler(self._queue_handler)
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
 
 # 全局日志管理器实例
-logger_manager = LoggerManager()
+logger_manager = LoggerManager(
+    log_file=os.getenv("LOG_FILE", "logs/app.log"),
+    log_level=os.getenv("LOG_LEVEL", "INFO"),
+    max_bytes=int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+    backup_count=int(os.getenv("LOG_BACKUP_COUNT", "10")),
+    debug_sample_rate=float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1")),
+    json_file=os.getenv("LOG_JSON", "true").lower() == "true"
+)
 
 def get_logger(name: str) -> logging.Logger:
     """获取logger的便捷函数"""
-    return logger_manager.get_logger(name)
\ No newline at end of file
+    return logger_manager.get_logger(name)
@@ -1,49 +1,164 @@
 """
 模型管理器 - 支持Ollama本地模型和OpenAI模型切换
+模型客户端按 (类型, 提供商, base_url, 模型) 在进程内复用，底层HTTP连接池保持长连接
+Ollama可配置多个节点（endpoints / OLLAMA_ENDPOINTS），此时请求经EndpointPool负载均衡
 """
 import os
-from typing import Dict, Any, Optional
+import threading
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import json
 import logging
-from langchain_openai import ChatOpenAI
-from langchain_community.llms import Ollama
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_openai import OpenAIEmbeddings
 
+# langchain客户端在创建模型时才导入，避免拖慢进程启动
 logger = logging.getLogger(__name__)
 
+# 进程内共享的客户端和HTTP连接池，多个ModelManager（如多知识库）共用
+_clients: Dict[Tuple, Any] = {}
+_http_clients: Dict[Tuple, Any] = {}
+_clients_lock = threading.RLock()  # 多节点客户端的工厂会嵌套创建单节点客户端
+
+
+def _get_or_create(registry: Dict[Tuple, Any], key: Tuple, factory):
+    """按键复用实例，首次使用时创建"""
+    with _clients_lock:
+        instance = registry.get(key)
+        if instance is None:
+            instance = factory()
+            registry[key] = instance
+        return instance
+
+
+def close_clients():
+    """关闭所有HTTP连接池（进程退出或测试清理时调用）"""
+    with _clients_lock:
+        for http_client in _http_clients.values():
+            try:
+                http_client.close()
+            except Exception as e:
+                logger.debug(f"关闭HTTP连接池失败: {e}")
+        _http_clients.clear()
+        _clients.clear()
+
 class ModelManager:
     """模型管理器，支持多种模型切换"""
     
-    def __init__(self, config_file: str = "cache/model_config.json"):
+    def __init__(
+        self,
+        config_file: str = "cache/model_config.json",
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
+        """
+        Args:
+            config_file: 模型配置文件
+            pool_size: 每个服务地址的HTTP连接池大小，默认读取HTTP_POOL_SIZE
+            timeout: 请求超时（秒），默认读取REQUEST_TIMEOUT
+            max_retries: 失败重试次数，默认读取MAX_RETRIES
+        """
         self.config_file = Path(config_file)
         self.config_file.parent.mkdir(parents=True, exist_ok=True)
         self.current_config = self.load_config()
+        self.pool_size = pool_size or int(os.getenv("HTTP_POOL_SIZE", "20"))
+        self.timeout = timeout or float(os.getenv("REQUEST_TIMEOUT", "30"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("MAX_RETRIES", "3"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+    
+    def get_http_client(self, base_url: Optional[str]):
+        """获取指向某个服务地址的长连接HTTP客户端（httpx，供OpenAI SDK使用）"""
+        def factory():
+            import httpx
+            return httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0))
+            )
+        return _get_or_create(_http_clients, ("httpx", base_url, self.pool_size, self.timeout), factory)
+    
+    def get_session(self, base_url: Optional[str]):
+        """获取指向某个服务地址的requests长连接会话（健康检查等轻量请求使用）"""
+        def factory():
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            return session
+        return _get_or_create(_http_clients, ("requests", base_url, self.pool_size), factory)
+    
+    def get_endpoints(self, provider: str = "ollama") -> List[str]:
+        """获取某个提供商的节点列表：配置中的endpoints > 环境变量OLLAMA_ENDPOINTS > base_url"""
+        config = self.current_config.get(provider, {})
+        endpoints = config.get("endpoints")
+        if not endpoints and provider == "ollama":
+            endpoints = [url.strip() for url in os.getenv("OLLAMA_ENDPOINTS", "").split(",") if url.strip()]
+        if not endpoints:
+            endpoints = [config.get("base_url")]
+        return list(dict.fromkeys(url.rstrip("/") for url in endpoints if url))
+    
+    def get_endpoint_pool(self, urls: List[str]):
+        """获取多节点负载均衡池（相同节点列表共用一个池，节点状态跨模型共享）"""
+        def factory():
+            from src.utils.endpoint_pool import EndpointPool
+            hedge_ms = float(os.getenv("OLLAMA_HEDGE_AFTER_MS", "0"))
+            latency_threshold = float(os.getenv("OLLAMA_LATENCY_THRESHOLD_S", "0"))
+            return EndpointPool(
+                urls,
+                health_check=self.ping_ollama,
+                failure_threshold=int(os.getenv("OLLAMA_FAILURE_THRESHOLD", "3")),
+                latency_threshold=latency_threshold or None,
+                eject_seconds=float(os.getenv("OLLAMA_EJECT_SECONDS", "30")),
+                hedge_after=hedge_ms / 1000 if hedge_ms > 0 else None
+            )
+        return _get_or_create(_clients, ("pool", tuple(urls)), factory)
+    
+    def get_endpoint_status(self) -> Optional[Dict[str, Any]]:
+        """获取Ollama多节点状态，单节点时返回None"""
+        urls = self.get_endpoints("ollama")
+        if len(urls) < 2:
+            return None
+        return self.get_endpoint_pool(urls).get_status()
     
     def load_config(self) -> Dict[str, Any]:
-        """加载模型配置"""
+        """加载模型配置，显式设置的环境变量（MODEL_PROVIDER、OPENAI_API_KEY、OPENAI_API_BASE、OLLAMA_BASE_URL）优先"""
+        config = None
         if self.config_file.exists():
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    config = json.load(f)
             except Exception as e:
                 logger.warning(f"加载模型配置失败: {e}")
         
-        # 默认配置
-        return {
-            "provider": "openai",  # openai 或 ollama
-            "openai": {
-                "model": "gpt-3.5-turbo",
-                "api_key": os.getenv("OPENAI_API_KEY", ""),
-                "base_url": os.getenv("OPENAI_API_BASE", None)
-            },
-            "ollama": {
-                "model": "llama2",
-                "base_url": "http://localhost:11434",
-                "embedding_model": "nomic-embed-text"
+        if config is None:
+            # 默认配置
+            config = {
+                "provider": "ollama",  # openai 或 ollama
+                "openai": {
+                    "model": "gpt-3.5-turbo",
+                    "api_key": "",
+                    "base_url": None
+                },
+                "ollama": {
+                    "model": "llama2",
+                    "base_url": "http://localhost:11434",
+                    "embedding_model": "nomic-embed-text"
+                }
             }
-        }
+        
+        # 环境变量优先于保存的配置，便于临时切换模型服务（如指向假模型服务压测）
+        if os.getenv("MODEL_PROVIDER"):
+            config["provider"] = os.getenv("MODEL_PROVIDER")
+        for section, key, env in (("openai", "api_key", "OPENAI_API_KEY"), ("openai", "base_url", "OPENAI_API_BASE"),
+                                  ("ollama", "base_url", "OLLAMA_BASE_URL")):
+            if os.getenv(env):
+                config.setdefault(section, {})[key] = os.getenv(env)
+        return config
     
     def save_config(self):
         """保存模型配置"""
@@ -82,21 +197,47 @@ class ModelManager:
         if provider == "openai":
             config = self.current_config["openai"]
             model_name = model or config["model"]
-            return ChatOpenAI(
-                model=model_name,
-                openai_api_key=config["api_key"],
-                openai_api_base=config["base_url"],
-                temperature=0.7
-            )
+            
+            def factory():
+                from langchain_openai import ChatOpenAI
+                return ChatOpenAI(
+                    model=model_name,
+                    openai_api_key=config["api_key"],
+                    openai_api_base=config["base_url"],
+                    temperature=0.7,
+                    request_timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=self.get_http_client(config["base_url"])
+                )
+            return _get_or_create(_clients, ("llm", provider, config["base_url"], model_name, config["api_key"]), factory)
         
         elif provider == "ollama":
             config = self.current_config["ollama"]
             model_name = model or config["model"]
-            return Ollama(
-                model=model_name,
-                base_url=config["base_url"],
-                temperature=0.7
-            )
+            urls = self.get_endpoints("ollama")
+            
+            def single(base_url):
+                def factory():
+                    from langchain_community.llms import Ollama
+                    return Ollama(
+                        model=model_name,
+                        base_url=base_url,
+                        temperature=0.7,
+                        timeout=int(self.timeout)
+                    )
+                return _get_or_create(_clients, ("llm", provider, base_url, model_name), factory)
+            
+            if len(urls) == 1:
+                return single(urls[0])
+            
+            def balanced_factory():
+                from src.utils.balanced_ollama import BalancedOllama
+                return BalancedOllama(
+                    pool=self.get_endpoint_pool(urls),
+                    clients={url: single(url) for url in urls},
+                    model=model_name
+                )
+            return _get_or_create(_clients, ("llm", provider, tuple(urls), model_name), balanced_factory)
         
         else:
             raise ValueError(f"不支持的模型提供商: {provider}")
@@ -108,22 +249,69 @@ class ModelManager:
         
         if provider == "openai":
             config = self.current_config["openai"]
-            return OpenAIEmbeddings(
-                openai_api_key=config["api_key"],
-                openai_api_base=config["base_url"]
-            )
+            
+            def factory():
+                from langchain_openai import OpenAIEmbeddings
+                return OpenAIEmbeddings(
+                    openai_api_key=config["api_key"],
+                    openai_api_base=config["base_url"],
+                    request_timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=self.get_http_client(config["base_url"])
+                )
+            return _get_or_create(_clients, ("embeddings", provider, config["base_url"], model, config["api_key"]), factory)
         
         elif provider == "ollama":
             config = self.current_config["ollama"]
             model_name = model or config["embedding_model"]
-            return OllamaEmbeddings(
-                model=model_name,
-                base_url=config["base_url"]
-            )
+            urls = self.get_endpoints("ollama")
+            
+            def single(base_url):
+                def factory():
+                    from langchain_community.embeddings import OllamaEmbeddings
+                    return OllamaEmbeddings(
+                        model=model_name,
+                        base_url=base_url
+                    )
+                return _get_or_create(_clients, ("embeddings", provider, base_url, model_name), factory)
+            
+            if len(urls) == 1:
+                return single(urls[0])
+            
+            def balanced_factory():
+                from src.utils.balanced_ollama import BalancedOllamaEmbeddings
+                return BalancedOllamaEmbeddings(
+                    pool=self.get_endpoint_pool(urls),
+                    clients={url: single(url) for url in urls},
+                    model=model_name
+                )
+            return _get_or_create(_clients, ("embeddings", provider, tuple(urls), model_name), balanced_factory)
         
         else:
             raise ValueError(f"不支持的模型提供商: {provider}")
     
+    def get_embedding_signature(self, provider: Optional[str] = None) -> Dict[str, Any]:
+        """获取当前嵌入模型的标识，向量库和快照只能在相同嵌入模型下复用"""
+        if provider is None:
+            provider = self.current_config["provider"]
+        
+        config = self.current_config.get(provider, {})
+        if provider == "openai":
+            model_name = config.get("embedding_model", "text-embedding-ada-002")
+        else:
+            model_name = config.get("embedding_model")
+        
+        return {
+            "provider": provider,
+            "model": model_name,
+            "base_url": config.get("base_url")
+        }
+    
+    def get_current_model(self) -> Dict[str, Any]:
+        """当前使用的模型提供商和模型名称"""
+        provider = self.current_config["provider"]
+        return {"provider": provider, "model": self.current_config.get(provider, {}).get("model")}
+    
     def set_provider(self, provider: str, **kwargs):
         """设置模型提供商"""
         self.current_config["provider"] = provider
@@ -135,6 +323,16 @@ class ModelManager:
         
         self.save_config()
     
+    def ping_ollama(self, base_url: Optional[str] = None) -> bool:
+        """轻量检查Ollama服务是否可用（复用长连接，不调用模型）"""
+        base_url = (base_url or self.current_config["ollama"]["base_url"]).rstrip("/")
+        try:
+            response = self.get_session(base_url).get(f"{base_url}/api/tags", timeout=min(self.timeout, 5.0))
+            return response.status_code == 200
+        except Exception as e:
+            logger.debug(f"Ollama健康检查失败 {base_url}: {e}")
+            return False
+    
     def get_current_config(self) -> Dict[str, Any]:
         """获取当前配置"""
         return self.current_config
@@ -142,11 +340,7 @@ class ModelManager:
     def test_ollama_connection(self) -> Dict[str, Any]:
         """测试Ollama连接"""
         try:
-            ollama = Ollama(
-                model=self.current_config["ollama"]["model"],
-                base_url=self.current_config["ollama"]["base_url"]
-            )
-            response = ollama.invoke("你好")
+            response = self.create_llm("ollama").invoke("你好")
             return {
                 "success": True,
                 "message": "Ollama连接成功",
@@ -162,12 +356,7 @@ class ModelManager:
     def test_openai_connection(self) -> Dict[str, Any]:
         """测试OpenAI连接"""
         try:
-            openai = ChatOpenAI(
-                model="gpt-3.5-turbo",
-                openai_api_key=self.current_config["openai"]["api_key"],
-                openai_api_base=self.current_config["openai"]["base_url"]
-            )
-            response = openai.invoke("你好")
+            response = self.create_llm("openai", "gpt-3.5-turbo").invoke("你好")
             return {
                 "success": True,
                 "message": "OpenAI连接成功",
@@ -178,4 +367,9 @@ class ModelManager:
                 "success": False,
                 "message": f"OpenAI连接失败: {str(e)}",
                 "response": None
-            }
\ No newline at end of file
+            }
+
+@lru_cache(maxsize=None)
+def get_default_model_manager() -> ModelManager:
+    """进程内默认的模型管理器（未显式传入model_manager时使用）"""
+    return ModelManager()
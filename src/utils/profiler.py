@@ -0,0 +1,221 @@
+"""
+采样分析 - 不依赖py-spy的进程内性能诊断
+- SamplingProfiler: 在指定时间窗口内定时采样所有线程的调用栈，输出折叠栈格式
+  （每行 "帧1;帧2;...;帧N 次数"，可直接交给 flamegraph.pl、speedscope 或 inferno 生成火焰图）
+- SlowRequestMonitor: 请求耗时超过阈值时对其执行线程采样，请求结束后保存调用栈、阶段耗时、会话ID和问题
+
+采样线程只在窗口内或有慢请求时工作，平时不影响请求处理。
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+_CWD = os.getcwd()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_CWD):
+        filename = os.path.relpath(filename, _CWD)
+    else:
+        # 标准库和第三方库只保留包内路径
+        parts = Path(filename).parts
+        if "site-packages" in parts:
+            filename = "/".join(parts[parts.index("site-packages") + 1:])
+        else:
+            filename = Path(filename).name
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, thread_name: Optional[str] = None) -> str:
+    """把一个线程的调用栈折叠为 "根;...;叶" 形式"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    if thread_name:
+        labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """折叠栈文本，按次数降序"""
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + ("\n" if stacks else "")
+
+
+class SamplingProfiler:
+    """定时采样所有线程的调用栈"""
+
+    def __init__(self, interval: float = 0.01, output_dir: str = "logs/profiles"):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            output_dir: profile() 结果的保存目录
+        """
+        self.interval = interval
+        self.output_dir = Path(output_dir)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: Optional[float] = None):
+        """开始采样；指定 duration 时到时自动停止"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("采样已在进行中")
+            self.stacks = Counter()
+            self.samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> str:
+        """停止采样并返回折叠栈文本"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.collapsed()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, duration: Optional[float]):
+        own = threading.get_ident()
+        deadline = time.perf_counter() + duration if duration else None
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own:
+                    self.stacks[collapse_stack(frame, names.get(thread_id, f"thread-{thread_id}"))] += 1
+            self.samples += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            self._stop.wait(self.interval)
+
+    def collapsed(self) -> str:
+        return format_collapsed(self.stacks)
+
+    def profile(self, seconds: float) -> Path:
+        """采样一段时间，结果写入 output_dir/profile-时间.folded 并返回路径"""
+        self.start(seconds)
+        self.wait()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+        path.write_text(self.collapsed(), encoding="utf-8")
+        logger.info(f"采样完成: {self.samples}次，结果 {path}")
+        return path
+
+
+class SlowRequestMonitor:
+    """捕获慢请求：超过阈值后对请求所在线程采样，结束时保存调用栈和阶段耗时"""
+
+    def __init__(self, threshold_ms: float = 10000, interval: float = 0.05, max_records: int = 50, max_query_chars: int = 200):
+        """
+        Args:
+            threshold_ms: 慢请求阈值（毫秒）
+            interval: 检查和采样间隔（秒）
+            max_records: 保留的最近慢请求数量
+        """
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.max_query_chars = max_query_chars
+        self.records: deque = deque(maxlen=max_records)
+        self._samples: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SlowRequestMonitor":
+        if self._thread is None:
+            tracing.add_finish_hook(self._on_finish)
+            self._thread = threading.Thread(target=self._run, name="slow-request-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        tracing.remove_finish_hook(self._on_finish)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample_once()
+
+    def sample_once(self):
+        """对超过阈值的进行中请求各采样一次"""
+        slow = [trace for trace in tracing.active_traces() if trace.elapsed() >= self.threshold]
+        if not slow:
+            return
+        frames = sys._current_frames()
+        with self._lock:
+            for trace in slow:
+                frame = frames.get(trace.thread_id)
+                if frame is not None:
+                    self._samples.setdefault(trace.request_id, Counter())[collapse_stack(frame)] += 1
+
+    def _on_finish(self, trace):
+        with self._lock:
+            stacks = self._samples.pop(trace.request_id, Counter())
+        if trace.duration < self.threshold:
+            return
+        query = trace.tags.get("query")
+        record = {
+            "request_id": trace.request_id,
+            "timestamp": trace.timestamp,
+            "kind": trace.kind,
+            "total_ms": round(trace.duration * 1000, 1),
+            "session_id": trace.tags.get("session_id"),
+            "query": query[:self.max_query_chars] if query else None,
+            "route": trace.attrs.get("route"),
+            "status": trace.attrs.get("status"),
+            "stages_ms": trace.stage_ms(),
+            "samples": sum(stacks.values()),
+            "stacks": format_collapsed(stacks)
+        }
+        with self._lock:
+            self.records.append(record)
+        logger.warning(f"慢请求 {trace.request_id}: {record['total_ms']}ms，阶段耗时 {record['stages_ms']}")
+
+    def get_records(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """最近的慢请求，新的在前"""
+        with self._lock:
+            records = list(reversed(self.records))
+        return records[:limit] if limit else records
+
+
+@lru_cache(maxsize=None)
+def get_slow_request_monitor() -> Optional[SlowRequestMonitor]:
+    """进程内的慢请求监控（SLOW_REQUEST_MS 配置，0表示关闭）"""
+    threshold_ms = float(os.getenv("SLOW_REQUEST_MS", "10000"))
+    if threshold_ms <= 0:
+        return None
+    return SlowRequestMonitor(threshold_ms).start()
+
+
+@lru_cache(maxsize=None)
+def get_profiler() -> Optional[SamplingProfiler]:
+    """进程内的采样器，PROFILING_ENABLED=true 时才可用"""
+    if os.getenv("PROFILING_ENABLED", "false").lower() != "true":
+        return None
+    return SamplingProfiler(float(os.getenv("PROFILING_INTERVAL_MS", "10")) / 1000, os.getenv("PROFILING_DIR", "logs/profiles"))
@@ -0,0 +1,419 @@
+"""
+请求追踪与指标 - 记录RAG请求各阶段耗时
+- span(name): 记录一个阶段（parse / embed / search / keyword / rerank / generate / index / persist）；
+  文档在解析时即按页（PDF）或按文件切分为片段，没有单独的 chunk 阶段，切分耗时计入 parse，
+  index 是片段向量化并写入向量库
+- trace_request(kind): 一次请求的追踪，结束时交给后台线程写入按天滚动的JSONL记录
+- render_metrics(): Prometheus文本格式的指标（/metrics 接口输出）
+
+追踪上下文保存在contextvars中，同一线程（或复制了上下文的线程）内的阶段自动归入当前请求；
+没有进行中的请求时，阶段耗时仍计入指标。
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """计数器"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """直方图（累计分桶，与Prometheus客户端一致）"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List[float]] = {}  # 键 -> [各桶计数..., +Inf计数, 总和]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[position] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(tuple(labels.get(name, "") for name in self.labelnames))
+            return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                cumulative += series[len(self.buckets)]
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+STAGE_SECONDS = registry.histogram("rag_stage_duration_seconds", "RAG各阶段耗时（秒）", ["stage"])
+REQUEST_SECONDS = registry.histogram("rag_request_duration_seconds", "请求总耗时（秒）", ["kind", "route", "status"])
+TOKENS = registry.counter("rag_tokens_total", "token数量", ["stage", "type"])
+CACHE_LOOKUPS = registry.counter("rag_cache_lookups_total", "缓存查询次数", ["cache", "result"])
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符按1个token，其余按4个字符1个token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if "⺀" <= ch <= "鿿" or "가" <= ch <= "힯")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class Span:
+    """一个阶段的耗时和属性"""
+
+    __slots__ = ("name", "start", "duration", "attrs")
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attrs = dict(attrs or {})
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "ms": round((self.duration or 0.0) * 1000, 2), **self.attrs}
+
+
+class Trace:
+    """一次请求的追踪记录"""
+
+    def __init__(self, kind: str, request_id: Optional[str] = None, attrs: Optional[Dict[str, Any]] = None):
+        self.kind = kind
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.attrs = dict(attrs or {})
+        self.start = time.perf_counter()
+        self.timestamp = datetime.now().isoformat(timespec="milliseconds")
+        self.duration: Optional[float] = None
+        self.spans: List[Span] = []
+        # 只用于诊断（慢请求捕获），不写入请求记录
+        self.tags: Dict[str, Any] = {}
+        self.thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return self.duration if self.duration is not None else time.perf_counter() - self.start
+
+    def tag(self, **tags):
+        self.tags.update({key: value for key, value in tags.items() if value is not None})
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def stage_ms(self) -> Dict[str, float]:
+        """各阶段累计耗时（同名阶段合并）"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span.name] = round(totals.get(span.name, 0.0) + (span.duration or 0.0) * 1000, 2)
+        return totals
+
+    def to_record(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "request_id": self.request_id,
+            "kind": self.kind,
+            "timestamp": self.timestamp,
+            "total_ms": round((self.duration or 0.0) * 1000, 2),
+            **self.attrs,
+            "stages_ms": self.stage_ms(),
+            "spans": spans
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+_active_traces: Dict[str, Trace] = {}
+_active_lock = threading.Lock()
+_finish_hooks: List[Callable[[Trace], None]] = []
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def active_traces() -> List[Trace]:
+    """进行中的请求（慢请求捕获据此对执行线程采样）"""
+    with _active_lock:
+        return list(_active_traces.values())
+
+
+def add_finish_hook(hook: Callable[[Trace], None]):
+    """注册请求结束时的回调"""
+    if hook not in _finish_hooks:
+        _finish_hooks.append(hook)
+
+
+def remove_finish_hook(hook: Callable[[Trace], None]):
+    if hook in _finish_hooks:
+        _finish_hooks.remove(hook)
+
+
+def _finish_span(span: Span, trace: Optional[Trace]):
+    STAGE_SECONDS.observe(span.duration, stage=span.name)
+    for kind in ("prompt", "completion"):
+        tokens = span.attrs.get(f"{kind}_tokens")
+        if tokens:
+            TOKENS.inc(tokens, stage=span.name, type=kind)
+    if "cache_hit" in span.attrs:
+        CACHE_LOOKUPS.inc(cache=span.name, result="hit" if span.attrs["cache_hit"] else "miss")
+    if trace is not None:
+        trace.add(span)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span]:
+    """记录一个阶段的耗时，属性可在阶段内通过 span.set() 或 annotate() 补充"""
+    current = Span(name, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current.start
+        _finish_span(current, _current_trace.get())
+
+
+def record_span(name: str, seconds: float, **attrs):
+    """记录已在别处测得的阶段耗时（如合并执行的批量检索）"""
+    current = Span(name, attrs)
+    current.duration = seconds
+    _finish_span(current, _current_trace.get())
+
+
+def annotate(**attrs):
+    """给当前阶段补充属性（如缓存是否命中），不在任何阶段内时忽略"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+class RequestRecorder:
+    """把每个请求的追踪记录追加写入按天滚动的JSONL文件
+
+    请求线程只把记录放入队列，序列化和写文件由后台线程完成；队列满时丢弃记录（计入 dropped）。
+    """
+
+    def __init__(self, record_dir: str = "logs/requests", enabled: bool = True, max_pending: int = 10000):
+        self.record_dir = Path(record_dir)
+        self.enabled = enabled
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def path_for(self, day: str) -> Path:
+        return self.record_dir / f"requests-{day}.jsonl"
+
+    def write(self, record: Dict[str, Any]):
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-recorder", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # 一次取出队列中已有的记录，按文件合并写入
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            try:
+                self._append(records)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _append(self, records: List[Dict[str, Any]]):
+        lines: Dict[Path, List[str]] = {}
+        for record in records:
+            path = self.path_for(record["timestamp"][:10].replace("-", ""))
+            lines.setdefault(path, []).append(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        for path, path_lines in lines.items():
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.writelines(path_lines)
+            except OSError as e:
+                logger.warning(f"写入请求记录失败: {e}")
+
+    def flush(self):
+        """等待队列中的记录全部写入"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """写完剩余记录并停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout=5)
+
+
+@lru_cache(maxsize=None)
+def get_recorder() -> RequestRecorder:
+    """进程内的请求记录器（TRACE_RECORDS_DIR / TRACE_RECORDS 配置）"""
+    return RequestRecorder(
+        os.getenv("TRACE_RECORDS_DIR", "logs/requests"),
+        enabled=os.getenv("TRACE_RECORDS", "true").lower() == "true"
+    )
+
+
+@contextmanager
+def trace_request(kind: str, request_id: Optional[str] = None, **attrs) -> Iterator[Trace]:
+    """追踪一次请求；已在某个请求内时复用外层追踪，不重复记录"""
+    outer = _current_trace.get()
+    if outer is not None:
+        yield outer
+        return
+
+    trace = Trace(kind, request_id, attrs)
+    token = _current_trace.set(trace)
+    with _active_lock:
+        _active_traces[trace.request_id] = trace
+    status = "ok"
+    try:
+        yield trace
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        _current_trace.reset(token)
+        with _active_lock:
+            _active_traces.pop(trace.request_id, None)
+        trace.duration = time.perf_counter() - trace.start
+        trace.attrs.setdefault("status", status)
+        REQUEST_SECONDS.observe(trace.duration, kind=kind, route=trace.attrs.get("route", ""), status=trace.attrs["status"])
+        get_recorder().write(trace.to_record())
+        for hook in list(_finish_hooks):
+            try:
+                hook(trace)
+            except Exception as e:
+                logger.warning(f"请求结束回调失败: {e}")
+
+
+def render_metrics() -> str:
+    """Prometheus文本格式的全部指标"""
+    return registry.render()
@@ -0,0 +1,332 @@
+"""
+token用量统计 - 记录每次大模型调用的提示词/回答token数和费用
+- UsageTracker: 通过LangChain回调读取服务端返回的用量（OpenAI的token_usage、Ollama的prompt_eval_count/eval_count），
+  服务端没有返回时用本地分词器（安装了tiktoken时使用，否则按字符估算）估算
+- UsageStore: 按天、模型、会话、知识库汇总，保存在一个小JSON文件中（定时写盘，不在每次请求时写）；
+  多进程部署（serve.py 多个worker）时每个进程写自己的 usage.<pid>.json，报告时合并所有进程的文件
+
+费用按 TOKEN_PRICES 配置的每千token单价计算，未配置的模型（如本地Ollama模型）费用为0。
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.tracing import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # 未安装或无法下载词表时使用字符估算
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """本地估算token数"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    """解析单价配置 "gpt-4o=0.0025/0.01,gpt-3.5-turbo=0.0005/0.0015"（每千token，提示词/回答）"""
+    prices = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        model, _, value = item.partition("=")
+        prompt_price, _, completion_price = value.partition("/")
+        try:
+            prices[model.strip()] = (float(prompt_price), float(completion_price or prompt_price))
+        except ValueError:
+            logger.warning(f"忽略无效的token单价配置: {item}")
+    return prices
+
+
+def _message_text(messages) -> str:
+    return "\n".join(str(getattr(message, "content", message)) for message in messages)
+
+
+_handler_class = None
+
+
+def _create_handler(tracker: "UsageTracker"):
+    """创建LangChain回调（未安装langchain时返回None）"""
+    global _handler_class
+    if _handler_class is None:
+        try:
+            from langchain_core.callbacks import BaseCallbackHandler
+        except ImportError:
+            return None
+
+        class UsageCallbackHandler(BaseCallbackHandler):
+            """记录每次模型调用的用量（链中多次调用会累加）"""
+
+            def __init__(self, tracker):
+                self.tracker = tracker
+                self.prompts: Dict[Any, str] = {}
+
+            def on_llm_start(self, serialized, prompts, *, run_id=None, **kwargs):
+                self.prompts[run_id] = "\n".join(prompts)
+
+            def on_chat_model_start(self, serialized, messages, *, run_id=None, **kwargs):
+                self.prompts[run_id] = "\n".join(_message_text(batch) for batch in messages)
+
+            def on_llm_end(self, response, *, run_id=None, **kwargs):
+                prompt = self.prompts.pop(run_id, "")
+                llm_output = response.llm_output or {}
+                usage = llm_output.get("token_usage") or {}
+                prompt_tokens = usage.get("prompt_tokens")
+                completion_tokens = usage.get("completion_tokens")
+                texts = []
+                for generations in response.generations:
+                    for generation in generations:
+                        texts.append(generation.text)
+                        info = generation.generation_info or {}
+                        # Ollama在最后一个数据块中返回用量
+                        if prompt_tokens is None and "prompt_eval_count" in info:
+                            prompt_tokens = info.get("prompt_eval_count")
+                        if completion_tokens is None and "eval_count" in info:
+                            completion_tokens = info.get("eval_count")
+                self.tracker.add(prompt, "".join(texts), prompt_tokens, completion_tokens, llm_output.get("model_name"))
+
+        _handler_class = UsageCallbackHandler
+    return _handler_class(tracker)
+
+
+class UsageTracker:
+    """一次请求的token用量"""
+
+    def __init__(self, model: Optional[str] = None, provider: Optional[str] = None):
+        self.model = model
+        self.provider = provider
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated = False
+        self._lock = threading.Lock()
+        self._handler = _create_handler(self)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """传给 llm.invoke / chain.invoke 的 config"""
+        return {"callbacks": [self._handler]} if self._handler is not None else {}
+
+    def add(self, prompt: str, completion: str, prompt_tokens: Optional[int] = None,
+            completion_tokens: Optional[int] = None, model: Optional[str] = None):
+        """记录一次模型调用，服务端没有返回的用量按文本估算"""
+        with self._lock:
+            self.calls += 1
+            if prompt_tokens is None or completion_tokens is None:
+                self.estimated = True
+            self.prompt_tokens += prompt_tokens if prompt_tokens is not None else count_tokens(prompt)
+            self.completion_tokens += completion_tokens if completion_tokens is not None else count_tokens(completion)
+            if model and not self.model:
+                self.model = model
+
+    def finish(self, prompt: str = "", completion: str = "") -> Dict[str, Any]:
+        """结束统计；回调没有触发时（如非LangChain模型）按提示词和回答估算"""
+        if self.calls == 0 and (prompt or completion):
+            self.add(prompt, completion)
+        return self.to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "provider": self.provider,
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "estimated": self.estimated
+        }
+
+
+def merge_usage(first: Optional[Dict[str, Any]], second: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """合并同一请求中多次调用的用量（如知识库回答无效后改用通用回答）"""
+    if not first or not second:
+        return first or second
+    merged = dict(second)
+    for key in ("calls", "prompt_tokens", "completion_tokens", "total_tokens", "cost"):
+        merged[key] = first.get(key, 0) + second.get(key, 0)
+    merged["estimated"] = bool(first.get("estimated") or second.get("estimated"))
+    return merged
+
+
+def _empty_bucket() -> Dict[str, float]:
+    return {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+
+
+def _add_to(bucket: Dict[str, float], usage: Dict[str, Any], cost: float):
+    bucket["requests"] += 1
+    bucket["prompt_tokens"] += usage.get("prompt_tokens", 0)
+    bucket["completion_tokens"] += usage.get("completion_tokens", 0)
+    bucket["cost"] = round(bucket["cost"] + cost, 6)
+
+
+class UsageStore:
+    """按天、模型、会话、知识库汇总的用量
+
+    path 是配置的文件名，每个进程实际写入同目录下的 <stem>.<pid><suffix>（如 usage.1234.json），
+    进程之间不会互相覆盖；report() 合并目录中所有进程的文件（以及旧版本写入的 path 本身）。
+    """
+
+    def __init__(self, path: str = "cache/usage.json", prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 flush_interval: float = 10.0, retention_days: int = 90, max_sessions: int = 1000):
+        """
+        Args:
+            prices: 模型 -> (提示词单价, 回答单价)，每千token
+            flush_interval: 写盘间隔（秒），0表示每次记录都写盘
+            retention_days: 按天统计保留的天数
+            max_sessions: 保留的会话数量（超出时丢弃最早的会话）
+        """
+        self.path = Path(path)
+        self.process_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}{self.path.suffix}")
+        self.prices = prices or {}
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        # 进程号被复用时接着累计之前同号进程（已退出）的数据
+        self.data = self._load(self.process_path)
+
+    @staticmethod
+    def _load(path: Path) -> Dict[str, Any]:
+        data = {"days": {}, "sessions": {}, "knowledge_base_days": {}}
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"加载用量统计失败: {e}")
+        return data
+
+    def cost(self, usage: Dict[str, Any]) -> float:
+        prompt_price, completion_price = self.prices.get(usage.get("model") or "", (0.0, 0.0))
+        return (usage.get("prompt_tokens", 0) * prompt_price + usage.get("completion_tokens", 0) * completion_price) / 1000
+
+    def record(self, usage: Dict[str, Any], session_id: Optional[str] = None, knowledge_base: Optional[str] = None,
+               day: Optional[str] = None) -> float:
+        """记录一次请求的用量，返回费用"""
+        cost = self.cost(usage)
+        day = day or date.today().isoformat()
+        model = usage.get("model") or "unknown"
+        with self._lock:
+            day_models = self.data["days"].setdefault(day, {})
+            _add_to(day_models.setdefault(model, _empty_bucket()), usage, cost)
+            if session_id:
+                sessions = self.data["sessions"]
+                # 最近活跃的会话放在最后
+                bucket = sessions.pop(session_id, None) or {**_empty_bucket(), "first_day": day}
+                bucket["last_day"] = day
+                _add_to(bucket, usage, cost)
+                sessions[session_id] = bucket
+                while len(sessions) > self.max_sessions:
+                    sessions.pop(next(iter(sessions)))
+            if knowledge_base:
+                day_bases = self.data["knowledge_base_days"].setdefault(day, {})
+                _add_to(day_bases.setdefault(knowledge_base, _empty_bucket()), usage, cost)
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        return cost
+
+    def flush(self):
+        """把本进程的统计写盘（原子替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+            for key in ("days", "knowledge_base_days"):
+                for day in [day for day in self.data[key] if day < cutoff]:
+                    del self.data[key][day]
+            payload = json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        try:
+            self.process_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.process_path.with_suffix(".tmp")
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, self.process_path)
+        except OSError as e:
+            logger.warning(f"保存用量统计失败: {e}")
+
+    def _other_processes(self) -> List[Dict[str, Any]]:
+        """其他进程（以及旧版本单文件）写盘的统计"""
+        paths = [path for path in self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}") if path != self.process_path]
+        if self.path.exists():
+            paths.append(self.path)
+        return [self._load(path) for path in paths]
+
+    def report(self, days: int = 7, top_sessions: int = 10) -> Dict[str, Any]:
+        """最近 days 天的用量汇总（合并所有进程）"""
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        total = _empty_bucket()
+        by_day: Dict[str, Dict[str, float]] = {}
+        by_model: Dict[str, Dict[str, float]] = {}
+        by_knowledge_base: Dict[str, Dict[str, float]] = {}
+        sessions: Dict[str, Dict[str, Any]] = {}
+
+        def add(target: Dict[str, Any], bucket: Dict[str, Any]):
+            for key in ("requests", "prompt_tokens", "completion_tokens"):
+                target[key] += bucket[key]
+            target["cost"] = round(target["cost"] + bucket["cost"], 6)
+
+        others = self._other_processes()
+        with self._lock:
+            sources = others + [json.loads(json.dumps(self.data))]
+        for data in sources:
+            for day, models in data.get("days", {}).items():
+                if day < since:
+                    continue
+                for model, bucket in models.items():
+                    for target in (total, by_day.setdefault(day, _empty_bucket()), by_model.setdefault(model, _empty_bucket())):
+                        add(target, bucket)
+            for day, bases in data.get("knowledge_base_days", {}).items():
+                if day < since:
+                    continue
+                for name, bucket in bases.items():
+                    add(by_knowledge_base.setdefault(name, _empty_bucket()), bucket)
+            # 同一会话可能由不同进程处理
+            for session_id, bucket in data.get("sessions", {}).items():
+                if bucket.get("last_day", "") < since:
+                    continue
+                merged = sessions.setdefault(session_id, {"session_id": session_id, **_empty_bucket(),
+                                                          "first_day": bucket["first_day"], "last_day": bucket["last_day"]})
+                add(merged, bucket)
+                merged["first_day"] = min(merged["first_day"], bucket["first_day"])
+                merged["last_day"] = max(merged["last_day"], bucket["last_day"])
+        ranked = sorted(sessions.values(), key=lambda item: item["prompt_tokens"] + item["completion_tokens"], reverse=True)
+        return {
+            "days": days,
+            "total": total,
+            "by_day": dict(sorted(by_day.items())),
+            "by_model": by_model,
+            "top_sessions": ranked[:top_sessions],
+            "by_knowledge_base": by_knowledge_base
+        }
+
+
+@lru_cache(maxsize=None)
+def get_usage_store() -> UsageStore:
+    """进程内的用量统计（USAGE_STORE_PATH / TOKEN_PRICES 配置），退出时写盘"""
+    store = UsageStore(os.getenv("USAGE_STORE_PATH", "cache/usage.json"), parse_prices(os.getenv("TOKEN_PRICES", "")))
+    atexit.register(store.flush)
+    return store
@@ -4,13 +4,11 @@
 """
 import os
 import json
-import hashlib
 import pickle
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
-from langchain_community.vectorstores import FAISS
-from langchain.schema import Document
 import logging
+from src.utils.fingerprint_index import FingerprintIndex, FileDiff
 
 logger = logging.getLogger(__name__)
 
@@ -26,69 +24,66 @@ class VectorPersistenceManager:
         self.docstore_file = self.cache_dir / "docstore.pkl"
         self.metadata_file = self.cache_dir / "metadata.json"
         self.fingerprints_file = self.cache_dir / "fingerprints.json"
+        
+        # stat优先的指纹索引，只对stat变化的文件重新计算哈希
+        self.fingerprint_index = FingerprintIndex(self.cache_dir / "stat_index.json")
     
     def calculate_file_fingerprint(self, file_path: str) -> Dict[str, Any]:
-        """计算文件指纹（MD5 + 修改时间）"""
-        path = Path(file_path)
-        if not path.exists():
-            return {}
-            
-        # 计算MD5
-        md5_hash = hashlib.md5()
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                md5_hash.update(chunk)
-        
-        # 使用相对路径作为key
-        rel_path = os.path.relpath(path)
-        
-        return {
-            "md5": md5_hash.hexdigest(),
-            "last_modified": path.stat().st_mtime,
-            "file_size": path.stat().st_size,
-            "filename": path.name,
-            "relative_path": str(rel_path)
-        }
+        """计算文件指纹（内容哈希 + 修改时间 + 大小）"""
+        return self.fingerprint_index.fingerprint(file_path)
     
     def get_files_fingerprint(self, pdf_files: List[str]) -> Dict[str, Dict[str, Any]]:
         """获取多个文件的指纹信息"""
         fingerprints = {}
         for pdf_path in pdf_files:
             fingerprints[pdf_path] = self.calculate_file_fingerprint(pdf_path)
+        self.fingerprint_index.save()
         return fingerprints
     
-    def has_changes(self, current_files: List[str]) -> bool:
-        """检查文件是否有变化"""
+    def load_fingerprints(self) -> Dict[str, Dict[str, Any]]:
+        """加载上次构建时保存的文件指纹"""
         if not self.fingerprints_file.exists():
-            return True
-            
+            return {}
         try:
             with open(self.fingerprints_file, 'r', encoding='utf-8') as f:
-                saved_fingerprints = json.load(f)
-        except:
-            return True
-            
-        current_fingerprints = self.get_files_fingerprint(current_files)
-        
-        # 检查文件数量
-        if len(current_fingerprints) != len(saved_fingerprints):
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"加载文件指纹失败: {e}")
+            return {}
+    
+    def get_changes(self, current_files: List[str]) -> FileDiff:
+        """获取逐文件的变化明细"""
+        return self.fingerprint_index.diff(current_files, self.load_fingerprints())
+    
+    def has_changes(self, current_files: List[str]) -> bool:
+        """检查文件是否有变化"""
+        if not self.fingerprints_file.exists():
             return True
-            
-        # 检查每个文件的指纹
-        for file_path, current_fp in current_fingerprints.items():
-            saved_fp = saved_fingerprints.get(file_path, {})
-            if current_fp != saved_fp:
-                return True
-                
-        return False
+        return self.get_changes(current_files).has_changes
     
     def save_fingerprints(self, fingerprints: Dict[str, Dict[str, Any]]):
         """保存文件指纹"""
         with open(self.fingerprints_file, 'w', encoding='utf-8') as f:
             json.dump(fingerprints, f, ensure_ascii=False, indent=2)
     
-    def save_vector_store(self, vector_store: FAISS, documents: List[Document]):
-        """保存向量存储"""
+    def load_embedding_signature(self) -> Optional[Dict[str, Any]]:
+        """读取构建向量存储时使用的嵌入模型标识，旧版本缓存没有记录时返回None"""
+        if not self.metadata_file.exists():
+            return None
+        try:
+            with open(self.metadata_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("embedding_signature")
+        except Exception as e:
+            logger.warning(f"加载向量存储元数据失败: {e}")
+            return None
+    
+    def signature_matches(self, embedding_signature: Dict[str, Any]) -> bool:
+        """缓存的向量是否由相同的嵌入模型生成（不同模型的向量无法与查询向量比较）"""
+        return self.load_embedding_signature() == embedding_signature
+    
+    def save_vector_store(self, vector_store: "FAISS", documents: List["Document"],
+                          embedding_signature: Optional[Dict[str, Any]] = None):
+        """保存向量存储，同时记录嵌入模型标识"""
         try:
             # 保存FAISS索引
             vector_store.save_local(str(self.cache_dir))
@@ -103,6 +98,9 @@ class VectorPersistenceManager:
             
             with open(self.docstore_file, 'wb') as f:
                 pickle.dump(doc_info, f)
+            
+            with open(self.metadata_file, 'w', encoding='utf-8') as f:
+                json.dump({"embedding_signature": embedding_signature}, f, ensure_ascii=False, indent=2)
                 
             logger.info(f"向量存储已保存到 {self.cache_dir}")
             
@@ -110,11 +108,17 @@ class VectorPersistenceManager:
             logger.error(f"保存向量存储失败: {e}")
             raise
     
-    def load_vector_store(self, embeddings) -> Optional[Tuple[FAISS, List[Document]]]:
-        """加载向量存储"""
+    def load_vector_store(self, embeddings, embedding_signature: Optional[Dict[str, Any]] = None) -> Optional[Tuple["FAISS", List["Document"]]]:
+        """加载向量存储；指定嵌入模型标识且与缓存记录的不一致时返回None（需要完整重建）"""
+        from langchain_community.vectorstores import FAISS
+        from langchain.schema import Document
+        
         try:
             if not self.index_file.exists():
                 return None
+            if embedding_signature is not None and not self.signature_matches(embedding_signature):
+                logger.info("嵌入模型已变化，向量存储缓存不可用")
+                return None
                 
             # 加载FAISS索引
             vector_store = FAISS.load_local(
@@ -0,0 +1,299 @@
+"""
+预热快照 - 保存可直接服务的知识库状态，新进程以只读映射方式快速启动
+快照目录结构:
+    cache/snapshot/
+        CURRENT              当前快照目录名（原子替换）
+        gen-000001/
+            manifest.json    版本、指纹摘要、模型配置、索引参数
+            index.faiss      FAISS索引（只有一个倒排表的IVFFlat，见 write_snapshot_index）
+            index.ivfdata    向量数据（磁盘倒排表，加载时内存映射）
+            ids.json         索引位置 -> docstore ID
+            chunks.bin       片段记录（JSON，按偏移量顺序存放）
+            chunks.idx       片段偏移量（uint64数组）
+"""
+import os
+import json
+import mmap
+import time
+import shutil
+import hashlib
+import logging
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 2
+_ADD_BATCH = 65536  # 写快照索引时每批复制的向量数
+
+
+def fingerprints_digest(fingerprints: Dict[str, Dict[str, Any]]) -> str:
+    """计算文件指纹集合的摘要，用于判断快照是否与当前文档一致"""
+    items = sorted((path, fp.get("hash"), fp.get("file_size")) for path, fp in fingerprints.items())
+    return hashlib.sha1(json.dumps(items, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def write_chunk_store(directory: Path, records: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+    """写入片段存储，返回片段数量"""
+    offsets = array('Q', [0])
+    with open(directory / "chunks.bin", "wb") as f:
+        for content, metadata in records:
+            data = json.dumps([content, metadata], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    with open(directory / "chunks.idx", "wb") as f:
+        offsets.tofile(f)
+    return len(offsets) - 1
+
+
+class ChunkStore(Sequence):
+    """只读片段存储，按需从内存映射文件中解码Document"""
+
+    def __init__(self, directory: str):
+        directory = Path(directory)
+        self._offsets = array('Q')
+        with open(directory / "chunks.idx", "rb") as f:
+            self._offsets.frombytes(f.read())
+        self._file = open(directory / "chunks.bin", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    @property
+    def nbytes(self) -> int:
+        """chunks.bin 的字节数（内存映射，不常驻）"""
+        return self._offsets[-1] if self._offsets else 0
+
+    def get_record(self, position: int) -> Tuple[str, Dict[str, Any]]:
+        """读取原始记录 (page_content, metadata)"""
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        start, end = self._offsets[position], self._offsets[position + 1]
+        content, metadata = json.loads(self._data[start:end].decode('utf-8'))
+        return content, metadata
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        from langchain.schema import Document
+        content, metadata = self.get_record(position)
+        return Document(page_content=content, metadata=metadata)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class SnapshotDocstore:
+    """基于ChunkStore的只读docstore，供langchain FAISS按ID取文档"""
+
+    def __init__(self, chunk_store: ChunkStore, ids: List[str]):
+        self.chunk_store = chunk_store
+        self._positions = {doc_id: position for position, doc_id in enumerate(ids)}
+
+    def search(self, search: str):
+        position = self._positions.get(search)
+        if position is None:
+            return f"ID {search} not found."
+        return self.chunk_store[position]
+
+
+def write_snapshot_index(index, directory: Path):
+    """把向量写成只有一个倒排表的IVFFlat索引，向量存放在磁盘倒排表 index.ivfdata 中
+
+    faiss 1.7.4 读取索引时不能映射 IndexFlat 的向量（IO_FLAG_MMAP 只作用于倒排表），
+    而磁盘倒排表（OnDiskInvertedLists）总是以内存映射方式读取，多个进程共享同一份物理内存。
+    只有一个倒排表时 nprobe=1 即遍历全部向量，检索结果与 IndexFlat 相同。
+    """
+    import numpy as np
+    import faiss
+
+    if index.ntotal == 0:
+        # 空的磁盘倒排表无法映射，直接保存原索引
+        faiss.write_index(index, str(directory / "index.faiss"))
+        return
+    quantizer = faiss.IndexFlat(index.d, index.metric_type)
+    quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+    ivf = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+    invlists = faiss.OnDiskInvertedLists(1, ivf.code_size, str(directory / "index.ivfdata"))
+    ivf.replace_invlists(invlists)
+    for start in range(0, index.ntotal, _ADD_BATCH):
+        ivf.add(index.reconstruct_n(start, min(_ADD_BATCH, index.ntotal - start)))
+    faiss.write_index(ivf, str(directory / "index.faiss"))
+
+
+def in_memory_index(index):
+    """复制为内存中可增删的索引：快照的磁盘倒排表索引转换为 IndexFlat，其余直接克隆"""
+    import faiss
+
+    if not isinstance(index, faiss.IndexIVF):
+        return faiss.clone_index(index)
+    flat = faiss.IndexFlat(index.d, index.metric_type)
+    for start in range(0, index.ntotal, _ADD_BATCH):
+        flat.add(index.reconstruct_n(start, min(_ADD_BATCH, index.ntotal - start)))
+    return flat
+
+
+def copy_vector_store(vector_store):
+    """复制向量库（索引、片段、ID映射）
+
+    增量入库在副本上修改，完成后整体替换引用；进行中的检索继续使用原向量库，
+    FAISS索引和docstore不会被同时读写。
+    """
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    index_to_docstore_id = dict(vector_store.index_to_docstore_id)
+    if isinstance(vector_store.docstore, SnapshotDocstore):
+        documents = {doc_id: vector_store.docstore.search(doc_id) for doc_id in index_to_docstore_id.values()}
+    else:
+        documents = dict(vector_store.docstore._dict)
+    return FAISS(
+        vector_store.embedding_function,
+        in_memory_index(vector_store.index),
+        InMemoryDocstore(documents),
+        index_to_docstore_id,
+        relevance_score_fn=vector_store.override_relevance_score_fn,
+        normalize_L2=vector_store._normalize_L2,
+        distance_strategy=vector_store.distance_strategy
+    )
+
+
+class SnapshotStore:
+    """预热快照管理器"""
+
+    def __init__(self, snapshot_dir: str = "cache/snapshot", keep: int = 3):
+        self.snapshot_dir = Path(snapshot_dir)
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        self.current_file = self.snapshot_dir / "CURRENT"
+        self.keep = keep
+
+    def current_generation(self) -> Optional[str]:
+        """获取当前快照目录名"""
+        try:
+            return self.current_file.read_text(encoding='utf-8').strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _next_generation(self) -> str:
+        numbers = [int(p.name.split("-")[1]) for p in self.snapshot_dir.glob("gen-*") if p.name.split("-")[1].isdigit()]
+        return f"gen-{max(numbers, default=0) + 1:06d}"
+
+    def publish(self, vector_store, fingerprints: Dict[str, Dict[str, Any]], model_signature: Dict[str, Any]) -> str:
+        """写入新快照并原子切换CURRENT"""
+        generation = self._next_generation()
+        tmp_dir = self.snapshot_dir / f".{generation}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        index = vector_store.index
+        ids = [vector_store.index_to_docstore_id[i] for i in range(index.ntotal)]
+        write_snapshot_index(index, tmp_dir)
+        with open(tmp_dir / "ids.json", "w", encoding='utf-8') as f:
+            json.dump(ids, f, ensure_ascii=False)
+
+        def records():
+            for doc_id in ids:
+                doc = vector_store.docstore.search(doc_id)
+                yield doc.page_content, doc.metadata
+
+        num_chunks = write_chunk_store(tmp_dir, records())
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "generation": generation,
+            "created_at": time.time(),
+            "fingerprints_digest": fingerprints_digest(fingerprints),
+            "model_signature": model_signature,
+            "ntotal": index.ntotal,
+            "dimension": index.d,
+            "index_type": "ivf_flat_ondisk",
+            "num_chunks": num_chunks,
+            "normalize_L2": getattr(vector_store, "_normalize_L2", False),
+            "distance_strategy": getattr(vector_store.distance_strategy, "value", vector_store.distance_strategy)
+        }
+        with open(tmp_dir / "manifest.json", "w", encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        os.replace(tmp_dir, self.snapshot_dir / generation)
+        tmp_current = self.snapshot_dir / "CURRENT.tmp"
+        tmp_current.write_text(generation, encoding='utf-8')
+        os.replace(tmp_current, self.current_file)
+
+        self._cleanup(generation)
+        logger.info(f"预热快照已发布: {generation} ({num_chunks}个片段)")
+        return generation
+
+    def _cleanup(self, current: str):
+        """保留最近的若干个快照"""
+        generations = sorted(p for p in self.snapshot_dir.glob("gen-*") if p.is_dir())
+        for path in generations[:-self.keep]:
+            if path.name != current:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def read_manifest(self, generation: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """读取快照清单"""
+        generation = generation or self.current_generation()
+        if not generation:
+            return None
+        try:
+            with open(self.snapshot_dir / generation / "manifest.json", "r", encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def is_valid(self, manifest: Optional[Dict[str, Any]], fingerprints: Dict[str, Dict[str, Any]], model_signature: Dict[str, Any]) -> bool:
+        """检查快照是否与当前文档和模型配置一致"""
+        return (
+            manifest is not None
+            and manifest.get("format_version") == SNAPSHOT_FORMAT_VERSION
+            and manifest.get("fingerprints_digest") == fingerprints_digest(fingerprints)
+            and manifest.get("model_signature") == model_signature
+        )
+
+    def load(self, embeddings, generation: Optional[str] = None, read_only: bool = False):
+        """以内存映射方式加载快照
+
+        Returns:
+            (FAISS向量库, ChunkStore, manifest)，快照不存在时返回None
+        """
+        import faiss
+        from langchain_community.vectorstores import FAISS
+        from langchain_community.vectorstores.utils import DistanceStrategy
+
+        manifest = self.read_manifest(generation)
+        if manifest is None or manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            return None
+        directory = self.snapshot_dir / manifest["generation"]
+
+        # 向量在磁盘倒排表中，以内存映射方式读取，多进程共享同一份物理内存；
+        # 倒排表文件按索引文件所在目录查找（快照写入后目录被重命名）
+        io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_ONDISK_SAME_DIR
+        if read_only:
+            io_flags |= faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(str(directory / "index.faiss"), io_flags)
+        if isinstance(index, faiss.IndexIVF):
+            # 按位置取向量（相关性阈值校准）需要位置映射，只占 ntotal 个整数
+            index.make_direct_map()
+
+        with open(directory / "ids.json", "r", encoding='utf-8') as f:
+            ids = json.load(f)
+        chunk_store = ChunkStore(str(directory))
+
+        vector_store = FAISS(
+            embeddings,
+            index,
+            SnapshotDocstore(chunk_store, ids),
+            dict(enumerate(ids)),
+            normalize_L2=manifest.get("normalize_L2", False),
+            distance_strategy=DistanceStrategy(manifest.get("distance_strategy") or DistanceStrategy.EUCLIDEAN_DISTANCE)
+        )
+        logger.info(f"已从预热快照加载: {manifest['generation']} ({len(chunk_store)}个片段)")
+        return vector_store, chunk_store, manifest
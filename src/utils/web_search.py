@@ -0,0 +1,229 @@
+"""
+网页搜索 - 带持久化缓存、限流、超时和录制/回放的搜索工具
+
+- SearchCache: 查询结果保存在一个JSON文件中，按 SEARCH_CACHE_TTL 过期，重复搜索直接返回
+- TokenBucket: 按 SEARCH_RATE_PER_MIN / SEARCH_BURST 限制实际发出的搜索请求，控制费用
+- 超时: 搜索请求超过 SEARCH_TIMEOUT 秒时放弃等待，不阻塞回答；超时仍未返回的请求占用工作线程，
+  工作线程全部被占用时新的搜索直接失败，不在线程池中排队
+- 限流、超时和搜索出错时抛出 SearchUnavailable（提示文本），工具路由不缓存该结果
+- SEARCH_MODE:
+    live   正常搜索
+    record 正常搜索，同时把结果写入 SEARCH_FIXTURES
+    replay 只从 SEARCH_FIXTURES 读取，不发出网络请求（离线测试）
+"""
+import os
+import json
+import time
+import logging
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("live", "record", "replay")
+
+# 搜索请求在独立线程中执行，以便设置超时（SerpAPI客户端本身不支持超时配置）
+_MAX_WORKERS = 4
+_executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="web-search")
+# 未返回的搜索请求数（包括已超时仍在执行的），不超过工作线程数
+_slots = threading.BoundedSemaphore(_MAX_WORKERS)
+
+
+class SearchUnavailable(RuntimeError):
+    """本次搜索没有结果（限流、超时、搜索服务出错），异常信息为给用户的提示，结果不应缓存"""
+
+
+def normalize_search_query(query: str) -> str:
+    """缓存键：全角转半角、小写、合并空白"""
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+
+class TokenBucket:
+    """令牌桶限流（线程安全）"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """有令牌时取走一个并返回True，否则返回False（不等待）"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class SearchCache:
+    """查询 -> 结果 的JSON文件存储，ttl为None时不过期（用于录制的搜索结果）"""
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 1000):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"加载搜索缓存失败: {e}")
+            return {}
+
+    def get(self, query: str) -> Optional[str]:
+        with self._lock:
+            entry = self.entries.get(normalize_search_query(query))
+        if entry is None or (self.ttl is not None and time.time() - entry["ts"] > self.ttl):
+            return None
+        return entry["result"]
+
+    def set(self, query: str, result: str):
+        """保存并写盘（搜索已被限流，写盘频率很低）"""
+        with self._lock:
+            key = normalize_search_query(query)
+            self.entries.pop(key, None)
+            self.entries[key] = {"query": query, "result": result, "ts": time.time()}
+            # 超出数量时丢弃最早写入的结果
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            payload = json.dumps(self.entries, ensure_ascii=False, indent=1)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"保存搜索缓存失败: {e}")
+
+
+class WebSearch:
+    """搜索工具：回放 -> 缓存 -> 限流 -> 带超时的实际搜索"""
+
+    def __init__(self, backend: Optional[Callable[[str], str]], cache: Optional[SearchCache] = None,
+                 bucket: Optional[TokenBucket] = None, timeout: float = 10.0, mode: str = "live",
+                 fixtures: Optional[SearchCache] = None):
+        """
+        Args:
+            backend: 实际搜索函数（query -> 结果文本），replay模式下可为None
+            fixtures: 录制的搜索结果，record / replay 模式使用
+        """
+        if mode not in MODES:
+            raise ValueError(f"不支持的搜索模式: {mode}，可选 {', '.join(MODES)}")
+        if mode != "live" and fixtures is None:
+            raise ValueError(f"{mode} 模式需要指定录制文件")
+        if mode != "replay" and backend is None:
+            raise ValueError("live / record 模式需要搜索后端")
+        self.backend = backend
+        self.cache = cache
+        self.bucket = bucket
+        self.timeout = timeout
+        self.mode = mode
+        self.fixtures = fixtures
+        self.stats = {"requests": 0, "cache_hits": 0, "searches": 0, "rate_limited": 0, "timeouts": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _search(self, query: str) -> str:
+        """带超时执行实际搜索；工作线程都被未返回的请求占用时直接失败"""
+        if not _slots.acquire(blocking=False):
+            self._count("errors")
+            logger.warning("搜索请求全部未返回，跳过本次搜索")
+            raise SearchUnavailable("搜索服务暂不可用，系统将继续使用本地知识库回答问题。")
+        self._count("searches")
+        try:
+            future = _executor.submit(self.backend, query)
+        except RuntimeError:
+            _slots.release()
+            raise
+        future.add_done_callback(lambda _: _slots.release())
+        try:
+            return str(future.result(timeout=self.timeout))
+        except FutureTimeoutError:
+            self._count("timeouts")
+            logger.warning(f"搜索超时（{self.timeout}秒）: {query}")
+            raise SearchUnavailable("搜索超时，系统将继续使用本地知识库回答问题。") from None
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"搜索失败: {e}")
+            raise SearchUnavailable("搜索服务暂不可用，系统将继续使用本地知识库回答问题。") from e
+
+    def run(self, query: str) -> str:
+        """返回搜索结果；限流、超时或出错时抛出 SearchUnavailable"""
+        self._count("requests")
+        if self.mode == "replay":
+            result = self.fixtures.get(query)
+            return result if result is not None else f"没有录制的搜索结果: {query}"
+
+        if self.cache is not None:
+            result = self.cache.get(query)
+            if result is not None:
+                self._count("cache_hits")
+                if self.mode == "record" and self.fixtures.get(query) is None:
+                    self.fixtures.set(query, result)
+                return result
+
+        if self.bucket is not None and not self.bucket.try_acquire():
+            self._count("rate_limited")
+            logger.warning("搜索请求超过限流，跳过本次搜索")
+            raise SearchUnavailable("搜索请求过于频繁，请稍后再试。系统将继续使用本地知识库回答问题。")
+
+        result = self._search(query)
+        if self.cache is not None:
+            self.cache.set(query, result)
+        if self.mode == "record":
+            self.fixtures.set(query, result)
+        return result
+
+
+def serpapi_backend(serpapi_key: str) -> Callable[[str], str]:
+    """SerpAPI搜索函数"""
+    from langchain_community.utilities import SerpAPIWrapper
+    return SerpAPIWrapper(serpapi_api_key=serpapi_key).run
+
+
+@lru_cache(maxsize=None)
+def get_web_search(serpapi_key: str = "") -> Optional[WebSearch]:
+    """进程内共享的搜索工具（重建问答链时不重复创建），不可用时返回None
+
+    配置: SEARCH_MODE、SEARCH_CACHE_PATH、SEARCH_CACHE_TTL、SEARCH_RATE_PER_MIN、SEARCH_BURST、
+    SEARCH_TIMEOUT、SEARCH_FIXTURES
+    """
+    mode = os.getenv("SEARCH_MODE", "live")
+    fixtures = SearchCache(os.getenv("SEARCH_FIXTURES", "tests/fixtures/search.json")) if mode != "live" else None
+    backend = None
+    if mode != "replay":
+        if not serpapi_key:
+            return None
+        backend = serpapi_backend(serpapi_key)
+    rate_per_min = float(os.getenv("SEARCH_RATE_PER_MIN", "10"))
+    cache_ttl = float(os.getenv("SEARCH_CACHE_TTL", "86400"))
+    return WebSearch(
+        backend,
+        cache=SearchCache(os.getenv("SEARCH_CACHE_PATH", "cache/search.json"), ttl=cache_ttl) if cache_ttl > 0 else None,
+        bucket=TokenBucket(rate_per_min / 60, float(os.getenv("SEARCH_BURST", "5"))) if rate_per_min > 0 else None,
+        timeout=float(os.getenv("SEARCH_TIMEOUT", "10")),
+        mode=mode,
+        fixtures=fixtures
+    )
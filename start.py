@@ -16,22 +16,29 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-from main import AIDocumentAssistant
+from main import AIDocumentAssistant, create_kb_manager
+from src.utils.logger import logger_manager
+from config import WATCH_DOCS, log_config_summary
+from src.api.http_api import serve_http
 
 def main():
     """主函数"""
     try:
+        # 日志改由后台线程写入控制台和 LOG_FILE
+        logger_manager.setup_global_logging()
+        
         # 初始化RAG系统
         print("[启动] 正在启动RAG系统...")
+        log_config_summary()
         rag_system = AIDocumentAssistant()
         
         # 初始化系统
         print("[初始化] 正在初始化系统...")
         rag_system.initialize_system()
         
-        # 创建界面
-        print("[界面] 正在创建界面...")
-        interface = rag_system.create_interface()
+        # 后台监听docs目录，新文档无需重启即可检索
+        if WATCH_DOCS:
+            rag_system.start_docs_watcher()
         
         print("[成功] 系统启动成功！")
         print("[信息] 支持的模型提供商:")
@@ -41,14 +48,11 @@ def main():
         print("   1. 在'模型配置'标签页选择模型")
         print("   2. 上传文档到系统")
         print("   3. 开始问答对话")
+        print("   4. HTTP接口: http://localhost:7860/api/chat （健康检查 /health）")
         
-        # 启动界面
-        interface.launch(
-            server_name="0.0.0.0",
-            server_port=7860,
-            share=False,
-            debug=True
-        )
+        # 启动界面和HTTP接口
+        print("[界面] 正在创建界面...")
+        serve_http(rag_system, host="0.0.0.0", port=7860, kb_manager=create_kb_manager(rag_system))
         
     except Exception as e:
         print(f"[错误] 启动失败: {e}")
@@ -0,0 +1,170 @@
+"""
+基准测试公共夹具 - 生成确定性的合成语料
+
+语料规模通过环境变量调整（默认适合CPU笔记本几分钟内跑完）:
+    BENCH_DOCS       每种格式的文件数（默认10）
+    BENCH_PARAGRAPHS 每个文件的段落数（默认20）
+    BENCH_QUERIES    检索基准的查询次数（默认200）
+相同配置下生成的语料内容一致，配合 src/utils/fake_backends.py 的确定性模型，结果可在不同提交之间比较。
+"""
+import os
+import math
+import random
+import resource
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+
+BENCH_DOCS = int(os.getenv("BENCH_DOCS", "10"))
+BENCH_PARAGRAPHS = int(os.getenv("BENCH_PARAGRAPHS", "20"))
+BENCH_QUERIES = int(os.getenv("BENCH_QUERIES", "200"))
+
+# 基准中的问答不写入 logs/requests
+os.environ.setdefault("TRACE_RECORDS", "false")
+
+FORMATS = ("txt", "docx", "xlsx", "pdf")
+
+_VOCABULARY = (
+    "contract payment invoice delivery warranty clause supplier customer budget report "
+    "quarter revenue expense policy approval schedule project milestone risk audit "
+    "security access network server database backup storage license support training "
+    "meeting agenda decision owner deadline review update release version feature"
+).split()
+
+
+def make_paragraph(rng: random.Random, words: int = 60) -> str:
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words)) + "."
+
+
+def make_paragraphs(seed: int, count: int) -> List[str]:
+    rng = random.Random(seed)
+    return [make_paragraph(rng) for _ in range(count)]
+
+
+def make_queries(count: int, seed: int = 42) -> List[str]:
+    """生成查询：约一半是重复的热门问题，用于观察查询缓存命中率"""
+    rng = random.Random(seed)
+    hot = [" ".join(rng.sample(_VOCABULARY, 4)) for _ in range(10)]
+    return [rng.choice(hot) if rng.random() < 0.5 else " ".join(rng.sample(_VOCABULARY, 4)) for _ in range(count)]
+
+
+def write_txt(path: Path, paragraphs: List[str]) -> bool:
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return True
+
+
+def write_docx(path: Path, paragraphs: List[str]) -> bool:
+    try:
+        from docx import Document
+    except ImportError:
+        return False
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(str(path))
+    return True
+
+
+def write_xlsx(path: Path, paragraphs: List[str]) -> bool:
+    try:
+        import openpyxl
+    except ImportError:
+        return False
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for i, paragraph in enumerate(paragraphs):
+        words = paragraph.split()
+        sheet.append([i] + [" ".join(words[j:j + 10]) for j in range(0, len(words), 10)])
+    workbook.save(str(path))
+    return True
+
+
+def write_pdf(path: Path, paragraphs: List[str]) -> bool:
+    try:
+        import fitz
+    except ImportError:
+        return False
+    document = fitz.open()
+    # 每页5个段落
+    for start in range(0, len(paragraphs), 5):
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), "\n\n".join(paragraphs[start:start + 5]), fontsize=9)
+    document.save(str(path))
+    document.close()
+    return True
+
+
+WRITERS = {"txt": write_txt, "docx": write_docx, "xlsx": write_xlsx, "pdf": write_pdf}
+
+
+def generate_corpus(root: Path, formats=FORMATS, docs: int = BENCH_DOCS, paragraphs: int = BENCH_PARAGRAPHS) -> Dict[str, List[Path]]:
+    """在 root 下生成各格式的语料，返回 格式 -> 文件列表（缺少生成依赖的格式为空列表）"""
+    root.mkdir(parents=True, exist_ok=True)
+    corpus: Dict[str, List[Path]] = {}
+    for fmt in formats:
+        files = []
+        for i in range(docs):
+            path = root / f"{fmt}_{i:04d}.{fmt}"
+            if not WRITERS[fmt](path, make_paragraphs(i * 31 + FORMATS.index(fmt), paragraphs)):
+                break
+            files.append(path)
+        corpus[fmt] = files
+    return corpus
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory) -> Dict[str, List[Path]]:
+    """会话内共享的合成语料"""
+    return generate_corpus(tmp_path_factory.mktemp("bench_corpus"))
+
+
+@pytest.fixture(scope="session")
+def queries() -> List[str]:
+    return make_queries(BENCH_QUERIES)
+
+
+def summarize_latencies(seconds: List[float]) -> Dict[str, float]:
+    """延迟汇总（毫秒），分位数使用最近秩法"""
+    ordered = sorted(seconds)
+    if not ordered:
+        return {"count": 0}
+
+    def rank(q: float) -> float:
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": rank(50),
+        "p90_ms": rank(90),
+        "p99_ms": rank(99),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+@pytest.fixture(scope="session")
+def latency_summary():
+    """返回延迟汇总函数，结果写入 benchmark.extra_info"""
+    return summarize_latencies
+
+
+def measure_peak_memory(fn: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    """执行 fn 并记录内存高水位：Python分配峰值（tracemalloc）和进程最大常驻内存"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Linux下 ru_maxrss 单位为KB
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result, {"python_peak_mb": round(peak / 1024 / 1024, 2), "process_max_rss_mb": round(max_rss / 1024, 1)}
+
+
+@pytest.fixture(scope="session")
+def peak_memory():
+    """返回内存高水位测量函数"""
+    return measure_peak_memory
@@ -0,0 +1,49 @@
+"""
+问答性能测试 - chat_with_sources 端到端延迟（检索 + 规划 + 假模型生成）
+模型使用确定性的假后端，结果反映系统自身开销而不是模型服务的波动
+运行: make benchmark（语料规模见 conftest.py）
+"""
+import time
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain")
+
+
+@pytest.fixture(scope="module")
+def assistant(corpus, tmp_path_factory):
+    from main import AIDocumentAssistant
+    from src.utils.fake_backends import FakeModelManager
+
+    docs_dir = next(path for paths in corpus.values() for path in paths).parent
+    cache_dir = tmp_path_factory.mktemp("chat_cache")
+    assistant = AIDocumentAssistant(docs_dir=str(docs_dir), cache_dir=str(cache_dir), name="bench")
+    assistant.model_manager = FakeModelManager(str(cache_dir / "model_config.json"))
+    assistant.initialize_system()
+    yield assistant
+    assistant.close()
+
+
+def test_chat_latency(benchmark, assistant, queries, latency_summary):
+    """测试顺序问答的p50/p99延迟、回答路径分布和缓存命中率"""
+    def run():
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            assistant.chat_with_sources(query)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    latencies = benchmark.pedantic(run, rounds=1, iterations=1)
+    status = assistant.get_ingest_status()
+    benchmark.extra_info.update({
+        "latency": latency_summary(latencies),
+        "routes": status["query_plan"]["routes"],
+        "embedding_cache": status["retrieval"]["embedding_cache"]
+    })
+
+
+def test_small_talk_latency(benchmark, assistant):
+    """测试闲聊（跳过检索）的延迟"""
+    benchmark(assistant.chat_with_sources, "你好")
@@ -0,0 +1,45 @@
+"""
+进程启动性能测试 - 入口模块的导入耗时
+运行: make benchmark
+"""
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+
+pytest.importorskip("pytest_benchmark")
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+
+def import_in_subprocess(module: str) -> str:
+    """在全新解释器中导入模块，返回 -X importtime 的输出"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stderr
+
+
+def slowest_imports(importtime_output: str, limit: int = 10) -> list:
+    """解析 -X importtime 输出，返回累计耗时最高的模块"""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative), name))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_us": us} for us, name in rows[:limit]]
+
+
+@pytest.mark.parametrize("module", ["config", "main", "src.utils.model_manager", "src.utils.vector_persistence"])
+def test_import_time(benchmark, module):
+    """测试模块冷启动导入耗时"""
+    output = benchmark.pedantic(import_in_subprocess, args=(module,), rounds=5, iterations=1)
+    benchmark.extra_info["slowest_imports"] = slowest_imports(output)
+    # 启动预算：CLI工具、测试和健康检查应在一秒内启动
+    assert benchmark.stats.stats.median < 1.0
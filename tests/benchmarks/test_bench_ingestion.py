@@ -0,0 +1,92 @@
+"""
+入库性能测试 - 各格式解析吞吐、解析缓存命中、索引构建耗时和内存高水位
+运行: make benchmark（语料规模见 conftest.py）
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("langchain")
+
+from src.core.document_processor import DocumentProcessor
+from src.utils.document_cache import DocumentCache
+from src.utils.fake_backends import FakeEmbeddings
+
+
+@pytest.mark.parametrize("fmt", ["txt", "docx", "xlsx", "pdf"])
+def test_parse_throughput(benchmark, corpus, fmt):
+    """测试各格式的解析吞吐（不使用解析缓存）"""
+    files = corpus[fmt]
+    if not files:
+        pytest.skip(f"缺少生成 {fmt} 语料的依赖")
+    processor = DocumentProcessor()
+
+    def parse_all():
+        return sum(len(processor.process_file(str(path))) for path in files)
+
+    chunks = benchmark.pedantic(parse_all, rounds=3, iterations=1)
+    median = benchmark.stats.stats.median
+    total_mb = sum(path.stat().st_size for path in files) / 1024 / 1024
+    benchmark.extra_info.update({
+        "files": len(files),
+        "chunks": chunks,
+        "files_per_s": round(len(files) / median, 1),
+        "mb_per_s": round(total_mb / median, 2)
+    })
+
+
+def test_parse_cache_hits(benchmark, corpus, tmp_path):
+    """测试解析缓存全部命中时的重新入库耗时"""
+    files = [path for paths in corpus.values() for path in paths]
+    cache = DocumentCache(str(tmp_path / "documents"))
+    processor = DocumentProcessor(cache=cache)
+    for path in files:
+        processor.process_file(str(path))
+
+    benchmark.pedantic(lambda: [processor.process_file(str(path)) for path in files], rounds=3, iterations=1)
+    stats = cache.get_stats()
+    benchmark.extra_info["cache"] = stats
+    assert stats["hits"] == len(files) * 3
+
+
+def test_index_build(benchmark, corpus, peak_memory):
+    """测试用确定性嵌入构建FAISS索引的耗时和内存高水位"""
+    pytest.importorskip("faiss")
+    from langchain_community.vectorstores import FAISS
+
+    processor = DocumentProcessor()
+    documents = [doc for paths in corpus.values() for path in paths for doc in processor.process_file(str(path))]
+    embeddings = FakeEmbeddings()
+
+    vector_store = benchmark.pedantic(lambda: FAISS.from_documents(documents, embeddings), rounds=3, iterations=1)
+    _, memory = peak_memory(lambda: FAISS.from_documents(documents, embeddings))
+    benchmark.extra_info.update({
+        "documents": len(documents),
+        "vectors": vector_store.index.ntotal,
+        "docs_per_s": round(len(documents) / benchmark.stats.stats.median, 1),
+        **memory
+    })
+
+
+def test_full_ingestion(benchmark, corpus, tmp_path_factory, peak_memory):
+    """测试冷启动完整入库（扫描、解析、嵌入、保存向量库和快照）"""
+    pytest.importorskip("faiss")
+    from main import AIDocumentAssistant
+    from src.utils.fake_backends import FakeModelManager
+
+    docs_dir = next(path for paths in corpus.values() for path in paths).parent
+
+    def setup():
+        cache_dir = tmp_path_factory.mktemp("ingest_cache")
+        assistant = AIDocumentAssistant(docs_dir=str(docs_dir), cache_dir=str(cache_dir), name="bench")
+        assistant.model_manager = FakeModelManager(str(cache_dir / "model_config.json"))
+        return (assistant,), {}
+
+    benchmark.pedantic(lambda assistant: assistant.initialize_system(), setup=setup, rounds=3, iterations=1)
+
+    assistant = setup()[0][0]
+    _, memory = peak_memory(assistant.initialize_system)
+    benchmark.extra_info.update({
+        "chunks": len(assistant.loaded_documents),
+        "parse_cache": assistant.document_cache.get_stats(),
+        **memory
+    })
@@ -0,0 +1,71 @@
+"""
+检索性能测试 - 单查询延迟分位数、查询向量缓存命中率、并发查询合并效果
+运行: make benchmark（语料规模见 conftest.py）
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from src.core.document_processor import DocumentProcessor
+from src.core.retrieval import CoalescingSearcher, QueryEmbeddingCache
+from src.utils.fake_backends import FakeEmbeddings
+
+
+@pytest.fixture(scope="module")
+def vector_store(corpus):
+    from langchain_community.vectorstores import FAISS
+
+    processor = DocumentProcessor()
+    documents = [doc for paths in corpus.values() for path in paths for doc in processor.process_file(str(path))]
+    return FAISS.from_documents(documents, FakeEmbeddings())
+
+
+def run_queries(searcher, vector_store, queries, k=4):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        searcher.search(vector_store, query, k)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def test_query_latency(benchmark, vector_store, queries, latency_summary):
+    """测试顺序查询的p50/p99延迟和查询向量缓存命中率"""
+    searcher = CoalescingSearcher(QueryEmbeddingCache(1024), window_ms=0)
+
+    latencies = benchmark.pedantic(run_queries, args=(searcher, vector_store, queries), rounds=1, iterations=1)
+    benchmark.extra_info.update({
+        "vectors": vector_store.index.ntotal,
+        "latency": latency_summary(latencies),
+        "embedding_cache": searcher.embedding_cache.get_stats()
+    })
+
+
+def test_uncached_query_latency(benchmark, vector_store, queries, latency_summary):
+    """测试不使用查询向量缓存时的延迟（对照组）"""
+    searcher = CoalescingSearcher(QueryEmbeddingCache(0), window_ms=0)
+
+    latencies = benchmark.pedantic(run_queries, args=(searcher, vector_store, queries), rounds=1, iterations=1)
+    benchmark.extra_info["latency"] = latency_summary(latencies)
+
+
+@pytest.mark.parametrize("concurrency", [1, 8, 32])
+def test_concurrent_queries(benchmark, vector_store, queries, latency_summary, concurrency):
+    """测试并发查询的吞吐和合并批次大小"""
+    searcher = CoalescingSearcher(QueryEmbeddingCache(0), window_ms=2)
+
+    def run():
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(lambda query: run_queries(searcher, vector_store, [query])[0], queries))
+
+    latencies = benchmark.pedantic(run, rounds=1, iterations=1)
+    stats = searcher.get_stats()
+    benchmark.extra_info.update({
+        "queries_per_s": round(len(queries) / benchmark.stats.stats.median, 1),
+        "latency": latency_summary(latencies),
+        "avg_batch_size": stats["avg_batch_size"]
+    })
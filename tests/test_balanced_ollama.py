@@ -0,0 +1,40 @@
+"""
+多节点Ollama客户端测试
+"""
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.outputs import Generation, LLMResult
+from src.utils.balanced_ollama import BalancedOllama
+from src.utils.endpoint_pool import EndpointPool
+from src.utils.usage import UsageTracker
+
+
+class FakeOllama:
+    """返回带用量信息的生成结果的单节点客户端"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def _generate(self, prompts, stop=None, **kwargs):
+        info = {"prompt_eval_count": 11, "eval_count": 7}
+        return LLMResult(generations=[[Generation(text=f"{self.url}: {prompt}", generation_info=info)] for prompt in prompts])
+
+
+class TestBalancedOllama:
+    """测试多节点调用保留Ollama返回的用量"""
+
+    def test_usage_reaches_tracker(self):
+        """测试generation_info中的token用量传给UsageTracker"""
+        urls = ["http://a", "http://b"]
+        llm = BalancedOllama(pool=EndpointPool(urls), clients={url: FakeOllama(url) for url in urls}, model="qwen2")
+        tracker = UsageTracker(model="qwen2", provider="ollama")
+
+        assert llm.invoke("你好", config=tracker.config) == "http://a: 你好"
+        usage = tracker.finish()
+        assert usage["calls"] == 1 and usage["prompt_tokens"] == 11 and usage["completion_tokens"] == 7
+        assert not usage["estimated"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,75 @@
+"""
+批量问答测试
+"""
+import json
+import threading
+import time
+import pytest
+import tempfile
+import shutil
+import os
+from types import SimpleNamespace
+from src.core.batch_qa import BatchQARunner, load_questions
+
+
+class SlowLLM:
+    """记录最大并发数的大模型"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if "失败" in prompt:
+            raise RuntimeError("boom")
+        return SimpleNamespace(content=f"答:{len(prompt)}")
+
+
+class TestBatchQA:
+    """测试批量问答"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "questions.jsonl")
+        with open(self.input_path, "w", encoding="utf-8") as f:
+            for i in range(6):
+                f.write(json.dumps({"id": i, "question": f"问题{i}"}, ensure_ascii=False) + "\n")
+            f.write("\n")
+            f.write(json.dumps({"id": "x", "message": "会失败的问题"}, ensure_ascii=False) + "\n")
+        self.llm = SlowLLM()
+        self.assistant = SimpleNamespace(llm=self.llm, vector_store=None, qa_chain=None)
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_questions(self):
+        """测试读取问题文件"""
+        questions = load_questions(self.input_path)
+        assert len(questions) == 7
+        assert questions[-1] == {"id": "x", "question": "会失败的问题"}
+
+    def test_run_file_bounded_concurrency(self):
+        """测试限制并发并写出结果和耗时汇总"""
+        output_path = os.path.join(self.temp_dir, "out", "answers.jsonl")
+        timings = BatchQARunner(self.assistant, concurrency=3).run_file(self.input_path, output_path)
+
+        with open(output_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["id"] for r in records] == [0, 1, 2, 3, 4, 5, "x"]
+        assert records[0]["answer"].startswith("答:")
+        assert records[-1]["error"] == "boom"
+        assert 1 < self.llm.max_active <= 3
+        assert timings["errors"] == 1
+        assert os.path.exists(os.path.join(self.temp_dir, "out", "answers.summary.json"))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
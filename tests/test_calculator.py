@@ -0,0 +1,90 @@
+"""
+安全计算器测试
+"""
+import time
+import pytest
+from src.utils import calculator
+from src.utils.calculator import CalculatorError, evaluate, normalize_expression
+from tools import safe_calculator
+
+
+class TestCalculator:
+    """测试表达式求值、计算限制和缓存"""
+
+    def test_arithmetic_and_functions(self):
+        """测试运算、函数、常量和小数精度"""
+        assert evaluate("0.1 + 0.2") == "0.3"
+        assert evaluate("(3+4)×2") == "14"
+        assert evaluate("2^10 + 7 % 3") == "1025"
+        assert evaluate("2**64") == "18446744073709551616"
+        assert evaluate("1/3") == "0.333333333333333"
+        assert evaluate("sqrt(16) + log(8, 2) + max(1, 2, 3)") == "10"
+        assert evaluate("sin(pi/2)") == "1"
+        assert evaluate("factorial(10)") == "3628800"
+
+    @pytest.mark.parametrize("expression, expected", [
+        ("-7 // 2", "-4"),
+        ("-7 % 2", "1"),
+        ("7 // -2", "-4"),
+        ("7 % (-2)", "-1"),
+        ("-7 // -2", "3"),
+        ("-7 % (-2)", "-1"),
+        ("7.5 // -2", "-4"),
+        ("7.5 % (-2)", "-0.5"),
+    ])
+    def test_floor_division_negative(self, expression, expected):
+        """测试整除和取模与Python一致（向下取整，余数与除数同号）"""
+        assert evaluate(expression) == expected
+
+    def test_units_and_percent(self):
+        """测试百分号和中文数量单位"""
+        assert normalize_expression("3万 × 15%") == "(3*10000) * (15/100)"
+        assert evaluate("3万 × 15%") == "4500"
+        assert evaluate("1.5亿 / 2千") == "75000"
+
+    @pytest.mark.parametrize("expression", [
+        "__import__('os').system('ls')",
+        "().__class__",
+        "x + 1",
+        "open('a')",
+        "lambda: 1",
+        "[1] * 3",
+        "1 if 1 else 2",
+        "2 << 3",
+    ])
+    def test_rejects_unsupported(self, expression):
+        """测试拒绝白名单以外的语法和名称"""
+        with pytest.raises(CalculatorError):
+            evaluate(expression)
+
+    @pytest.mark.parametrize("expression", [
+        "9**9**9",
+        "10 ** 101",
+        "factorial(1000)",
+        "9" * 60 + " * " + "9" * 60,
+        "(" * 150 + "1" + ")" * 150,
+        "+".join(["1"] * 150),
+        "-" * 60 + "1",
+        "1/0",
+    ])
+    def test_bounded_cost(self, expression):
+        """测试超出限制的表达式快速失败"""
+        start = time.perf_counter()
+        with pytest.raises(CalculatorError):
+            evaluate(expression)
+        assert time.perf_counter() - start < 0.1
+
+    def test_memoized(self):
+        """测试相同表达式（归一化后）只计算一次"""
+        calculator._evaluate_normalized.cache_clear()
+        assert evaluate("12 * 12") == evaluate(" 12 ×  12 ") == "144"
+        info = calculator._evaluate_normalized.cache_info()
+        assert info.misses == 1 and info.hits == 1
+
+    def test_tool_output(self):
+        """测试计算器工具返回结果或错误文本"""
+        assert safe_calculator("1+1") == "2"
+        assert safe_calculator("9**9**9").startswith("计算错误")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
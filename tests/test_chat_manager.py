@@ -46,6 +46,21 @@ class TestChatManager:
         session = self.chat_manager.get_session("nonexistent")
         assert session is None
     
+    def test_session_usage(self):
+        """测试助手消息的token用量累加到会话"""
+        session_id = self.chat_manager.create_session()
+        usage = {"prompt_tokens": 100, "completion_tokens": 20, "cost": 0.001}
+        self.chat_manager.add_message(session_id, "user", "你好")
+        self.chat_manager.add_message(session_id, "assistant", "你好！", metadata={"usage": usage})
+        self.chat_manager.add_message(session_id, "assistant", "缓存的回答", metadata={"cached": True})
+        
+        totals = self.chat_manager.get_session_usage(session_id)
+        assert totals == {"requests": 1, "prompt_tokens": 100, "completion_tokens": 20, "cost": 0.001}
+        assert self.chat_manager.get_session(session_id).messages[1].metadata["usage"] == usage
+        # 重新加载后仍保留
+        assert ChatManager(storage_dir=self.temp_dir).get_session_usage(session_id) == totals
+        assert self.chat_manager.get_session_usage("不存在") is None
+    
     def test_delete_session(self):
         """测试删除会话"""
         session_id = self.chat_manager.create_session()
@@ -0,0 +1,61 @@
+"""
+文档目录监听器测试
+"""
+import pytest
+import tempfile
+import shutil
+import threading
+import os
+from pathlib import Path
+from src.utils.docs_watcher import DocsWatcher
+
+
+class TestDocsWatcher:
+    """测试文档目录监听器（轮询模式）"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.batches = []
+        self.done = threading.Event()
+        self.watcher = DocsWatcher(
+            self.temp_dir,
+            self.on_batch,
+            extensions=[".txt", ".pdf"],
+            debounce_seconds=0.3,
+            poll_interval=0.05,
+            use_inotify=False
+        )
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        self.watcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def on_batch(self, batch):
+        self.batches.append(batch)
+        self.done.set()
+
+    def test_burst_is_debounced_into_one_batch(self):
+        """测试一组连续变化合并为一个批次"""
+        self.watcher.start()
+        for name in ["a.txt", "b.pdf", "ignored.tmp"]:
+            Path(self.temp_dir, name).write_text(name, encoding="utf-8")
+
+        assert self.done.wait(5)
+        assert len(self.batches) == 1
+        assert sorted(os.path.basename(p) for p in self.batches[0]) == ["a.txt", "b.pdf"]
+        assert self.watcher.get_status()["processed_files"] == 2
+
+    def test_removed_file_is_reported(self):
+        """测试删除文件也会进入索引队列"""
+        file_path = Path(self.temp_dir, "a.txt")
+        file_path.write_text("a", encoding="utf-8")
+        self.watcher.start()
+        file_path.unlink()
+
+        assert self.done.wait(5)
+        assert self.batches[0] == [os.path.abspath(str(file_path))]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
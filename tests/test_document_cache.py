@@ -0,0 +1,72 @@
+"""
+文档解析缓存测试
+"""
+import pytest
+import tempfile
+import shutil
+import os
+from pathlib import Path
+
+pytest.importorskip("langchain")
+
+from langchain.schema import Document
+from src.utils.document_cache import DocumentCache
+
+
+def simple_fingerprint(file_path: str) -> dict:
+    """测试用指纹：只取修改时间和大小"""
+    stat = os.stat(file_path)
+    return {"hash": None, "last_modified": stat.st_mtime, "file_size": stat.st_size}
+
+
+class TestDocumentCache:
+    """测试文档解析缓存"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = DocumentCache(
+            cache_dir=os.path.join(self.temp_dir, "cache"),
+            fingerprint_func=simple_fingerprint
+        )
+        self.file_path = os.path.join(self.temp_dir, "test.txt")
+        Path(self.file_path).write_text("第一版内容", encoding="utf-8")
+        self.parse_count = 0
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def parser(self, path: Path):
+        self.parse_count += 1
+        return [Document(page_content=path.read_text(encoding="utf-8"), metadata={"source": str(path), "page": 1})]
+
+    def test_parse_once_per_version(self):
+        """测试同一文件版本只解析一次"""
+        first = self.cache.get_or_parse(self.file_path, self.parser)
+        second = self.cache.get_or_parse(self.file_path, self.parser)
+
+        assert self.parse_count == 1
+        assert second[0].page_content == first[0].page_content
+        assert second[0].metadata == {"source": self.file_path, "page": 1}
+        assert self.cache.get_stats()["hits"] == 1
+
+    def test_reparse_after_change(self):
+        """测试文件变化后重新解析"""
+        self.cache.get_or_parse(self.file_path, self.parser)
+        Path(self.file_path).write_text("第二版内容，长度不同", encoding="utf-8")
+
+        documents = self.cache.get_or_parse(self.file_path, self.parser)
+        assert self.parse_count == 2
+        assert documents[0].page_content == "第二版内容，长度不同"
+
+    def test_prune_removed_files(self):
+        """测试清理已删除文件的缓存"""
+        self.cache.get_or_parse(self.file_path, self.parser)
+        os.remove(self.file_path)
+
+        assert self.cache.prune() == 1
+        assert self.cache.get_stats()["entries"] == 0
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,98 @@
+"""
+多节点负载均衡测试
+"""
+import time
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.endpoint_pool import EndpointPool
+
+
+class TestEndpointPool:
+    """测试节点调度、摘除、失败转移和对冲请求"""
+
+    def test_least_outstanding(self):
+        """测试选择未完成请求最少的节点"""
+        pool = EndpointPool(["http://a", "http://b"])
+        first = pool.acquire()
+        with pool.track(first):
+            second = pool.acquire()
+            assert second.url != first.url
+        assert first.outstanding == 0
+
+    def test_eject_after_failures(self):
+        """测试连续失败后摘除节点，请求转移到其他节点"""
+        pool = EndpointPool(["http://a", "http://b"], failure_threshold=2)
+        calls = []
+
+        def fn(url):
+            calls.append(url)
+            if url == "http://a":
+                raise ConnectionError("down")
+            return url
+
+        for _ in range(4):
+            assert pool.call(fn) == "http://b"
+
+        status = {e["url"]: e for e in pool.get_status()["endpoints"]}
+        assert not status["http://a"]["available"]
+        assert status["http://a"]["failures"] == 2
+        assert calls.count("http://a") == 2
+        assert status["http://a"]["outstanding"] == 0
+
+    def test_all_failed_raises(self):
+        """测试所有节点都失败时抛出最后的错误"""
+        pool = EndpointPool(["http://a", "http://b"])
+
+        def fn(url):
+            raise RuntimeError(url)
+
+        with pytest.raises(RuntimeError):
+            pool.call(fn)
+
+    def test_health_check_restores(self):
+        """测试摘除到期且健康检查通过后恢复节点"""
+        healthy = {"http://a": False, "http://b": True}
+        pool = EndpointPool(["http://a", "http://b"], health_check=lambda url: healthy[url], eject_seconds=0.05, health_interval=60)
+
+        pool.check_health()
+        assert not pool.endpoints[0].is_available(time.monotonic())
+
+        healthy["http://a"] = True
+        time.sleep(0.06)
+        pool.check_health()
+        assert pool.endpoints[0].is_available(time.monotonic())
+        assert pool.endpoints[0].ejected_until == 0.0
+
+    def test_hedged_request(self):
+        """测试主请求过慢时对冲请求先返回"""
+        pool = EndpointPool(["http://slow", "http://fast"], hedge_after=0.05)
+        release = threading.Event()
+
+        def fn(url):
+            if url == "http://slow":
+                release.wait(2)
+            return url
+
+        try:
+            start = time.monotonic()
+            assert pool.call(fn) == "http://fast"
+            assert time.monotonic() - start < 1
+        finally:
+            release.set()
+
+        status = pool.get_status()
+        assert status["hedged"] == 1 and status["hedge_wins"] == 1
+
+    def test_queue_wait_not_counted_for_hedge(self):
+        """测试线程池排队的时间不计入对冲等待时间"""
+        pool = EndpointPool(["http://a", "http://b"], hedge_after=0.05)
+        pool._executor = ThreadPoolExecutor(max_workers=1)
+        pool._executor.submit(time.sleep, 0.15)
+
+        assert pool.call(lambda url: url) == "http://a"
+        assert pool.get_status()["hedged"] == 0
+        pool._executor.shutdown()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
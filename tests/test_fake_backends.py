@@ -0,0 +1,43 @@
+"""
+确定性假模型后端测试
+"""
+import math
+import pytest
+from src.utils.fake_backends import FakeEmbeddings, fake_completion, hash_embedding
+
+
+class TestFakeBackends:
+    """测试哈希嵌入和固定回答的确定性"""
+
+    def test_hash_embedding_deterministic_and_normalized(self):
+        """测试相同文本得到相同的单位向量"""
+        first = hash_embedding("付款条件 payment terms", 64)
+        assert first == hash_embedding("付款条件 payment terms", 64)
+        assert len(first) == 64
+        assert math.isclose(sum(x * x for x in first), 1.0, rel_tol=1e-9)
+        assert hash_embedding("", 8) == [1.0] + [0.0] * 7
+
+    def test_shared_words_are_closer(self):
+        """测试共享词语的文本向量更接近"""
+        def cosine(a, b):
+            return sum(x * y for x, y in zip(a, b))
+
+        query = hash_embedding("contract payment schedule")
+        related = hash_embedding("the contract payment schedule is monthly")
+        unrelated = hash_embedding("network backup storage server")
+        assert cosine(query, related) > cosine(query, unrelated)
+
+    def test_fake_embeddings(self):
+        """测试嵌入模型接口"""
+        embeddings = FakeEmbeddings(dim=32)
+        assert embeddings.embed_query("hello") == embeddings.embed_documents(["hello"])[0]
+        assert embeddings.calls == 2
+
+    def test_fake_completion(self):
+        """测试回答由提示词决定"""
+        assert fake_completion("问题A") == fake_completion("问题A")
+        assert fake_completion("问题A") != fake_completion("问题B")
+        assert len(fake_completion("问题A", tokens=50).split(" ")) == 50
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,98 @@
+"""
+假模型服务测试
+"""
+import json
+import urllib.error
+import urllib.request
+import pytest
+from src.utils.fake_backends import hash_embedding
+from src.utils.fake_model_server import FakeModelServer, FakeServerConfig, parse_latency
+
+
+class TestFakeModelServer:
+    """测试Ollama/OpenAI兼容接口、流式输出和错误注入"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.server = FakeModelServer(config=FakeServerConfig(tokens=8, embedding_dim=16)).start()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        self.server.stop()
+
+    def request(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(self.server.url + path, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return response.status, response.headers.get("Content-Type"), response.read().decode("utf-8")
+
+    def test_ollama_tags(self):
+        """测试模型列表"""
+        _, _, body = self.request("/api/tags")
+        names = [model["name"] for model in json.loads(body)["models"]]
+        assert "llama2:latest" in names
+
+    def test_ollama_generate(self):
+        """测试非流式和流式生成结果一致"""
+        _, _, body = self.request("/api/generate", {"model": "llama2", "prompt": "你好", "stream": False})
+        result = json.loads(body)
+        assert result["done"] is True and result["eval_count"] == 8
+
+        _, content_type, body = self.request("/api/generate", {"model": "llama2", "prompt": "你好"})
+        lines = [json.loads(line) for line in body.splitlines()]
+        assert content_type == "application/x-ndjson"
+        assert lines[-1]["done"] is True and lines[-1]["eval_count"] == 8
+        assert "".join(line["response"] for line in lines) == result["response"]
+
+    def test_ollama_chat(self):
+        """测试对话接口"""
+        _, _, body = self.request("/api/chat", {"model": "llama2", "messages": [{"role": "user", "content": "hi"}], "stream": False})
+        assert json.loads(body)["message"]["role"] == "assistant"
+
+    def test_embeddings_deterministic(self):
+        """测试嵌入向量与 hash_embedding 一致"""
+        _, _, body = self.request("/api/embeddings", {"model": "nomic-embed-text", "prompt": "合同 付款"})
+        assert json.loads(body)["embedding"] == hash_embedding("合同 付款", 16)
+
+        _, _, body = self.request("/v1/embeddings", {"model": "text-embedding-ada-002", "input": ["a b", [1, 2]]})
+        data = json.loads(body)["data"]
+        assert data[0]["embedding"] == hash_embedding("a b", 16)
+        assert data[1]["embedding"] == hash_embedding("1 2", 16)
+
+    def test_openai_chat(self):
+        """测试OpenAI对话的普通和SSE流式响应"""
+        messages = [{"role": "user", "content": "hello"}]
+        _, _, body = self.request("/v1/chat/completions", {"model": "gpt-3.5-turbo", "messages": messages, "max_tokens": 4})
+        result = json.loads(body)
+        assert result["usage"]["completion_tokens"] == 4
+        text = result["choices"][0]["message"]["content"]
+
+        _, content_type, body = self.request("/v1/chat/completions", {"model": "gpt-3.5-turbo", "messages": messages, "max_tokens": 4, "stream": True})
+        events = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+        assert content_type == "text/event-stream"
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(event)["choices"][0]["delta"].get("content", "") for event in events[:-1]]
+        assert "".join(chunks) == text
+
+    def test_error_injection(self):
+        """测试错误注入和统计"""
+        self.server.update_config(error_rate=1.0, error_status=503)
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            self.request("/api/generate", {"prompt": "x", "stream": False})
+        assert exc.value.code == 503
+
+        _, _, body = self.request("/_fake/stats")
+        stats = json.loads(body)
+        assert stats["errors_injected"] == 1
+        assert stats["requests"]["/api/generate"] == 1
+
+    def test_parse_latency(self):
+        """测试延迟分布解析"""
+        assert parse_latency("uniform:0.1,0.5") == ("uniform", [0.1, 0.5])
+        with pytest.raises(ValueError):
+            parse_latency("uniform:0.1")
+        with pytest.raises(ValueError):
+            FakeServerConfig(latency="gamma:1")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
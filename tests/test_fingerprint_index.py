@@ -0,0 +1,76 @@
+"""
+文件指纹索引测试
+"""
+import pytest
+import tempfile
+import shutil
+import os
+from pathlib import Path
+from src.utils.fingerprint_index import FingerprintIndex
+
+
+class CountingIndex(FingerprintIndex):
+    """记录哈希计算次数的指纹索引"""
+
+    hash_calls = 0
+
+    def hash_file(self, file_path: str) -> str:
+        self.hash_calls += 1
+        return super().hash_file(file_path)
+
+
+class TestFingerprintIndex:
+    """测试文件指纹索引"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, "stat_index.json")
+        self.file_a = os.path.join(self.temp_dir, "a.txt")
+        self.file_b = os.path.join(self.temp_dir, "b.txt")
+        Path(self.file_a).write_text("aaa", encoding="utf-8")
+        Path(self.file_b).write_text("bbb", encoding="utf-8")
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_unchanged_stat_skips_hashing(self):
+        """测试stat未变化时不重新计算哈希"""
+        index = CountingIndex(self.index_file)
+        first = index.fingerprint(self.file_a)
+        index.save()
+
+        reloaded = CountingIndex(self.index_file)
+        second = reloaded.fingerprint(self.file_a)
+
+        assert index.hash_calls == 1
+        assert reloaded.hash_calls == 0
+        assert first["hash"] == second["hash"]
+
+    def test_diff_reports_each_file(self):
+        """测试逐文件变化明细"""
+        index = FingerprintIndex(self.index_file)
+        baseline = {path: index.fingerprint(path) for path in [self.file_a, self.file_b]}
+
+        Path(self.file_a).write_text("changed content", encoding="utf-8")
+        file_c = os.path.join(self.temp_dir, "c.txt")
+        Path(file_c).write_text("ccc", encoding="utf-8")
+
+        diff = index.diff([self.file_a, file_c], baseline)
+        assert diff.modified == [self.file_a]
+        assert diff.added == [file_c]
+        assert diff.removed == [self.file_b]
+        assert diff.has_changes
+
+    def test_no_changes(self):
+        """测试无变化时的结果"""
+        index = FingerprintIndex(self.index_file)
+        baseline = {self.file_a: index.fingerprint(self.file_a)}
+
+        diff = index.diff([self.file_a], baseline)
+        assert not diff.has_changes
+        assert diff.unchanged == [self.file_a]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
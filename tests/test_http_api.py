@@ -0,0 +1,137 @@
+"""
+HTTP接口测试
+"""
+import json
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+from src.api.http_api import create_api_app
+
+
+class StubAssistant:
+    """只实现接口用到的方法的助手"""
+
+    role = "standalone"
+    generation = None
+    qa_chain = object()
+    llm = None
+    loaded_documents = [1, 2]
+
+    def chat_with_sources(self, message, filters=None, session_id=None):
+        scope = f"({filters['filename'][0]})" if filters else ""
+        return f"回答{scope}: {message}", ["文档1内容"]
+
+    def stream_chat_with_sources(self, message, filters=None, session_id=None):
+        yield "sources", ["文档1内容"]
+        for text in ["回答", ": ", message]:
+            yield "answer", text
+
+    def get_filter_options(self):
+        return {"filename": ["a.txt"], "type": ["text"], "page": []}
+
+    def find_keyword(self, keyword):
+        return [{"filename": "a.txt", "page": 1, "occurrences": 2, "preview": keyword}]
+
+    def get_ingest_status(self):
+        return {"loaded_documents": 2, "watcher": None}
+
+    def get_slow_requests(self, limit=20):
+        return [{"request_id": "r1", "total_ms": 12000.0, "stacks": "main;invoke 3\n"}][:limit]
+
+    def get_usage_report(self, days=7):
+        return {"days": days, "total": {"requests": 1, "prompt_tokens": 10, "completion_tokens": 5, "cost": 0.0}}
+
+
+class StubManager:
+    """只有一个知识库 docs 的管理器，记录获取/释放次数"""
+
+    def __init__(self):
+        self.in_use = 0
+
+    def exists(self, name):
+        return name == "docs"
+
+    def acquire(self, name):
+        self.in_use += 1
+        return StubAssistant()
+
+    def release(self, target):
+        self.in_use -= 1
+
+
+class TestHttpApi:
+    """测试HTTP接口"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.client = TestClient(create_api_app(StubAssistant()))
+
+    def test_health(self):
+        """测试健康检查"""
+        response = self.client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ok"
+        assert response.json()["loaded_documents"] == 2
+
+    def test_chat_json(self):
+        """测试JSON问答"""
+        response = self.client.post("/api/chat", json={"message": "你好"})
+        data = response.json()
+        assert data["answer"] == "回答: 你好"
+        assert data["sources"] == ["文档1内容"]
+
+    def test_chat_with_filters(self):
+        """测试限定检索范围"""
+        response = self.client.post("/api/chat", json={"message": "你好", "filters": {"filename": ["a.txt"]}})
+        assert response.json()["answer"] == "回答(a.txt): 你好"
+        assert self.client.get("/api/filters").json()["filename"] == ["a.txt"]
+
+    def test_chat_stream(self):
+        """测试SSE流式问答随模型输出逐块推送"""
+        response = self.client.post("/api/chat", json={"message": "你好", "stream": True})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line for line in response.text.splitlines() if line.startswith("event:")]
+        assert events == ["event: sources"] + ["event: answer"] * 3 + ["event: done"]
+        answers = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: \"")]
+        assert "".join(answers) == "回答: 你好"
+
+    def test_chat_stream_knowledge_base(self):
+        """测试流式问答结束后释放知识库，不存在的知识库在开始输出前返回404"""
+        manager = StubManager()
+        client = TestClient(create_api_app(StubAssistant(), manager))
+        response = client.post("/api/chat", json={"message": "你好", "stream": True, "knowledge_base": "docs"})
+        assert "event: done" in response.text
+        assert manager.in_use == 0
+        assert client.post("/api/chat", json={"message": "你好", "stream": True, "knowledge_base": "nope"}).status_code == 404
+
+    def test_empty_message_rejected(self):
+        """测试空问题返回400"""
+        assert self.client.post("/api/chat", json={"message": " "}).status_code == 400
+
+    def test_search_and_status(self):
+        """测试搜索和入库状态"""
+        results = self.client.post("/api/search", json={"keyword": "合同"}).json()["results"]
+        assert results[0]["filename"] == "a.txt"
+        assert self.client.get("/api/ingest/status").json()["loaded_documents"] == 2
+
+    def test_metrics(self):
+        """测试Prometheus指标接口"""
+        response = self.client.get("/metrics")
+        assert response.status_code == 200
+        assert "rag_stage_duration_seconds" in response.text
+
+    def test_debug_endpoints(self):
+        """测试慢请求列表；未启用采样时采样接口返回404"""
+        assert self.client.get("/api/debug/slow_requests").json()["requests"][0]["request_id"] == "r1"
+        assert self.client.post("/api/debug/profile", json={"seconds": 1}).status_code == 404
+
+    def test_usage_report(self):
+        """测试用量统计接口"""
+        assert self.client.get("/api/usage?days=3").json()["days"] == 3
+        assert self.client.get("/api/usage?days=0").status_code == 400
+
+if __name__ == "__main__":
+    pytest.main([__file__])
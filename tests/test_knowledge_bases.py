@@ -0,0 +1,145 @@
+"""
+多知识库管理测试
+"""
+import pytest
+import tempfile
+import shutil
+from src.core.knowledge_bases import KnowledgeBaseManager
+
+
+class FakeKnowledgeBase:
+    """记录加载和卸载的知识库"""
+
+    def __init__(self, name, docs_dir, cache_dir, memory_mb=10):
+        self.name = name
+        self.docs_dir = docs_dir
+        self.cache_dir = cache_dir
+        self.memory_mb = memory_mb
+        self.initialized = False
+        self.closed = False
+
+    def initialize_system(self):
+        self.initialized = True
+
+    def estimate_memory_bytes(self):
+        return self.memory_mb * 1024 * 1024
+
+    def close(self):
+        self.closed = True
+
+
+class TestKnowledgeBaseManager:
+    """测试多知识库懒加载和LRU卸载"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.created = []
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def make_manager(self, **kwargs):
+        def factory(name, docs_dir, cache_dir):
+            kb = FakeKnowledgeBase(name, docs_dir, cache_dir)
+            self.created.append(kb)
+            return kb
+        return KnowledgeBaseManager(factory, root_dir=self.temp_dir, **kwargs)
+
+    def test_lazy_load_with_isolated_dirs(self):
+        """测试首次访问时加载，且各知识库目录独立"""
+        manager = self.make_manager()
+        manager.create("team-a")
+        manager.create("team_b")
+        assert self.created == []
+
+        a = manager.get("team-a")
+        b = manager.get("team_b")
+        assert manager.get("team-a") is a
+        assert a.initialized and len(self.created) == 2
+        assert a.docs_dir != b.docs_dir and a.cache_dir != b.cache_dir
+        assert manager.list() == ["team-a", "team_b"]
+
+    def test_lru_unload_by_count(self):
+        """测试超出数量上限时卸载最久未使用的知识库"""
+        manager = self.make_manager(max_loaded=2)
+        for name in ["a", "b", "c"]:
+            manager.create(name)
+
+        a = manager.get("a")
+        manager.get("b")
+        manager.get("a")
+        manager.get("c")
+
+        stats = manager.get_stats()
+        assert stats["loaded"] == ["a", "c"]
+        assert not a.closed
+        assert self.created[1].closed
+
+    def test_unload_by_memory_budget(self):
+        """测试超出内存预算时卸载"""
+        manager = self.make_manager(memory_budget_mb=25)
+        for name in ["a", "b", "c"]:
+            manager.create(name)
+            manager.get(name)
+
+        assert manager.get_stats()["loaded"] == ["b", "c"]
+        assert manager.get_stats()["memory_mb"] == 20
+
+    def test_default_and_invalid_names(self):
+        """测试默认知识库常驻，非法名称和不存在的知识库报错"""
+        default = FakeKnowledgeBase("default", "docs", "cache")
+        manager = self.make_manager(default_assistant=default)
+
+        assert manager.get("default") is default
+        assert manager.list() == ["default"]
+        with pytest.raises(ValueError):
+            manager.get("../etc")
+        with pytest.raises(KeyError):
+            manager.get("missing")
+        with pytest.raises(ValueError):
+            manager.delete("default")
+
+    def test_delete(self):
+        """测试删除知识库"""
+        manager = self.make_manager()
+        manager.create("a")
+        kb = manager.get("a")
+        manager.delete("a")
+
+        assert kb.closed
+        assert not manager.exists("a")
+        assert "a" not in manager._load_locks
+
+    def test_in_use_not_evicted(self):
+        """测试正在使用的知识库不会被卸载，请求结束后再按预算卸载"""
+        manager = self.make_manager(max_loaded=1)
+        for name in ["a", "b"]:
+            manager.create(name)
+
+        with manager.use("a") as a:
+            b = manager.get("b")
+            assert not a.closed
+            assert manager.get_stats()["loaded"] == ["a", "b"]
+            assert manager.get_stats()["in_use"] == ["a"]
+        assert a.closed and not b.closed
+        assert manager.get_stats()["loaded"] == ["b"]
+
+    def test_unload_waits_for_last_request(self):
+        """测试显式卸载时，关闭推迟到最后一个请求结束"""
+        manager = self.make_manager()
+        manager.create("a")
+        first = manager.acquire("a")
+        second = manager.acquire("a")
+        assert first is second
+
+        assert manager.unload("a")
+        assert manager.get_stats()["loaded"] == []
+        manager.release(first)
+        assert not first.closed
+        manager.release(second)
+        assert first.closed
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,52 @@
+"""
+延迟导入测试 - 导入入口模块时不应加载重量级依赖
+"""
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+
+pytest.importorskip("dotenv")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 只应在首次使用时导入的模块
+HEAVY_MODULES = ["gradio", "langchain", "langchain_openai", "langchain_community", "faiss", "fitz"]
+
+
+def loaded_heavy_modules(module: str) -> list:
+    """在子进程中导入模块，返回被加载的重量级依赖"""
+    code = (
+        f"import sys; import {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+class TestLazyImports:
+    """测试入口模块的延迟导入"""
+
+    def test_import_main_is_lightweight(self):
+        """测试导入main不加载gradio/langchain/faiss/PyMuPDF"""
+        assert loaded_heavy_modules("main") == []
+
+    def test_import_config_is_silent(self):
+        """测试导入config不产生输出"""
+        result = subprocess.run(
+            [sys.executable, "-c", "import config"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        assert result.stdout == ""
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,112 @@
+"""
+压力测试工具测试
+"""
+import random
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from src.core.load_generator import (AssistantTarget, LoadTestRunner, QuestionMix, StageResult, find_saturation,
+                                format_report, questions_from_documents, summarize_stage)
+
+
+class CappedAssistant:
+    """同时最多处理2个请求的助手，用于观察饱和"""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.slots = threading.Semaphore(2)
+        self.calls = 0
+
+    def chat_with_sources(self, message, filters=None):
+        with self.slots:
+            time.sleep(self.latency)
+            self.calls += 1
+        if "坏" in message:
+            return "抱歉，系统遇到了一些问题，无法回答您的问题。", []
+        return f"答:{message}", []
+
+
+def stage(concurrency, rps, p99=100.0, error_rate=0.0):
+    return StageResult(concurrency, 100, int(error_rate * 100), 10.0, rps, error_rate, 50.0, 50.0, 80.0, p99, p99)
+
+
+class TestLoadTest:
+    """测试压测统计、饱和点和并发会话"""
+
+    def test_summarize_stage(self):
+        """测试吞吐、分位数和错误率"""
+        samples = [{"kind": "knowledge", "seconds": i / 1000, "error": None} for i in range(1, 101)]
+        samples[0]["error"] = "error_response"
+        result = summarize_stage(4, samples, 2.0)
+        assert result.requests == 100 and result.throughput_rps == 50.0
+        assert result.error_rate == 0.01
+        assert result.p50_ms == 50.0 and result.p99_ms == 99.0 and result.max_ms == 100.0
+        assert result.by_kind["knowledge"]["requests"] == 100
+
+    def test_find_saturation(self):
+        """测试按吞吐增长、p99和错误率判断饱和"""
+        stages = [stage(1, 10), stage(2, 19), stage(4, 20), stage(8, 20)]
+        assert find_saturation(stages)["concurrency"] == 2
+
+        stages = [stage(1, 10), stage(2, 19, p99=900)]
+        assert find_saturation(stages, p99_slo_ms=500)["concurrency"] == 1
+
+        stages = [stage(1, 10), stage(2, 19, error_rate=0.05)]
+        assert find_saturation(stages)["concurrency"] == 1
+
+        result = find_saturation([stage(1, 10), stage(2, 20)])
+        assert result["concurrency"] == 2 and "未饱和" in result["reason"]
+
+    def test_question_mix(self):
+        """测试按权重抽取问题，空类别被跳过"""
+        mix = QuestionMix(knowledge=[], weights={"knowledge": 1.0, "general": 1.0, "small_talk": 0.0})
+        rng = random.Random(0)
+        kinds = {mix.sample(rng)["kind"] for _ in range(20)}
+        assert kinds == {"general"}
+
+    def test_questions_from_documents(self):
+        """测试从文档片段生成问题"""
+        documents = [SimpleNamespace(page_content="payment terms are due within thirty days of invoice date"),
+                     SimpleNamespace(page_content="合同约定付款期限为三十天")]
+        questions = questions_from_documents(documents, count=5, words=4)
+        assert len(questions) == 5
+        assert questions == questions_from_documents(documents, count=5, words=4)
+
+    def test_run_reports_saturation(self):
+        """测试并发梯度运行：超过服务能力后吞吐不再增长"""
+        assistant = CappedAssistant()
+        mix = QuestionMix(knowledge=["好问题"], general=["坏问题"], weights={"knowledge": 0.9, "general": 0.1})
+        runner = LoadTestRunner(AssistantTarget(assistant), mix, think_time=0, duration=0.3)
+        report = runner.run([1, 2, 8], max_error_rate=1.0)
+
+        stages = report["stages"]
+        assert [item["concurrency"] for item in stages] == [1, 2, 8]
+        assert stages[1]["throughput_rps"] > stages[0]["throughput_rps"] * 1.5
+        # 服务只能同时处理2个请求，并发8时延迟上升而吞吐不再增长
+        assert stages[2]["mean_ms"] > stages[1]["mean_ms"] * 2
+        assert report["saturation"]["concurrency"] == 2
+        assert 0 < sum(item["errors"] for item in stages) < sum(item["requests"] for item in stages) / 2
+        assert "并发" in format_report(report)
+
+    def test_chat_mode_sessions(self):
+        """测试chat模式每个虚拟用户保持一个会话，结束后清理"""
+        created, deleted = [], []
+
+        class SessionAssistant:
+            def chat_with_ai(self, message, history, session_id):
+                if session_id is None:
+                    session_id = f"s{len(created)}"
+                    created.append(session_id)
+                return history + [{"role": "user", "content": message}, {"role": "assistant", "content": "好"}], session_id
+
+        target = AssistantTarget(SessionAssistant(), mode="chat", chat_manager=SimpleNamespace(delete_session=deleted.append))
+        session = target.new_session()
+        target.ask(session, "你好")
+        target.ask(session, "再见")
+        assert created == ["s0"] and len(session["history"]) == 4
+        target.cleanup()
+        assert deleted == ["s0"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,125 @@
+"""
+日志管理器测试
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import pytest
+from src.utils import tracing
+from src.utils.logger import DebugSampler, LoggerManager
+
+
+class ThreadRecordingHandler(logging.Handler):
+    """记录处理日志的线程"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def emit(self, record):
+        self.threads.append(threading.current_thread().name)
+
+
+class TestLoggerManager:
+    """测试队列日志、JSON格式和DEBUG采样"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "app.log")
+        self.root = logging.getLogger()
+        self.saved_handlers = self.root.handlers[:]
+        self.saved_level = self.root.level
+        self.saved_records = os.environ.get("TRACE_RECORDS")
+        os.environ["TRACE_RECORDS"] = "false"
+        tracing.get_recorder.cache_clear()
+        self.manager = LoggerManager(self.log_file, "DEBUG", debug_sample_rate=0.5)
+        self.manager.setup_global_logging()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        self.manager.shutdown()
+        self.root.handlers[:] = self.saved_handlers
+        self.root.setLevel(self.saved_level)
+        if self.saved_records is None:
+            os.environ.pop("TRACE_RECORDS", None)
+        else:
+            os.environ["TRACE_RECORDS"] = self.saved_records
+        tracing.get_recorder.cache_clear()
+        shutil.rmtree(self.temp_dir)
+
+    def read_records(self):
+        self.manager.shutdown()
+        with open(self.log_file, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_json_records_with_request_id(self):
+        """测试文件中每行一个JSON对象，请求内的日志带请求ID和附加字段"""
+        logger = self.manager.get_logger("test.json")
+        with tracing.trace_request("chat", request_id="req-1"):
+            logger.info("检索完成 %d 个片段", 3, extra={"route": "knowledge"})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("失败")
+
+        records = self.read_records()
+        assert records[0]["msg"] == "检索完成 3 个片段"
+        assert records[0]["request_id"] == "req-1" and records[0]["route"] == "knowledge"
+        assert records[1]["request_id"] is None
+        assert records[1]["level"] == "ERROR" and "ValueError: boom" in records[1]["exc"]
+
+    def test_get_logger_has_no_side_effects(self):
+        """测试获取logger不改动根logger，也不创建日志文件"""
+        log_file = os.path.join(self.temp_dir, "other.log")
+        manager = LoggerManager(log_file)
+        handlers = self.root.handlers[:]
+        manager.get_logger("test.import")
+        assert self.root.handlers == handlers
+        assert manager.listener is None and not os.path.exists(log_file)
+
+    def test_single_handler_per_record(self):
+        """测试模块logger不挂处理器，根logger只有一个队列处理器，重复配置不重复写入"""
+        logger = self.manager.get_logger("test.single")
+        self.manager.setup_global_logging()
+        assert logger.handlers == []
+        # pytest在每个阶段会临时挂上自己的捕获处理器，只检查队列处理器
+        assert [type(handler).__name__ for handler in self.root.handlers].count("_QueueHandler") == 1
+
+        logger.info("一次")
+        assert [record["msg"] for record in self.read_records()] == ["一次"]
+
+    def test_handlers_run_off_request_thread(self):
+        """测试写入在后台线程完成"""
+        recorder = ThreadRecordingHandler()
+        self.manager.shutdown()
+        self.manager._build_handlers = lambda: [recorder]
+        self.manager.setup_global_logging()
+        self.manager.get_logger("test.thread").warning("后台写入")
+        self.manager.shutdown()
+        assert recorder.threads and threading.current_thread().name not in recorder.threads
+
+    def test_debug_sampling(self):
+        """测试DEBUG日志按调用位置采样"""
+        logger = self.manager.get_logger("test.sample")
+        for i in range(10):
+            logger.debug("高频 %d", i)
+        logger.info("保留")
+
+        records = self.read_records()
+        debug = [record for record in records if record["level"] == "DEBUG"]
+        assert [record["msg"] for record in debug] == [f"高频 {i}" for i in range(0, 10, 2)]
+        assert debug[0]["sampled"] == 2
+        assert records[-1]["msg"] == "保留"
+
+    def test_sampler_rates(self):
+        """测试采样比例为0时丢弃全部DEBUG日志"""
+        record = logging.makeLogRecord({"levelno": logging.DEBUG, "pathname": "a.py", "lineno": 1})
+        assert DebugSampler(0).filter(record) is False
+        assert DebugSampler(1.0).filter(record) is True
+
+if __name__ == "__main__":
+    pytest.main([__file__])
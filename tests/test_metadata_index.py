@@ -0,0 +1,62 @@
+"""
+元数据过滤索引测试
+"""
+import pytest
+from types import SimpleNamespace
+from src.core.metadata_index import MetadataIndex, filter_attributes, matches_filters
+
+
+def make_vector_store(metadatas):
+    """只包含docstore映射的向量库"""
+    docs = {str(i): SimpleNamespace(page_content=f"片段{i}", metadata=m) for i, m in enumerate(metadatas)}
+    return SimpleNamespace(
+        index_to_docstore_id={i: str(i) for i in range(len(metadatas))},
+        docstore=SimpleNamespace(search=docs.get)
+    )
+
+
+METADATAS = [
+    {"source": "docs/a.pdf", "filename": "a.pdf", "page": 1},
+    {"source": "docs/a.pdf", "filename": "a.pdf", "page": 2},
+    {"source": "docs/a.pdf", "filename": "a.pdf", "page": 7},
+    {"source": "docs/b.docx", "type": "word"},
+    {"source": "docs/c.txt", "type": "text"},
+]
+
+
+class TestMetadataIndex:
+    """测试元数据过滤索引"""
+
+    def test_filter_attributes_fill_missing_fields(self):
+        """测试缺失的文件名和格式由路径推断"""
+        assert filter_attributes(METADATAS[0])["type"] == "pdf"
+        assert filter_attributes(METADATAS[3])["filename"] == "b.docx"
+
+    def test_matches_filters(self):
+        """测试单个片段的过滤判断"""
+        assert matches_filters(METADATAS[1], {"filename": ["a.pdf"], "page": {"gte": 2, "lte": 5}})
+        assert not matches_filters(METADATAS[2], {"page": {"lte": 5}})
+        assert not matches_filters(METADATAS[4], {"page": {"gte": 1}})
+        assert matches_filters(METADATAS[4], None)
+
+    def test_select(self):
+        """测试属性ID集合的组合"""
+        pytest.importorskip("numpy")
+        index = MetadataIndex.from_vector_store(make_vector_store(METADATAS))
+
+        assert index.select(None) is None
+        assert index.select({"filename": ["a.pdf", "c.txt"]}).tolist() == [0, 1, 2, 4]
+        assert index.select({"type": "pdf", "page": {"gte": 2, "lte": 7}}).tolist() == [1, 2]
+        assert index.select({"filename": "missing.pdf"}).tolist() == []
+        assert index.select({"type": "word"}) is index.select({"type": "word"})
+        assert index.values("type") == ["pdf", "text", "word"]
+
+    def test_unknown_field(self):
+        """测试不支持的过滤字段"""
+        pytest.importorskip("numpy")
+        index = MetadataIndex.from_vector_store(make_vector_store(METADATAS))
+        with pytest.raises(ValueError):
+            index.select({"author": "x"})
+
+if __name__ == "__main__":
+    pytest.main([__file__])
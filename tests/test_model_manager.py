@@ -0,0 +1,63 @@
+"""
+模型管理器客户端复用测试
+"""
+import pytest
+import tempfile
+import shutil
+import os
+from src.utils import model_manager as mm
+
+
+class TestModelManagerPooling:
+    """测试模型客户端和连接池复用"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.temp_dir, "model_config.json")
+        mm.close_clients()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        mm.close_clients()
+        shutil.rmtree(self.temp_dir)
+
+    def test_env_overrides_saved_config(self, monkeypatch):
+        """测试环境变量优先于保存的提供商和服务地址"""
+        manager = mm.ModelManager(self.config_file)
+        manager.current_config["provider"] = "openai"
+        manager.save_config()
+
+        monkeypatch.setenv("MODEL_PROVIDER", "ollama")
+        monkeypatch.setenv("OLLAMA_BASE_URL", "http://127.0.0.1:11500")
+        config = mm.ModelManager(self.config_file).current_config
+        assert config["provider"] == "ollama"
+        assert config["ollama"]["base_url"] == "http://127.0.0.1:11500"
+
+    def test_ollama_clients_are_reused(self):
+        """测试相同配置返回同一个客户端，跨ModelManager共享"""
+        pytest.importorskip("langchain_community")
+        first = mm.ModelManager(self.config_file)
+        second = mm.ModelManager(self.config_file)
+
+        assert first.create_llm("ollama") is second.create_llm("ollama")
+        assert first.create_embeddings("ollama") is first.create_embeddings("ollama")
+        assert first.create_llm("ollama", "mistral") is not first.create_llm("ollama")
+
+    def test_http_client_per_base_url(self):
+        """测试每个服务地址一个长连接池"""
+        pytest.importorskip("httpx")
+        manager = mm.ModelManager(self.config_file, pool_size=4, timeout=5)
+
+        client = manager.get_http_client("https://a.example/v1")
+        assert manager.get_http_client("https://a.example/v1") is client
+        assert manager.get_http_client("https://b.example/v1") is not client
+
+    def test_session_reused(self):
+        """测试健康检查会话复用"""
+        pytest.importorskip("requests")
+        manager = mm.ModelManager(self.config_file)
+        assert manager.get_session("http://localhost:11434") is manager.get_session("http://localhost:11434")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
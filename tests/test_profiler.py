@@ -0,0 +1,90 @@
+"""
+采样分析和慢请求捕获测试
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import pytest
+from src.utils import tracing
+from src.utils.profiler import SamplingProfiler, SlowRequestMonitor
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def slow_generate(seconds):
+    time.sleep(seconds)
+
+
+class TestProfiler:
+    """测试折叠栈采样和慢请求记录"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.saved_records = os.environ.get("TRACE_RECORDS")
+        os.environ["TRACE_RECORDS"] = "false"
+        tracing.get_recorder.cache_clear()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        if self.saved_records is None:
+            os.environ.pop("TRACE_RECORDS", None)
+        else:
+            os.environ["TRACE_RECORDS"] = self.saved_records
+        tracing.get_recorder.cache_clear()
+        shutil.rmtree(self.temp_dir)
+
+    def test_profile_collapsed_stacks(self):
+        """测试采样结果为折叠栈格式并包含工作线程的函数"""
+        worker = threading.Thread(target=busy_wait, args=(0.3,), name="busy-worker")
+        worker.start()
+        profiler = SamplingProfiler(interval=0.005, output_dir=self.temp_dir)
+        path = profiler.profile(0.2)
+        worker.join()
+
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert profiler.samples > 5
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        busy = [line for line in lines if line.startswith("busy-worker;")]
+        assert busy and "busy_wait (" in busy[0]
+        assert not any("sampling-profiler" in line for line in lines)
+
+    def test_profiler_single_window(self):
+        """测试同一时间只能进行一次采样"""
+        profiler = SamplingProfiler(interval=0.01)
+        profiler.start(0.2)
+        with pytest.raises(RuntimeError):
+            profiler.start(0.1)
+        profiler.stop()
+
+    def test_slow_request_captured(self):
+        """测试慢请求保存调用栈、阶段耗时、会话ID和问题"""
+        monitor = SlowRequestMonitor(threshold_ms=50, interval=0.01).start()
+        try:
+            with tracing.trace_request("chat") as trace:
+                trace.tag(session_id="s-1", query="为什么这么慢")
+                with tracing.span("generate"):
+                    slow_generate(0.2)
+            with tracing.trace_request("chat"):
+                pass
+        finally:
+            monitor.stop()
+
+        records = monitor.get_records()
+        assert len(records) == 1
+        record = records[0]
+        assert record["session_id"] == "s-1" and record["query"] == "为什么这么慢"
+        assert record["stages_ms"]["generate"] >= 200
+        assert record["samples"] > 0
+        assert "slow_generate (" in record["stacks"]
+        # 诊断标签不写入请求记录
+        assert "query" not in trace.to_record()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,137 @@
+"""
+查询规划测试
+"""
+import pytest
+from src.core.query_planner import (
+    KeywordIndex, QueryPlanner, ROUTE_KNOWLEDGE, ROUTE_KEYWORD, ROUTE_GENERAL, ROUTE_SMALL_TALK
+)
+
+
+class FakeDocument:
+    """只包含正文和元数据的文档片段"""
+
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+def keyword_search(documents, message, k=3):
+    """逐个扫描片段的关键词计分，作为倒排索引结果的对照"""
+    search_terms = message.lower().split()
+    scored = []
+    for doc in documents:
+        content = doc.page_content.lower()
+        score = sum(1 for term in search_terms if term in content)
+        if score > 0:
+            scored.append((doc, score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:k]
+
+
+class TestQueryPlanner:
+    """测试回答路径选择和关键词兜底检索"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.planner = QueryPlanner()
+        self.docs = [
+            FakeDocument("FAISS is a vector index"),
+            FakeDocument("Gradio builds web ui"),
+            FakeDocument("vector search with FAISS index")
+        ]
+
+    def test_knowledge_route(self):
+        """测试向量检索命中时使用知识库提示词"""
+        plan = self.planner.plan("what is faiss", lambda: [(self.docs[0], 0.3)], self.docs)
+
+        assert plan.route == ROUTE_KNOWLEDGE
+        assert plan.scores == [0.3]
+        assert "FAISS is a vector index" in plan.prompt
+        assert len(plan.sources) == 1
+
+    def test_keyword_route_when_vector_fails(self):
+        """测试向量检索失败或为空时使用关键词匹配结果"""
+        def broken():
+            raise RuntimeError("embedding service down")
+
+        plan = self.planner.plan("faiss index", broken, self.docs)
+        assert plan.route == ROUTE_KEYWORD
+        assert plan.scores == [2, 2]
+
+        plan = self.planner.plan("faiss index", lambda: [], self.docs)
+        assert plan.route == ROUTE_KEYWORD
+
+    def test_general_route(self):
+        """测试知识库不可用或无匹配时使用通用提示词"""
+        plan = self.planner.plan("what time is it", None, self.docs)
+        assert plan.route == ROUTE_GENERAL
+        assert plan.sources == []
+        assert "请直接回答这个问题" in plan.prompt
+
+        plan = self.planner.plan("weather today", lambda: [], self.docs)
+        assert plan.route == ROUTE_GENERAL
+        assert self.planner.get_stats()["routes"][ROUTE_GENERAL] == 2
+
+    def test_distance_threshold(self):
+        """测试距离超过阈值的检索结果视为不相关，且不再用关键词兜底"""
+        hits = [(self.docs[0], 0.4), (self.docs[2], 1.5)]
+
+        plan = self.planner.plan("faiss index", lambda: hits, self.docs, max_distance=1.0)
+        assert plan.route == ROUTE_KNOWLEDGE
+        assert plan.scores == [0.4]
+
+        plan = self.planner.plan("faiss index", lambda: hits, self.docs, max_distance=0.1)
+        assert plan.route == ROUTE_GENERAL
+        assert plan.sources == []
+        assert "FAISS" not in plan.prompt
+
+    def test_small_talk_skips_retrieval(self):
+        """测试闲聊不执行检索"""
+        def vector_search():
+            raise AssertionError("闲聊不应检索")
+
+        plan = self.planner.plan("你好！", vector_search, self.docs)
+        assert plan.route == ROUTE_SMALL_TALK
+        assert len(plan.prompt) < 50
+
+        planner = QueryPlanner(small_talk_gate=False)
+        assert planner.plan("你好", lambda: [(self.docs[0], 0.1)], self.docs).route == ROUTE_KNOWLEDGE
+
+    def test_keyword_search_only_without_vector_hits(self):
+        """测试向量检索有结果时不做关键词检索，片段列表不变时复用关键词索引"""
+        class CountingDocuments(list):
+            iterations = 0
+
+            def __iter__(self):
+                CountingDocuments.iterations += 1
+                return super().__iter__()
+
+        documents = CountingDocuments(self.docs)
+        plan = self.planner.plan("faiss index", lambda: [(self.docs[0], 5.0)], documents, max_distance=1.0)
+        assert plan.route == ROUTE_GENERAL and "keyword_ms" not in plan.timings
+        assert CountingDocuments.iterations == 0
+
+        assert self.planner.plan("faiss index", lambda: [], documents).route == ROUTE_KEYWORD
+        assert self.planner.plan("gradio", lambda: [], documents).route == ROUTE_KEYWORD
+        assert CountingDocuments.iterations == 1
+
+    def test_keyword_index_matches_scan(self):
+        """测试倒排索引与逐个扫描的结果一致，并支持过滤"""
+        docs = self.docs + [FakeDocument("检索增强生成 RAG", {"source": "rag.md"})]
+        index = KeywordIndex(docs)
+        for message in ["vector faiss index", "Gradio web", "检索增强 rag", "missing"]:
+            assert index.search(message, k=3) == keyword_search(docs, message, k=3)
+        # 单字词只在其他词命中的片段中计分
+        assert [score for _, score in index.search("a faiss", k=3)] == [2, 2]
+        only_rag = index.search("rag faiss", k=3, accept=lambda doc: doc.metadata.get("source") == "rag.md")
+        assert [doc.page_content for doc, _ in only_rag] == ["检索增强生成 RAG"]
+
+    def test_keyword_search_order(self):
+        """测试关键词命中数排序"""
+        index = KeywordIndex(self.docs)
+        results = index.search("vector faiss index", k=2)
+        assert [score for _, score in results] == [3, 3]
+        assert index.search("missing", k=2) == []
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,68 @@
+"""
+相关性判断测试
+"""
+import pytest
+from src.core.relevance import RelevanceThresholds, calibrate_threshold, is_small_talk, parse_thresholds
+
+
+class FakeEmbeddings:
+    """只提供模型名的嵌入模型"""
+
+    def __init__(self, model):
+        self.model = model
+
+
+class FakeIndex:
+    """按位置返回向量的L2索引"""
+
+    metric_type = 1
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.ntotal = len(vectors)
+
+    def reconstruct(self, position):
+        return self.vectors[position]
+
+
+class FakeVectorStore:
+    def __init__(self, model, vectors):
+        self.embeddings = FakeEmbeddings(model)
+        self.index = FakeIndex(vectors)
+
+
+class TestRelevance:
+    """测试闲聊识别和距离阈值"""
+
+    def test_small_talk(self):
+        """测试只识别完整的寒暄短句"""
+        for message in ["你好", "您好！", "谢谢啦~", "Hello", "thank you!", "你是谁？", "再见"]:
+            assert is_small_talk(message), message
+        for message in ["你好，FAISS怎么建索引？", "谢谢，再介绍一下向量检索", "什么是RAG", ""]:
+            assert not is_small_talk(message), message
+
+    def test_parse_thresholds(self):
+        """测试解析按模型配置的阈值"""
+        assert parse_thresholds("nomic-embed-text=0.9, text-embedding-ada-002=0.45,bad") == {
+            "nomic-embed-text": 0.9, "text-embedding-ada-002": 0.45
+        }
+        assert parse_thresholds("") == {}
+
+    def test_override_and_calibration(self):
+        """测试显式阈值优先，否则按片段间距离分位数校准"""
+        np = pytest.importorskip("numpy")
+        vectors = np.eye(4, dtype=np.float32)  # 任意两个片段的距离平方均为2
+        thresholds = RelevanceThresholds({"ada": 0.3})
+
+        assert thresholds.get(FakeVectorStore("ada", vectors)) == 0.3
+        assert thresholds.get(FakeVectorStore("nomic", vectors)) == pytest.approx(2.0)
+        assert calibrate_threshold(FakeIndex(vectors[:2])) is None
+
+    def test_inner_product_index_not_filtered(self):
+        """测试内积索引不使用距离阈值"""
+        store = FakeVectorStore("nomic", [[1.0, 0.0]] * 4)
+        store.index.metric_type = 0
+        assert RelevanceThresholds().get(store) is None
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,113 @@
+"""
+查询向量缓存和合并检索测试
+"""
+import threading
+import pytest
+from types import SimpleNamespace
+from src.core.retrieval import QueryEmbeddingCache, CoalescingSearcher, normalize_query
+
+
+class CountingEmbeddings:
+    """记录批量调用次数的嵌入模型"""
+
+    model = "fake"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+
+class TestQueryEmbeddingCache:
+    """测试查询向量缓存"""
+
+    def test_normalized_queries_share_entry(self):
+        """测试空白和全角差异的查询命中同一缓存"""
+        embeddings = CountingEmbeddings()
+        cache = QueryEmbeddingCache(max_size=8)
+
+        first = cache.get_many(embeddings, ["合同 金额", "付款方式"])
+        second = cache.get_many(embeddings, ["  合同   金额 ", "付款方式"])
+
+        assert normalize_query("ＡＢＣ  d") == "ABC d"
+        assert first == second
+        assert len(embeddings.calls) == 1
+        assert cache.get_stats()["hits"] == 2
+
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        embeddings = CountingEmbeddings()
+        cache = QueryEmbeddingCache(max_size=2)
+        cache.get_many(embeddings, ["a", "b"])
+        cache.get_many(embeddings, ["a"])
+        cache.get_many(embeddings, ["c"])
+        cache.get_many(embeddings, ["a", "b"])
+
+        assert embeddings.calls[-1] == ["b"]
+
+
+class TestCoalescingSearcher:
+    """测试并发查询合并"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        faiss = pytest.importorskip("faiss")
+        np = pytest.importorskip("numpy")
+
+        self.embeddings = CountingEmbeddings()
+        texts = [f"片段{i}" * (i + 1) for i in range(10)]
+        index = faiss.IndexFlatL2(2)
+        index.add(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+        docs = {str(i): SimpleNamespace(page_content=text, metadata={}) for i, text in enumerate(texts)}
+        self.vector_store = SimpleNamespace(
+            embeddings=self.embeddings,
+            index=index,
+            index_to_docstore_id={i: str(i) for i in range(10)},
+            docstore=SimpleNamespace(search=docs.get),
+            _normalize_L2=False
+        )
+        self.embeddings.calls.clear()
+
+    def test_concurrent_queries_share_one_batch(self):
+        """测试同一窗口内的并发查询合并为一次检索"""
+        searcher = CoalescingSearcher(window_ms=50)
+        results = {}
+        barrier = threading.Barrier(4)
+
+        def worker(i):
+            barrier.wait()
+            results[i] = searcher.search(self.vector_store, f"问题{i}", k=i + 1)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert searcher.get_stats()["batches"] == 1
+        assert len(self.embeddings.calls) == 1
+        assert [len(results[i]) for i in range(4)] == [1, 2, 3, 4]
+
+    def test_id_filter_restricts_results(self):
+        """测试ID过滤在索引内部生效，仍返回范围内的top-k"""
+        import numpy as np
+        searcher = CoalescingSearcher(window_ms=0)
+        allowed = np.array([2, 5, 7], dtype=np.int64)
+        hits = searcher.search(self.vector_store, "问题", k=5, id_filter=allowed)
+
+        assert sorted(doc.page_content for doc, _ in hits) == [f"片段{i}" * (i + 1) for i in (2, 5, 7)]
+        assert searcher.search(self.vector_store, "问题", k=5, id_filter=allowed[:0]) == []
+
+    def test_repeated_query_uses_cache(self):
+        """测试重复查询不再计算向量"""
+        searcher = CoalescingSearcher(window_ms=0)
+        first = searcher.search(self.vector_store, "付款方式", k=3)
+        second = searcher.search(self.vector_store, "付款方式", k=3)
+
+        assert [doc.page_content for doc, _ in first] == [doc.page_content for doc, _ in second]
+        assert len(self.embeddings.calls) == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,105 @@
+"""
+工具路由测试
+"""
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from agent_setup import CALCULATOR_TOOL, DOC_TOOL, SEARCH_TOOL, ToolRouter, extract_expression
+from src.utils.web_search import SearchUnavailable
+from tools import safe_calculator
+
+
+class CountingLLM:
+    """记录调用次数，按提示词返回固定内容的模型"""
+
+    def __init__(self, classify_output=DOC_TOOL):
+        self.classify_output = classify_output
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if prompt.startswith("可用工具"):
+            return SimpleNamespace(content=self.classify_output)
+        return SimpleNamespace(content="综合回答")
+
+
+def make_tool(name, func, return_direct=False):
+    return SimpleNamespace(name=name, func=func, description=f"{name}工具", return_direct=return_direct)
+
+
+class TestToolRouter:
+    """测试规则路由、并行执行和结果缓存"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.doc_calls = []
+        self.doc = make_tool(DOC_TOOL, lambda query: self.doc_calls.append(query) or f"文档: {query}", return_direct=True)
+        self.calculator = make_tool(CALCULATOR_TOOL, safe_calculator, return_direct=True)
+
+    def test_extract_expression(self):
+        """测试只有算式问题才交给计算器"""
+        assert extract_expression("计算 (3+4)×2 等于多少？") == "(3+4)*2"
+        assert extract_expression("2^10") == "2**10"
+        assert extract_expression("第3-5页讲了什么") is None
+        assert extract_expression("covid-19 是什么") is None
+        assert extract_expression("sqrt(2) * 3万") == "sqrt(2) * (3*10000)"
+
+    def test_rules_without_llm_calls(self):
+        """测试算式和文档问题都不需要额外的大模型调用"""
+        llm = CountingLLM()
+        router = ToolRouter([self.doc, self.calculator], llm)
+
+        assert router.invoke({"input": "计算 (3+4)*2"}) == {"input": "计算 (3+4)*2", "output": "14", "tools": [CALCULATOR_TOOL]}
+        assert router.run("文档的主要结论是什么") == "文档: 文档的主要结论是什么"
+        assert llm.prompts == []
+
+    def test_search_runs_in_parallel_and_synthesizes(self):
+        """测试时效性问题并行调用搜索和文档问答，再综合一次"""
+        barrier = threading.Barrier(2, timeout=2)
+        search = make_tool(SEARCH_TOOL, lambda query: barrier.wait() and "搜索结果" or "搜索结果")
+        doc = make_tool(DOC_TOOL, lambda query: barrier.wait() and "文档结果" or "文档结果", return_direct=True)
+        llm = CountingLLM()
+        router = ToolRouter([doc, search], llm)
+
+        result = router.invoke("今天的最新新闻")
+        assert result["tools"] == [SEARCH_TOOL, DOC_TOOL]
+        assert result["output"] == "综合回答"
+        assert len(llm.prompts) == 1 and "【网页搜索】\n搜索结果" in llm.prompts[0]
+
+    def test_classification_single_call(self):
+        """测试规则无法确定时只用一次大模型分类"""
+        search = make_tool(SEARCH_TOOL, lambda query: "搜索结果")
+        llm = CountingLLM(classify_output=SEARCH_TOOL)
+        router = ToolRouter([self.doc, self.calculator, search], llm)
+
+        assert router.route("LangChain是谁开发的") == [(SEARCH_TOOL, "LangChain是谁开发的")]
+        assert len(llm.prompts) == 1 and CALCULATOR_TOOL not in llm.prompts[0]
+        assert ToolRouter([self.doc, search], llm, classify=False).route("LangChain是谁开发的") == [(DOC_TOOL, "LangChain是谁开发的")]
+
+    def test_results_cached(self):
+        """测试相同输入的工具结果被缓存，过期后重新执行，失败不缓存"""
+        router = ToolRouter([self.doc], cache_ttl=0.1)
+        router.run("什么是RAG")
+        router.run("什么是RAG ")
+        assert self.doc_calls == ["什么是RAG"] and router.cache_hits == 1
+        time.sleep(0.15)
+        router.run("什么是RAG")
+        assert len(self.doc_calls) == 2
+
+        failing = make_tool(DOC_TOOL, lambda query: 1 / 0, return_direct=True)
+        router = ToolRouter([failing])
+        assert "执行失败" in router.run("问题")
+        assert router._cache == {}
+
+    def test_search_unavailable_not_cached(self):
+        """测试搜索限流、超时的提示原样返回且不缓存"""
+        def limited(query):
+            raise SearchUnavailable("搜索请求过于频繁，请稍后再试。")
+
+        router = ToolRouter([make_tool(SEARCH_TOOL, limited, return_direct=True)])
+        assert router.run("今天的新闻") == "搜索请求过于频繁，请稍后再试。"
+        assert router._cache == {}
+
+if __name__ == "__main__":
+    pytest.main([__file__])
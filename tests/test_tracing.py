@@ -0,0 +1,123 @@
+"""
+请求追踪与指标测试
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import pytest
+from src.utils import tracing
+
+
+class TestTracing:
+    """测试阶段记录、请求记录和Prometheus输出"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.saved_env = {name: os.environ.get(name) for name in ("TRACE_RECORDS_DIR", "TRACE_RECORDS")}
+        os.environ["TRACE_RECORDS_DIR"] = self.temp_dir
+        os.environ["TRACE_RECORDS"] = "true"
+        tracing.get_recorder.cache_clear()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for name, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        tracing.get_recorder().close()
+        tracing.get_recorder.cache_clear()
+        shutil.rmtree(self.temp_dir)
+
+    def read_records(self):
+        tracing.get_recorder().flush()
+        records = []
+        for name in sorted(os.listdir(self.temp_dir)):
+            with open(os.path.join(self.temp_dir, name), encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f)
+        return records
+
+    def test_spans_recorded_in_trace(self):
+        """测试请求内的阶段、属性和缓存标记写入记录"""
+        with tracing.trace_request("chat", knowledge_base="default") as trace:
+            with tracing.span("parse"):
+                tracing.annotate(cache_hit=True)
+            tracing.record_span("search", 0.02, k=4)
+            with tracing.span("generate", prompt_tokens=10) as current:
+                current.set(completion_tokens=5)
+            trace.set(route="knowledge")
+
+        records = self.read_records()
+        assert len(records) == 1
+        record = records[0]
+        assert record["kind"] == "chat" and record["route"] == "knowledge" and record["status"] == "ok"
+        assert [span["name"] for span in record["spans"]] == ["parse", "search", "generate"]
+        assert record["spans"][0]["cache_hit"] is True
+        assert record["stages_ms"]["search"] == 20.0
+
+    def test_records_written_off_request_thread(self):
+        """测试请求记录由后台线程写入，请求线程不写文件"""
+        recorder = tracing.get_recorder()
+        writers = []
+        append = recorder._append
+        recorder._append = lambda records: writers.append(threading.current_thread().name) or append(records)
+
+        with tracing.trace_request("chat"):
+            pass
+        assert len(self.read_records()) == 1
+        assert writers == ["request-recorder"]
+
+    def test_nested_trace_reuses_outer(self):
+        """测试嵌套请求只记录一次"""
+        with tracing.trace_request("ingest") as outer:
+            with tracing.trace_request("ingest") as inner:
+                assert inner is outer
+        assert len(self.read_records()) == 1
+
+    def test_error_status(self):
+        """测试异常时记录错误状态并继续抛出"""
+        with pytest.raises(ValueError):
+            with tracing.trace_request("chat"):
+                with tracing.span("generate"):
+                    raise ValueError("boom")
+
+        record = self.read_records()[0]
+        assert record["status"] == "error"
+        assert record["spans"][0]["error"] == "ValueError"
+
+    def test_metrics_render(self):
+        """测试Prometheus文本格式"""
+        registry = tracing.MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "测试", ["stage"], buckets=(0.1, 1.0))
+        counter = registry.counter("test_total", "测试", ["result"])
+        histogram.observe(0.05, stage="a")
+        histogram.observe(0.5, stage="a")
+        histogram.observe(5, stage="a")
+        counter.inc(result="hit")
+
+        text = registry.render()
+        assert 'test_seconds_bucket{stage="a",le="0.1"} 1.0' in text
+        assert 'test_seconds_bucket{stage="a",le="1.0"} 2.0' in text
+        assert 'test_seconds_bucket{stage="a",le="+Inf"} 3.0' in text
+        assert 'test_seconds_count{stage="a"} 3.0' in text
+        assert 'test_total{result="hit"} 1.0' in text
+
+    def test_stage_metrics_without_trace(self):
+        """测试没有进行中的请求时阶段耗时仍计入指标"""
+        before = tracing.STAGE_SECONDS.count(stage="unit-test")
+        with tracing.span("unit-test"):
+            pass
+        assert tracing.STAGE_SECONDS.count(stage="unit-test") == before + 1
+        assert self.read_records() == []
+
+    def test_estimate_tokens(self):
+        """测试token估算"""
+        assert tracing.estimate_tokens("") == 0
+        assert tracing.estimate_tokens("你好世界") == 4
+        assert tracing.estimate_tokens("hello world!") == 3
+
+if __name__ == "__main__":
+    pytest.main([__file__])
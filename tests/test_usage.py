@@ -0,0 +1,96 @@
+"""
+token用量统计测试
+"""
+import json
+import os
+import shutil
+import tempfile
+import pytest
+from src.utils.usage import UsageStore, UsageTracker, merge_usage, parse_prices
+
+
+class TestUsage:
+    """测试用量估算、汇总和费用"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "usage.json")
+        self.prices = parse_prices("gpt-4o=0.0025/0.01, bad=x")
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_tracker_reported_and_estimated(self):
+        """测试优先使用服务端返回的用量，没有时本地估算"""
+        tracker = UsageTracker(model="gpt-4o", provider="openai")
+        tracker.add("问题", "回答", prompt_tokens=120, completion_tokens=30)
+        usage = tracker.finish("问题", "回答")
+        assert usage["calls"] == 1 and usage["total_tokens"] == 150 and not usage["estimated"]
+
+        estimated = UsageTracker(model="qwen2:7b", provider="ollama").finish("请用中文回答这个问题：什么是向量检索", "向量检索是……")
+        assert estimated["estimated"] and estimated["prompt_tokens"] > 0 and estimated["completion_tokens"] > 0
+
+    def test_parse_prices(self):
+        """测试单价配置解析，无效项被忽略"""
+        assert self.prices == {"gpt-4o": (0.0025, 0.01)}
+
+    def test_store_report_and_flush(self):
+        """测试按天、模型、会话、知识库汇总，写盘后可重新加载"""
+        store = UsageStore(self.path, self.prices, flush_interval=3600)
+        usage = {"model": "gpt-4o", "prompt_tokens": 1000, "completion_tokens": 500}
+        assert store.record(usage, session_id="s1", knowledge_base="default") == pytest.approx(0.0075)
+        store.record(usage, session_id="s2", knowledge_base="default")
+        store.record({"model": "qwen2:7b", "prompt_tokens": 10, "completion_tokens": 5}, session_id="s2")
+        assert not os.path.exists(self.path)
+
+        report = store.report(days=7)
+        assert report["total"]["requests"] == 3
+        assert report["by_model"]["gpt-4o"]["cost"] == pytest.approx(0.015)
+        assert report["by_model"]["qwen2:7b"]["cost"] == 0
+        assert report["by_knowledge_base"]["default"]["requests"] == 2
+        assert report["top_sessions"][0]["session_id"] == "s2"
+
+        store.flush()
+        with open(store.process_path, encoding="utf-8") as f:
+            assert json.load(f)["sessions"]["s1"]["requests"] == 1
+        assert UsageStore(self.path, self.prices).report(days=1)["total"] == report["total"]
+
+    def test_store_multiple_processes(self, monkeypatch):
+        """测试多个进程各写各的文件，报告合并所有进程"""
+        usage = {"model": "m", "prompt_tokens": 10, "completion_tokens": 5}
+        stores = []
+        for pid in (101, 102):
+            monkeypatch.setattr(os, "getpid", lambda pid=pid: pid)
+            store = UsageStore(self.path, flush_interval=0)
+            store.record(usage, session_id="shared", knowledge_base="default")
+            stores.append(store)
+        stores[0].record(usage, knowledge_base="default", day="2000-01-01")
+
+        report = stores[1].report(days=7)
+        assert report["total"]["requests"] == 2
+        assert report["top_sessions"][0]["requests"] == 2
+        # 知识库汇总同样只统计最近 days 天
+        assert report["by_knowledge_base"]["default"]["requests"] == 2
+
+    def test_store_limits(self):
+        """测试会话数上限和按天保留期"""
+        store = UsageStore(self.path, flush_interval=0, retention_days=30, max_sessions=2)
+        usage = {"model": "m", "prompt_tokens": 1, "completion_tokens": 1}
+        for session_id in ("s1", "s2", "s1", "s3"):
+            store.record(usage, session_id=session_id)
+        store.record(usage, day="2000-01-01")
+        assert list(store.data["sessions"]) == ["s1", "s3"]
+        assert "2000-01-01" not in store.data["days"]
+
+    def test_merge_usage(self):
+        """测试同一请求多次调用的用量合并"""
+        first = {"calls": 1, "prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12, "cost": 0.1, "estimated": False}
+        second = {"calls": 1, "prompt_tokens": 5, "completion_tokens": 5, "total_tokens": 10, "cost": 0.2, "estimated": True}
+        merged = merge_usage(first, second)
+        assert merged["calls"] == 2 and merged["total_tokens"] == 22 and merged["estimated"]
+        assert merge_usage(None, second) is second
+
+if __name__ == "__main__":
+    pytest.main([__file__])
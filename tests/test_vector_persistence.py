@@ -0,0 +1,39 @@
+"""
+向量存储持久化测试
+"""
+import pytest
+import tempfile
+import shutil
+from types import SimpleNamespace
+from src.utils.vector_persistence import VectorPersistenceManager
+
+
+class TestVectorPersistence:
+    """测试向量存储缓存记录的嵌入模型标识"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = VectorPersistenceManager(self.temp_dir)
+        self.signature = {"provider": "ollama", "model": "nomic-embed-text", "base_url": "http://localhost:11434"}
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_signature_recorded(self):
+        """测试保存时记录嵌入模型标识，换模型后缓存不可用"""
+        vector_store = SimpleNamespace(save_local=lambda path: None)
+        self.manager.save_vector_store(vector_store, [SimpleNamespace(page_content="片段", metadata={})], self.signature)
+
+        assert self.manager.load_embedding_signature() == self.signature
+        assert self.manager.signature_matches(self.signature)
+        assert not self.manager.signature_matches({**self.signature, "provider": "fake"})
+
+    def test_legacy_cache_without_signature(self):
+        """测试没有记录嵌入模型的旧缓存视为不匹配（需要完整重建）"""
+        assert self.manager.load_embedding_signature() is None
+        assert not self.manager.signature_matches(self.signature)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,165 @@
+"""
+预热快照测试
+"""
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+from src.utils.warm_snapshot import (
+    SNAPSHOT_FORMAT_VERSION, ChunkStore, SnapshotStore, fingerprints_digest, write_chunk_store
+)
+
+
+class TestChunkStore:
+    """测试片段存储"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_roundtrip_by_offset(self):
+        """测试按偏移量读取片段"""
+        records = [
+            ("第一页内容", {"source": "docs/a.pdf", "page": 1}),
+            ("", {"source": "docs/b.txt"}),
+            ("third chunk", {"source": "docs/c.md", "type": "markdown"}),
+        ]
+        count = write_chunk_store(Path(self.temp_dir), records)
+        store = ChunkStore(self.temp_dir)
+
+        assert count == 3
+        assert len(store) == 3
+        assert store.nbytes == (Path(self.temp_dir) / "chunks.bin").stat().st_size
+        assert store.get_record(0) == records[0]
+        assert store.get_record(-1) == records[2]
+        with pytest.raises(IndexError):
+            store.get_record(3)
+        store.close()
+
+    def test_empty_store(self):
+        """测试空片段存储"""
+        write_chunk_store(Path(self.temp_dir), [])
+        store = ChunkStore(self.temp_dir)
+        assert len(store) == 0
+        assert store.nbytes == 0
+        store.close()
+
+
+class TestSnapshotValidation:
+    """测试快照有效性检查"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = SnapshotStore(snapshot_dir=self.temp_dir)
+        self.fingerprints = {"/docs/a.pdf": {"hash": "abc", "file_size": 10, "last_modified": 1.0}}
+        self.signature = {"provider": "ollama", "model": "nomic-embed-text", "base_url": "http://localhost:11434"}
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_digest_ignores_mtime(self):
+        """测试指纹摘要只依赖内容哈希和大小"""
+        touched = {"/docs/a.pdf": {"hash": "abc", "file_size": 10, "last_modified": 2.0}}
+        assert fingerprints_digest(self.fingerprints) == fingerprints_digest(touched)
+
+    def test_is_valid(self):
+        """测试快照与文档、模型配置的一致性检查"""
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "fingerprints_digest": fingerprints_digest(self.fingerprints),
+            "model_signature": self.signature
+        }
+        assert self.store.is_valid(manifest, self.fingerprints, self.signature)
+        assert not self.store.is_valid(manifest, {}, self.signature)
+        assert not self.store.is_valid(manifest, self.fingerprints, {**self.signature, "model": "other"})
+        assert not self.store.is_valid(None, self.fingerprints, self.signature)
+        # 旧格式的快照（IndexFlat，无法映射）需要重新发布
+        assert not self.store.is_valid({**manifest, "format_version": 1}, self.fingerprints, self.signature)
+
+class TestCopyVectorStore:
+    """测试增量入库使用的向量库副本"""
+
+    def test_copy_is_independent(self):
+        """测试修改副本不影响正在被检索的原向量库"""
+        pytest.importorskip("faiss")
+        pytest.importorskip("langchain_community")
+        from langchain_community.vectorstores import FAISS
+        from src.utils.fake_backends import FakeEmbeddings
+        from src.utils.warm_snapshot import copy_vector_store
+
+        original = FAISS.from_texts(["第一段", "第二段"], FakeEmbeddings())
+        copy = copy_vector_store(original)
+        copy.add_texts(["第三段"])
+        copy.delete([original.index_to_docstore_id[0]])
+
+        assert original.index.ntotal == 2 and len(original.docstore._dict) == 2
+        assert copy.index.ntotal == 2 and copy.distance_strategy == original.distance_strategy
+        assert [doc.page_content for doc in original.similarity_search("第一段", k=2)] != []
+
+class TestSnapshotIndex:
+    """测试快照索引以内存映射方式加载"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_mmapped_and_same_results(self):
+        """测试向量在磁盘倒排表中被映射，检索结果与原索引相同，副本可增删"""
+        faiss = pytest.importorskip("faiss")
+        pytest.importorskip("langchain_community")
+        from langchain_community.vectorstores import FAISS
+        from src.utils.fake_backends import FakeEmbeddings
+        from src.utils.warm_snapshot import copy_vector_store
+
+        embeddings = FakeEmbeddings()
+        texts = [f"第{i}段内容" for i in range(50)]
+        original = FAISS.from_texts(texts, embeddings)
+        store = SnapshotStore(snapshot_dir=self.temp_dir)
+        store.publish(original, {}, {"model": "fake"})
+        vector_store, chunk_store, manifest = store.load(embeddings, read_only=True)
+
+        invlists = faiss.downcast_InvertedLists(vector_store.index.invlists)
+        assert isinstance(invlists, faiss.OnDiskInvertedLists)
+        with open("/proc/self/maps", encoding="utf-8") as f:
+            assert "index.ivfdata" in f.read()
+
+        for query in ["第3段内容", "第42段内容"]:
+            expected = [doc.page_content for doc in original.similarity_search(query, k=5)]
+            assert [doc.page_content for doc in vector_store.similarity_search(query, k=5)] == expected
+        assert vector_store.index.reconstruct(7).tolist() == original.index.reconstruct(7).tolist()
+
+        copy = copy_vector_store(vector_store)
+        copy.add_texts(["新片段"])
+        assert copy.index.ntotal == 51 and vector_store.index.ntotal == 50
+        chunk_store.close()
+
+    def test_distance_strategy(self):
+        """测试加载后保留距离策略"""
+        faiss = pytest.importorskip("faiss")
+        pytest.importorskip("langchain_community")
+        from langchain_community.vectorstores import FAISS
+        from langchain_community.vectorstores.utils import DistanceStrategy
+        from src.utils.fake_backends import FakeEmbeddings
+
+        embeddings = FakeEmbeddings()
+        original = FAISS.from_texts(["第一段", "第二段", "第三段"], embeddings,
+                                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT)
+        store = SnapshotStore(snapshot_dir=self.temp_dir)
+        store.publish(original, {}, {"model": "fake"})
+        vector_store, chunk_store, _ = store.load(embeddings, read_only=True)
+        assert vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+        assert vector_store.index.metric_type == faiss.METRIC_INNER_PRODUCT
+        chunk_store.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
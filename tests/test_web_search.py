@@ -0,0 +1,138 @@
+"""
+网页搜索工具测试
+"""
+import os
+import shutil
+import tempfile
+import threading
+import pytest
+from src.utils import web_search
+from src.utils.web_search import SearchCache, SearchUnavailable, TokenBucket, WebSearch
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "search.json")
+
+
+class CountingBackend:
+    """记录搜索次数的后端"""
+
+    def __init__(self, block: threading.Event = None):
+        self.queries = []
+        self.block = block
+
+    def __call__(self, query):
+        self.queries.append(query)
+        if self.block is not None:
+            self.block.wait(2)
+        return f"结果: {query}"
+
+
+class TestWebSearch:
+    """测试缓存、限流、超时和录制/回放"""
+
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, "search.json")
+        self.saved_env = {key: os.environ.get(key) for key in ("SEARCH_MODE", "SEARCH_FIXTURES", "SEARCH_CACHE_PATH")}
+        web_search.get_web_search.cache_clear()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for key, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        web_search.get_web_search.cache_clear()
+        shutil.rmtree(self.temp_dir)
+
+    def test_persistent_cache(self):
+        """测试重复搜索命中缓存，缓存跨实例保留并按TTL过期"""
+        backend = CountingBackend()
+        search = WebSearch(backend, cache=SearchCache(self.cache_path, ttl=60))
+        assert search.run("LangChain 是什么") == "结果: LangChain 是什么"
+        assert search.run(" langchain  是什么 ") == "结果: LangChain 是什么"
+        assert backend.queries == ["LangChain 是什么"] and search.stats["cache_hits"] == 1
+
+        assert SearchCache(self.cache_path, ttl=60).get("LangChain 是什么") == "结果: LangChain 是什么"
+        expired = SearchCache(self.cache_path, ttl=60)
+        expired.entries["langchain 是什么"]["ts"] -= 120
+        assert expired.get("LangChain 是什么") is None
+
+    def test_rate_limited(self):
+        """测试超过令牌桶容量的搜索不会发出"""
+        backend = CountingBackend()
+        search = WebSearch(backend, bucket=TokenBucket(rate=0.001, capacity=2))
+        search.run("问题0")
+        search.run("问题1")
+        for i in range(2, 4):
+            with pytest.raises(SearchUnavailable, match="过于频繁"):
+                search.run(f"问题{i}")
+        assert len(backend.queries) == 2 and search.stats["rate_limited"] == 2
+
+    def test_timeout(self):
+        """测试搜索超时抛出 SearchUnavailable，结果不缓存"""
+        release = threading.Event()
+        search = WebSearch(CountingBackend(block=release), cache=SearchCache(self.cache_path, ttl=60), timeout=0.05)
+        with pytest.raises(SearchUnavailable, match="超时"):
+            search.run("慢查询")
+        release.set()
+        assert search.stats["timeouts"] == 1 and search.cache.get("慢查询") is None
+
+    def test_hung_searches_fail_fast(self):
+        """测试工作线程都被超时未返回的搜索占用时，新搜索直接失败而不排队"""
+        release = threading.Event()
+        search = WebSearch(CountingBackend(block=release), timeout=0.01)
+        try:
+            for i in range(web_search._MAX_WORKERS):
+                with pytest.raises(SearchUnavailable, match="超时"):
+                    search.run(f"慢查询{i}")
+            with pytest.raises(SearchUnavailable, match="暂不可用"):
+                search.run("新查询")
+            assert search.stats["searches"] == web_search._MAX_WORKERS
+        finally:
+            release.set()
+            # 等待被占用的工作线程全部释放，避免影响其他测试
+            for _ in range(web_search._MAX_WORKERS):
+                assert web_search._slots.acquire(timeout=2)
+            for _ in range(web_search._MAX_WORKERS):
+                web_search._slots.release()
+
+    def test_stats_thread_safe(self):
+        """测试多线程同时搜索时计数准确"""
+        search = WebSearch(CountingBackend(), cache=SearchCache(self.cache_path, ttl=60))
+        search.run("缓存查询")
+        threads = [threading.Thread(target=lambda: [search.run("缓存查询") for _ in range(200)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert search.stats["requests"] == 801 and search.stats["cache_hits"] == 800
+
+    def test_record_then_replay(self):
+        """测试录制的结果可离线回放"""
+        fixtures_path = os.path.join(self.temp_dir, "fixtures.json")
+        recorder = WebSearch(CountingBackend(), mode="record", fixtures=SearchCache(fixtures_path))
+        recorder.run("最新新闻")
+
+        replay = WebSearch(None, mode="replay", fixtures=SearchCache(fixtures_path))
+        assert replay.run("最新新闻") == "结果: 最新新闻"
+        assert replay.run("没录过").startswith("没有录制的搜索结果")
+        with pytest.raises(ValueError):
+            WebSearch(None, mode="live")
+
+    def test_replay_without_key(self):
+        """测试回放模式不需要密钥，使用仓库中录制的结果，且只创建一次"""
+        os.environ["SEARCH_MODE"] = "replay"
+        os.environ["SEARCH_FIXTURES"] = FIXTURES
+        os.environ["SEARCH_CACHE_PATH"] = self.cache_path
+        search = web_search.get_web_search("")
+        assert search is web_search.get_web_search("")
+        assert "langchain-core" in search.run("LangChain 最新版本")
+
+        os.environ["SEARCH_MODE"] = "live"
+        web_search.get_web_search.cache_clear()
+        assert web_search.get_web_search("") is None
+
+if __name__ == "__main__":
+    pytest.main([__file__])